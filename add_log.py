@@ -1,6 +1,11 @@
 
 import os
 
+import instrument
+import snapshot_store
+
+instrument.install()
+
 file_path = r'e:\ИИ\NP\app.js'
 
 with open(file_path, 'r', encoding='utf-8') as f:
@@ -8,6 +13,7 @@ with open(file_path, 'r', encoding='utf-8') as f:
 
 if "console.log('App.js loaded - Fix Attempt 4');" not in content:
     new_content = "console.log('App.js loaded - Fix Attempt 4');\n" + content
+    snapshot_store.snapshot(file_path, reason='add_log.py')
     with open(file_path, 'w', encoding='utf-8') as f:
         f.write(new_content)
     print("Added console log to app.js")
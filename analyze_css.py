@@ -1,5 +1,9 @@
 import re
 
+import instrument
+
+instrument.install()
+
 file_path = r'e:\ИИ\NP\style.css'
 
 with open(file_path, 'r', encoding='utf-8') as f:
@@ -0,0 +1,274 @@
+"""Local stand-in for the project API of server.js, on top of projects/.
+
+Serves the three endpoints the app leans on, with the same request and
+response shapes, so load_test.py (or the app itself) can run without
+MongoDB, Google Drive or network:
+
+    GET  /api/projects       every project, full history, newest first
+    POST /api/save-project   upsert by id into <folder>/data.json
+    POST /api/upload         multipart 'file' into <folder>/<section>/
+    GET  /uploads/...        the uploaded files
+
+Reads keep each data.json's bytes in memory until its mtime/size changes,
+as the database would keep hot documents cached; every request still
+stats all folders. Saves go through atomic_write under a per-folder lock.
+
+By default the server works on a scratch copy of projects/ that is
+removed on exit, so load tests never touch real data; --in-place serves
+the folder itself. With --port 0 a free port is picked; the first line
+printed is always "listening on http://127.0.0.1:<port>".
+
+Usage:
+    python api_standin.py [--port 3000] [--projects projects] [--in-place]
+"""
+import argparse
+import email.parser
+import email.policy
+import json
+import os
+import re
+import shutil
+import signal
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+import instrument
+from project_files import DATA_FILE, PROJECTS_DIR, atomic_write, dump_project, iter_data_files
+
+# express.json({ limit: '50mb' })
+MAX_BODY = 50 * 1024 * 1024
+_UNSAFE_NAME = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+
+def safe_name(name, fallback='file'):
+    name = _UNSAFE_NAME.sub('_', name or '').strip(' .')
+    return name or fallback
+
+
+class ProjectStore:
+    """projects/ as the stand-in's database."""
+
+    def __init__(self, projects_dir):
+        self.projects_dir = projects_dir
+        self.cache = {}             # folder -> (mtime_ns, size, bytes, id, createdAt)
+        self.folders = {}           # project id -> folder, from the entries read so far
+        self.lock = threading.Lock()
+        self.folder_locks = {}
+
+    def _folder_lock(self, folder):
+        with self.lock:
+            return self.folder_locks.setdefault(folder, threading.Lock())
+
+    def _entry(self, folder, path, st):
+        cached = self.cache.get(folder)
+        if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+            return cached
+        with open(path, 'rb') as f:
+            data = f.read()
+        project = json.loads(data.decode('utf-8-sig'))
+        entry = (st.st_mtime_ns, st.st_size, data.strip().lstrip(b'\xef\xbb\xbf'),
+                 str(project.get('id') or ''), str(project.get('createdAt') or ''))
+        self.cache[folder] = entry
+        self.folders[entry[3]] = folder
+        return entry
+
+    def list_json(self):
+        """The JSON array of all projects, newest first, built from the raw file bytes."""
+        entries = []
+        for folder, path, st in iter_data_files(self.projects_dir):
+            try:
+                entries.append(self._entry(folder, path, st))
+            except (OSError, ValueError):
+                continue
+        entries.sort(key=lambda e: e[4], reverse=True)
+        return b'[' + b','.join(e[2] for e in entries) + b']'
+
+    def folder_for(self, project):
+        pid = str(project['id'])
+        known = self.folders.get(pid)
+        if known and os.path.exists(os.path.join(self.projects_dir, known, DATA_FILE)):
+            return known
+        for folder, path, st in iter_data_files(self.projects_dir):
+            try:
+                if self._entry(folder, path, st)[3] == pid:
+                    return folder
+            except (OSError, ValueError):
+                continue
+        if project.get('folderName'):
+            return safe_name(project['folderName'])
+        base = safe_name('-'.join(filter(None, [project.get('client'), project.get('name')])), pid)
+        folder, n = base, 1
+        while os.path.exists(os.path.join(self.projects_dir, folder)):
+            n += 1
+            folder = f"{base} ({n})"
+        return folder
+
+    def save(self, project):
+        # Same defaults as /api/save-project in server.js
+        if not project.get('id'):
+            project['id'] = str(int(time.time() * 1000))
+        if isinstance(project.get('sections'), list):
+            for s in project['sections']:
+                if isinstance(s, dict) and not s.get('id'):
+                    s['id'] = os.urandom(5).hex()[:9]
+        folder = self.folder_for(project)
+        project.setdefault('folderName', folder)
+        with self._folder_lock(folder):
+            os.makedirs(os.path.join(self.projects_dir, folder), exist_ok=True)
+            atomic_write(os.path.join(self.projects_dir, folder, DATA_FILE), dump_project(project))
+        return folder
+
+    def store_upload(self, folder, section, filename, data):
+        folder = safe_name(folder, 'LineART Projects')
+        parts = [self.projects_dir, folder] + ([safe_name(section)] if section else [])
+        directory = os.path.join(*parts)
+        os.makedirs(directory, exist_ok=True)
+        stem, ext = os.path.splitext(safe_name(filename))
+        name, n = stem + ext, 1
+        with self._folder_lock(folder):
+            while os.path.exists(os.path.join(directory, name)):
+                n += 1
+                name = f"{stem} ({n}){ext}"
+            atomic_write(os.path.join(directory, name), data)
+        return '/uploads/' + '/'.join(parts[1:] + [name])
+
+
+def parse_multipart(content_type, body):
+    """{field: str} and {field: (filename, bytes, mimetype)} of a multipart/form-data body."""
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        b'Content-Type: ' + content_type.encode('latin-1') + b'\r\n\r\n' + body)
+    fields, files = {}, {}
+    if not message.is_multipart():
+        return fields, files
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        if not name:
+            continue
+        filename = part.get_filename()
+        payload = part.get_payload(decode=True) or b''
+        if filename is not None:
+            files[name] = (filename, payload, part.get_content_type())
+        else:
+            fields[name] = payload.decode(part.get_content_charset() or 'utf-8', errors='replace')
+    return fields, files
+
+
+def make_server(projects_dir, port=3000, host='127.0.0.1'):
+    store = ProjectStore(projects_dir)
+    counters = {'requests': 0, 'errors': 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body go out in separate writes; Nagle would hold the body for the ACK
+        disable_nagle_algorithm = True
+
+        def _send(self, status, body, content_type='application/json; charset=utf-8'):
+            if not isinstance(body, bytes):
+                body = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            with lock:
+                counters['requests'] += 1
+                counters['errors'] += status >= 500
+
+        def _body(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            if length > MAX_BODY:
+                # The body stays unread, so the connection cannot be reused
+                self.close_connection = True
+                raise ValueError('request entity too large')
+            return self.rfile.read(length)
+
+        def do_GET(self):
+            path = unquote(urlsplit(self.path).path)
+            if path == '/api/projects':
+                self._send(200, store.list_json())
+            elif path.startswith('/uploads/'):
+                target = os.path.realpath(os.path.join(store.projects_dir, path[len('/uploads/'):]))
+                if not target.startswith(os.path.realpath(store.projects_dir) + os.sep) or not os.path.isfile(target):
+                    self._send(404, {'success': False, 'message': 'Not found'})
+                    return
+                with open(target, 'rb') as f:
+                    self._send(200, f.read(), 'application/octet-stream')
+            else:
+                self._send(404, {'success': False, 'message': 'Not found'})
+
+        def do_POST(self):
+            path = urlsplit(self.path).path
+            try:
+                body = self._body()
+                if path == '/api/save-project':
+                    project = json.loads(body or b'{}')
+                    if not isinstance(project, dict) or (not project.get('id') and not project.get('name')):
+                        self._send(400, b'Missing data', 'text/plain; charset=utf-8')
+                        return
+                    folder = store.save(project)
+                    self._send(200, {'success': True, 'folderName': folder})
+                elif path == '/api/upload':
+                    fields, files = parse_multipart(self.headers.get('Content-Type', ''), body)
+                    if 'file' not in files:
+                        self._send(400, {'success': False, 'message': 'No file'})
+                        return
+                    filename, data, _ = files['file']
+                    url = store.store_upload(fields.get('folderName') or '', fields.get('sectionName') or '',
+                                             filename, data)
+                    self._send(200, {'success': True, 'url': url, 'filename': filename})
+                else:
+                    self._send(404, {'success': False, 'message': 'Not found'})
+            except (OSError, ValueError) as e:
+                self._send(500, {'success': False, 'message': str(e)})
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.counters = counters
+    return server
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+@instrument.instrumented('api_standin', track_files=False)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local stand-in for the project API of server.js")
+    parser.add_argument('--port', type=int, default=3000, help='0 picks a free port')
+    parser.add_argument('--projects', default=PROJECTS_DIR)
+    parser.add_argument('--in-place', action='store_true', help='serve projects/ itself instead of a scratch copy')
+    args = parser.parse_args(argv)
+
+    scratch = None
+    projects_dir = args.projects
+    if not args.in_place:
+        scratch = tempfile.mkdtemp(prefix='api-standin-')
+        projects_dir = os.path.join(scratch, 'projects')
+        shutil.copytree(args.projects, projects_dir)
+    server = make_server(projects_dir, args.port)
+    # load_test.py stops its stand-in with SIGTERM; clean up the scratch copy either way
+    signal.signal(signal.SIGTERM, _interrupt)
+    print(f"listening on http://127.0.0.1:{server.server_address[1]}", flush=True)
+    print(f"projects: {projects_dir}{' (scratch copy)' if scratch else ''}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if scratch:
+            shutil.rmtree(scratch, ignore_errors=True)
+        print(f"{server.counters['requests']} requests, {server.counters['errors']} server errors")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
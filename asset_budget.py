@@ -0,0 +1,254 @@
+"""Size and parse-cost budget tracker for the static assets.
+
+Measures every static asset in the tree in one parallel pass:
+    all files   raw bytes, gzip bytes
+    .css        rules, selectors, at-rules, declarations
+    .html       elements, inline style attributes, inline/external scripts
+    .js         static and dynamic imports (module graph edges)
+
+Each run appends one JSON line to asset-history.jsonl and checks the limits
+in asset-budgets.json. Exit code 1 means a budget was exceeded.
+
+Usage:
+    python asset_budget.py                 # measure, record, check
+    python asset_budget.py --no-record     # measure and check only
+    python asset_budget.py --trend style.css --metric gzip
+"""
+import argparse
+import fnmatch
+import gzip
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+
+import instrument
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_FILE = os.path.join(ROOT_DIR, 'asset-history.jsonl')
+BUDGET_FILE = os.path.join(ROOT_DIR, 'asset-budgets.json')
+
+ASSET_EXTENSIONS = {'.css', '.html', '.htm', '.js', '.json', '.png', '.jpg', '.jpeg',
+                    '.gif', '.svg', '.ico', '.webp', '.woff', '.woff2'}
+# Data, dependencies, server code and tooling state are not browser assets
+SKIP_DIRS = {'.git', 'node_modules', 'projects', 'server', '.snapshots', '__pycache__'}
+SKIP_FILES = {'package.json', 'package-lock.json', 'asset-budgets.json',
+              'server.js', 'migrate.js', 'updateAdmin.js'}
+
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_CSS_STRING = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'')
+_JS_STATIC_IMPORT = re.compile(r'^\s*(?:import\s[^;]*?from\s*|import\s*)["\'][^"\']+["\']', re.M)
+_JS_DYNAMIC_IMPORT = re.compile(r'\bimport\s*\(')
+_JS_REQUIRE = re.compile(r'\brequire\s*\(\s*["\']')
+
+
+def iter_assets(root=ROOT_DIR):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS and not d.startswith('.'))
+        for name in sorted(filenames):
+            if name in SKIP_FILES or name.endswith('.example'):
+                continue
+            if os.path.splitext(name)[1].lower() in ASSET_EXTENSIONS:
+                yield os.path.join(dirpath, name)
+
+
+def css_metrics(text):
+    text = _CSS_STRING.sub('""', _CSS_COMMENT.sub('', text))
+    rules = selectors = at_rules = declarations = 0
+    prelude_start = 0
+    stack = []
+    for pos, char in enumerate(text):
+        if char == '{':
+            prelude = text[prelude_start:pos].strip()
+            if prelude.startswith('@'):
+                at_rules += 1
+                stack.append('@')
+            else:
+                rules += 1
+                selectors += prelude.count(',') + 1
+                stack.append('rule')
+            prelude_start = pos + 1
+        elif char == '}':
+            if stack and stack.pop() == 'rule' and text[prelude_start:pos].strip():
+                declarations += 1  # last declaration without a trailing ';'
+            prelude_start = pos + 1
+        elif char == ';':
+            if stack and stack[-1] == 'rule':
+                declarations += 1
+            prelude_start = pos + 1
+    return {'rules': rules, 'selectors': selectors, 'at_rules': at_rules,
+            'declarations': declarations, 'unbalanced_braces': len(stack)}
+
+
+class _HtmlCounter(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.elements = 0
+        self.inline_styles = 0
+        self.style_blocks = 0
+        self.scripts = 0
+        self.inline_scripts = 0
+
+    def handle_starttag(self, tag, attrs):
+        self.elements += 1
+        attrs = dict(attrs)
+        if 'style' in attrs:
+            self.inline_styles += 1
+        if tag == 'style':
+            self.style_blocks += 1
+        elif tag == 'script':
+            if attrs.get('src'):
+                self.scripts += 1
+            else:
+                self.inline_scripts += 1
+
+    handle_startendtag = handle_starttag
+
+
+def html_metrics(text):
+    counter = _HtmlCounter()
+    counter.feed(text)
+    counter.close()
+    return {'elements': counter.elements, 'inline_styles': counter.inline_styles,
+            'style_blocks': counter.style_blocks, 'scripts': counter.scripts,
+            'inline_scripts': counter.inline_scripts}
+
+
+def js_metrics(text):
+    return {'imports': len(_JS_STATIC_IMPORT.findall(text)),
+            'dynamic_imports': len(_JS_DYNAMIC_IMPORT.findall(text)),
+            'requires': len(_JS_REQUIRE.findall(text))}
+
+
+def measure(path):
+    """Metrics for a single file. Runs in a worker process."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    metrics = {'raw': len(data), 'gzip': len(gzip.compress(data, 9, mtime=0))}
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.css', '.html', '.htm', '.js'):
+        text = data.decode('utf-8', errors='replace')
+        if ext == '.css':
+            metrics.update(css_metrics(text))
+        elif ext == '.js':
+            metrics.update(js_metrics(text))
+        else:
+            metrics.update(html_metrics(text))
+    return metrics
+
+
+def measure_tree(root=ROOT_DIR, workers=None):
+    paths = list(iter_assets(root))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(measure, paths, chunksize=4)
+        assets = {os.path.relpath(p, root).replace(os.sep, '/'): m for p, m in zip(paths, results)}
+
+    totals = {'files': len(assets), 'raw': 0, 'gzip': 0, 'css_rules': 0, 'css_selectors': 0,
+              'html_elements': 0, 'html_inline_styles': 0, 'js_modules': 0, 'js_imports': 0}
+    for path, m in assets.items():
+        totals['raw'] += m['raw']
+        totals['gzip'] += m['gzip']
+        totals['css_rules'] += m.get('rules', 0)
+        totals['css_selectors'] += m.get('selectors', 0)
+        totals['html_elements'] += m.get('elements', 0)
+        totals['html_inline_styles'] += m.get('inline_styles', 0)
+        if path.endswith('.js'):
+            totals['js_modules'] += 1
+            totals['js_imports'] += m['imports'] + m['dynamic_imports']
+    return assets, totals
+
+
+def _git_commit(root):
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=root,
+                             capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def check_budgets(assets, totals, budgets):
+    """Compare against budgets; returns a list of human-readable violations.
+
+    Budget keys are glob patterns over asset paths (each matching file is
+    checked on its own) or "total" for the tree-wide sums.
+    """
+    violations = []
+    for pattern, limits in budgets.items():
+        if pattern.startswith('_'):
+            continue
+        if pattern == 'total':
+            targets = [('total', totals)]
+        else:
+            targets = [(p, m) for p, m in assets.items() if fnmatch.fnmatch(p, pattern)]
+        for name, metrics in targets:
+            for metric, limit in limits.items():
+                value = metrics.get(metric)
+                if value is not None and value > limit:
+                    violations.append(f"{name}: {metric} = {value} exceeds budget {limit} ({pattern})")
+    return violations
+
+
+def load_history(path=HISTORY_FILE):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+@instrument.instrumented('asset_budget')
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Static asset size / parse-cost budgets")
+    parser.add_argument('--root', default=ROOT_DIR)
+    parser.add_argument('--budgets', default=BUDGET_FILE)
+    parser.add_argument('--history', default=HISTORY_FILE)
+    parser.add_argument('--no-record', action='store_true', help='do not append to the history file')
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--trend', metavar='ASSET', help="print the recorded history of one asset (or 'total')")
+    parser.add_argument('--metric', default='raw', help='metric shown by --trend')
+    args = parser.parse_args(argv)
+
+    if args.trend:
+        for entry in load_history(args.history):
+            metrics = entry['totals'] if args.trend == 'total' else entry['assets'].get(args.trend)
+            if metrics is not None:
+                print(f"{entry['time']}  {entry.get('commit') or '-':>8}  {metrics.get(args.metric)}")
+        return 0
+
+    started = time.perf_counter()
+    assets, totals = measure_tree(args.root, args.workers)
+    elapsed = time.perf_counter() - started
+
+    previous = load_history(args.history)
+    previous_totals = previous[-1]['totals'] if previous else {}
+    print(f"Measured {totals['files']} assets in {elapsed * 1000:.0f} ms")
+    for key in ('raw', 'gzip', 'css_rules', 'css_selectors', 'html_elements',
+                'html_inline_styles', 'js_modules', 'js_imports'):
+        change = ''
+        if key in previous_totals:
+            diff = totals[key] - previous_totals[key]
+            change = f" ({diff:+d})" if diff else ''
+        print(f"  {key:<20}{totals[key]:>10}{change}")
+
+    if not args.no_record:
+        entry = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': _git_commit(args.root),
+                 'totals': totals, 'assets': assets}
+        with open(args.history, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+
+    budgets = {}
+    if os.path.exists(args.budgets):
+        with open(args.budgets, 'r', encoding='utf-8') as f:
+            budgets = json.load(f)
+    violations = check_budgets(assets, totals, budgets)
+    for v in violations:
+        print(f"OVER BUDGET: {v}")
+    return 1 if violations else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,331 @@
+"""Precompute the analytics figures the UI derives from every project.
+
+js/analytics.js, js/clientAnalytics.js and js/finance.js pull all projects
+and recompute the same totals on every view. This job reads each data.json
+once, reduces it to a small per-project partial (cached in
+.aggregates-cache.json by mtime/size, so only changed files are parsed
+again), lays the partials out as array columns and writes one compact
+aggregates.json next to index.html:
+
+    totals       project counts per status, contract value per currency
+    finance      per project (columnar), per client (as getClientStats), per currency
+    sections     section counts per status, open / overdue sections
+    engineers    projects, sections, open / overdue sections, contract
+                 amounts and project value split as in calculateStats
+    monthly      new projects, contract value and history events per month
+
+Transactions live in the browser's localStorage, not in data.json, so the
+finance figures here come from the project fields (amount, advance,
+engineerContracts).
+
+Usage:
+    python build_aggregates.py [--full] [--output aggregates.json]
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import instrument
+from project_files import DONE_STATUSES, PROJECTS_DIR, ROOT_DIR, atomic_write, iter_data_files, load_project
+
+OUTPUT_FILE = os.path.join(ROOT_DIR, 'aggregates.json')
+CACHE_FILE = os.path.join(ROOT_DIR, '.aggregates-cache.json')
+PARALLEL_THRESHOLD = 64
+# Bump when partial() changes shape so stale cache entries are rebuilt
+CACHE_VERSION = 1
+
+
+def _number(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _text(value):
+    """Label value; numbers (hand-edited files) become strings, anything else None."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return None
+
+
+def _list(value):
+    return value if isinstance(value, list) else []
+
+
+def _month(value):
+    if isinstance(value, str) and len(value) >= 7 and value[4] == '-':
+        return value[:7]
+    return None
+
+
+def partial(path):
+    """Reduce one data.json to the fields the aggregates need. Runs in worker processes."""
+    p = load_project(path)
+    if not isinstance(p, dict):
+        raise ValueError(f"top level is {type(p).__name__}, not an object")
+    contracts = p.get('engineerContracts') if isinstance(p.get('engineerContracts'), dict) else {}
+    history_months = {}
+    for h in _list(p.get('history')):
+        month = _month(h.get('date')) if isinstance(h, dict) else None
+        if month:
+            history_months[month] = history_months.get(month, 0) + 1
+    return {
+        'id': _text(p.get('id')) or '',
+        'name': _text(p.get('name')),
+        'client': _text(p.get('client')) or 'Неизвестный',
+        'status': _text(p.get('status')) or 'in-progress',
+        'currency': _text(p.get('currency')) or 'USD',
+        'amount': _number(p.get('amount')),
+        'advance': _number(p.get('advance')),
+        'created': _month(p.get('createdAt')),
+        'contracts': {str(k): _number(v) for k, v in contracts.items()},
+        'sections': [[_text(s.get('engineer')) or None, _text(s.get('status')) or None,
+                      (s.get('dueDate') if isinstance(s.get('dueDate'), str) else '')[:10] or None]
+                     for s in _list(p.get('sections')) if isinstance(s, dict)],
+        'history': history_months,
+    }
+
+
+def _partial_safe(path):
+    try:
+        return partial(path), None
+    # Any shape of bad data is an error of that one folder, not of the whole build
+    except (OSError, ValueError, TypeError, AttributeError, KeyError, IndexError) as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def load_cache(cache_file=CACHE_FILE):
+    try:
+        with open(cache_file, encoding='utf-8') as f:
+            cache = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    return cache.get('projects', {}) if cache.get('version') == CACHE_VERSION else {}
+
+
+def refresh(projects_dir=PROJECTS_DIR, cache_file=CACHE_FILE, full=False, workers=None):
+    """Return ({folder: partial}, errors, parsed_count), re-reading only changed files."""
+    cached = {} if full else load_cache(cache_file)
+    current, changed = {}, []
+    for folder, path, st in iter_data_files(projects_dir):
+        entry = cached.get(folder)
+        if entry and entry['stat'] == [st.st_mtime_ns, st.st_size]:
+            current[folder] = entry
+        else:
+            changed.append((folder, path, st))
+
+    if len(changed) >= PARALLEL_THRESHOLD:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_partial_safe, [c[1] for c in changed], chunksize=32))
+    else:
+        results = [_partial_safe(c[1]) for c in changed]
+
+    errors = []
+    for (folder, _, st), (data, error) in zip(changed, results):
+        if error:
+            errors.append((folder, error))
+        else:
+            current[folder] = {'stat': [st.st_mtime_ns, st.st_size], 'data': data}
+
+    if changed or len(current) != len(cached):
+        atomic_write(cache_file, json.dumps({'version': CACHE_VERSION, 'projects': current},
+                                            ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    return {folder: entry['data'] for folder, entry in current.items()}, errors, len(changed)
+
+
+class _Codes:
+    """Interns category labels to small ints for the array columns."""
+
+    def __init__(self):
+        self.labels = []
+        self.index = {}
+
+    def __call__(self, label):
+        code = self.index.get(label)
+        if code is None:
+            code = self.index[label] = len(self.labels)
+            self.labels.append(label)
+        return code
+
+
+def _group_sum(keys, values, size):
+    sums = array('d', bytes(8 * size))
+    for k, v in zip(keys, values):
+        sums[k] += v
+    return sums
+
+
+def _group_count(keys, size):
+    counts = array('l', bytes(array('l').itemsize * size))
+    for k in keys:
+        counts[k] += 1
+    return counts
+
+
+def build(partials, today=None):
+    """Aggregate {folder: partial} into the aggregates.json structure."""
+    today = today or datetime.date.today().isoformat()
+    folders = sorted(partials)
+    clients, currencies, statuses, months = _Codes(), _Codes(), _Codes(), _Codes()
+    engineers, section_statuses = _Codes(), _Codes()
+
+    # Project columns
+    amount, advance, costs = array('d'), array('d'), array('d')
+    client_col, currency_col, status_col, month_col = array('l'), array('l'), array('l'), array('l')
+    done_col = array('b')
+    # Section columns
+    sec_project, sec_engineer, sec_status = array('l'), array('l'), array('l')
+    sec_open, sec_overdue = array('b'), array('b')
+    history_by_month = {}
+
+    for i, folder in enumerate(folders):
+        p = partials[folder]
+        amount.append(p['amount'])
+        advance.append(p['advance'])
+        costs.append(sum(p['contracts'].values()))
+        client_col.append(clients(p['client']))
+        currency_col.append(currencies(p['currency']))
+        status_col.append(statuses(p['status']))
+        month_col.append(months(p['created']))
+        done_col.append(p['status'] in DONE_STATUSES)
+        for engineer, status, due in p['sections']:
+            is_open = status not in DONE_STATUSES
+            sec_project.append(i)
+            sec_engineer.append(engineers(engineer))
+            sec_status.append(section_statuses(status))
+            sec_open.append(is_open)
+            sec_overdue.append(is_open and due is not None and due < today
+                               and p['status'] not in ('archive', 'completed'))
+        for month, n in p['history'].items():
+            history_by_month[month] = history_by_month.get(month, 0) + n
+
+    n_clients, n_currencies = len(clients.labels), len(currencies.labels)
+
+    # Totals and per-currency finance: one pass over the columns per figure
+    project_status = _group_count(status_col, len(statuses.labels))
+    currency_value = _group_sum(currency_col, amount, n_currencies)
+    advances = _group_sum(currency_col, advance, n_currencies)
+    engineer_costs = _group_sum(currency_col, costs, n_currencies)
+
+    # Per client: the same key space crossed with currency
+    cc_keys = array('l', (c * n_currencies + cur for c, cur in zip(client_col, currency_col)))
+    client_value = _group_sum(cc_keys, amount, n_clients * n_currencies)
+    client_projects = _group_count(client_col, n_clients)
+    client_done = _group_sum(client_col, done_col, n_clients)
+    archived = statuses.index.get('archive', -1)
+    client_active = _group_sum(client_col, (not d and s != archived for d, s in zip(done_col, status_col)),
+                               n_clients)
+
+    # Sections and engineers
+    n_eng = len(engineers.labels)
+    section_status = _group_count(sec_status, len(section_statuses.labels))
+    eng_sections = _group_count(sec_engineer, n_eng)
+    eng_open = _group_sum(sec_engineer, sec_open, n_eng)
+    eng_overdue = _group_sum(sec_engineer, sec_overdue, n_eng)
+    pairs = sorted(set(zip(sec_project, sec_engineer)))
+    eng_projects = _group_count((e for _, e in pairs), n_eng)
+    # Project value split evenly between the engineers on it (calculateStats in js/analytics.js)
+    named = [(p, e) for p, e in pairs if engineers.labels[e] is not None]
+    per_project = _group_count((p for p, _ in named), len(folders))
+    eng_value = _group_sum((e for _, e in named), (amount[p] / per_project[p] for p, _ in named), n_eng)
+    eng_contracts = {}
+    for folder in folders:
+        for name, contract in partials[folder]['contracts'].items():
+            eng_contracts[name] = eng_contracts.get(name, 0) + contract
+
+    # Monthly series over the full range seen
+    month_labels = sorted({m for m in months.labels if m} | set(history_by_month))
+    position = {m: k for k, m in enumerate(month_labels)}
+    new_projects = [0] * len(month_labels)
+    monthly_value = {cur: [0.0] * len(month_labels) for cur in currencies.labels}
+    for m, cur, a in zip(month_col, currency_col, amount):
+        label = months.labels[m]
+        if label:
+            new_projects[position[label]] += 1
+            monthly_value[currencies.labels[cur]][position[label]] += a
+
+    def money(x):
+        return round(x, 2)
+
+    return {
+        'generatedAt': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'totals': {
+            'projects': len(folders),
+            'byStatus': dict(zip(statuses.labels, project_status)),
+            'valueByCurrency': {c: money(v) for c, v in zip(currencies.labels, currency_value)},
+        },
+        'finance': {
+            # Columnar: one list per field, row i is project i
+            'byProject': {
+                'folder': folders,
+                'id': [partials[f]['id'] for f in folders],
+                'name': [partials[f]['name'] for f in folders],
+                'client': [clients.labels[c] for c in client_col],
+                'currency': [currencies.labels[c] for c in currency_col],
+                'amount': [money(a) for a in amount],
+                'advance': [money(a) for a in advance],
+                'engineerCosts': [money(c) for c in costs],
+            },
+            'byClient': sorted(({'name': name, 'projectCount': client_projects[c],
+                                 'completedProjects': int(client_done[c]), 'activeProjects': int(client_active[c]),
+                                 'currencies': {cur: money(client_value[c * n_currencies + k])
+                                                for k, cur in enumerate(currencies.labels)
+                                                if client_value[c * n_currencies + k]},
+                                 'totalAmount': money(sum(client_value[c * n_currencies:(c + 1) * n_currencies]))}
+                                for c, name in enumerate(clients.labels)),
+                               key=lambda x: -x['totalAmount']),
+            'byCurrency': {cur: {'amount': money(currency_value[k]), 'advance': money(advances[k]),
+                                 'outstanding': money(currency_value[k] - advances[k]),
+                                 'engineerCosts': money(engineer_costs[k])}
+                           for k, cur in enumerate(currencies.labels)},
+        },
+        'sections': {
+            'total': len(sec_status),
+            'byStatus': {label or '(none)': n for label, n in zip(section_statuses.labels, section_status)},
+            'open': sum(sec_open),
+            'overdue': sum(sec_overdue),
+        },
+        'engineers': sorted(({'name': name, 'projects': eng_projects[e],
+                              'sections': eng_sections[e], 'openSections': int(eng_open[e]),
+                              'overdueSections': int(eng_overdue[e]), 'totalValue': round(eng_value[e]),
+                              'contracts': money(eng_contracts.get(name, 0))}
+                             for e, name in enumerate(engineers.labels) if name),
+                            key=lambda x: -x['projects']),
+        'monthly': {
+            'months': month_labels,
+            'newProjects': new_projects,
+            'contractValue': {cur: [money(v) for v in values] for cur, values in monthly_value.items()},
+            'historyEvents': [history_by_month.get(m, 0) for m in month_labels],
+        },
+    }
+
+
+@instrument.instrumented('build_aggregates')
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build aggregates.json for the analytics views")
+    parser.add_argument('--projects', default=PROJECTS_DIR)
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    parser.add_argument('--cache', default=CACHE_FILE)
+    parser.add_argument('--full', action='store_true', help='ignore the cache and re-read every data.json')
+    parser.add_argument('--date', help='reference date for overdue sections (default: today)')
+    args = parser.parse_args(argv)
+
+    partials, errors, parsed = refresh(args.projects, args.cache, args.full)
+    aggregates = build(partials, args.date)
+    atomic_write(args.output, json.dumps(aggregates, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    for folder, error in errors:
+        print(f"  unreadable: {folder}: {error}")
+    print(f"{args.output}: {len(partials)} projects ({parsed} re-read), "
+          f"{os.path.getsize(args.output)} bytes")
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
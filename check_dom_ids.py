@@ -0,0 +1,242 @@
+"""Duplicate-id and dangling DOM-reference checker for the static pages.
+
+Indexes, in one parallel pass over the tree, every id defined in a page's
+HTML, in the HTML templates and `.id = '...'` assignments of its scripts,
+and every id looked up through getElementById / openModal / closeModal /
+querySelector('#...') / closest('#...') or styled through a CSS #selector. Each page is checked
+against its own scripts:
+
+    app          index.html, js/*.js, style.css
+    login        login.html (inline scripts and styles)
+    foundation   foundation/index.html, foundation/js/*.js, foundation/style.css
+
+Reported per page:
+    duplicate   the id is defined more than once in the static HTML, or both
+                in the HTML and in a script template (lookups return
+                whichever element comes first)
+    missing     a literal lookup whose id is defined nowhere
+    unused      a static id that no script, selector or template refers to
+
+Template ids with interpolation (id="task-${id}", 'file-comment-' + id) are
+kept as prefix/suffix patterns: they satisfy matching lookups but are never
+reported themselves. Exit code 1 when there are duplicates in the static
+HTML or missing ids.
+
+Usage:
+    python check_dom_ids.py [--page app] [--id employee-form] [--unused] [--json]
+"""
+import argparse
+import bisect
+import glob
+import json
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import instrument
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PAGES = {
+    'app': ['index.html', 'js/*.js', 'style.css'],
+    'login': ['login.html'],
+    'foundation': ['foundation/index.html', 'foundation/js/*.js', 'foundation/style.css'],
+}
+
+# Not data-id="..." and not el.id = '...' (matched by _ID_PROPERTY)
+_ID_ATTR = re.compile(r'''(?<![\w.-])id\s*=\s*(?:"([^"\n]*)"|'([^'\n]*)')''')
+_ID_PROPERTY = re.compile(r'''\.id\s*=\s*(['"`])([^'"`\n]*)\1''')
+# openModal / closeModal (js/utils.js) look their argument up by id
+_BY_ID = re.compile(r'''(?:getElementById|openModal|closeModal)\(\s*(['"`])([^'"`\n]*)\1\s*(\+)?''')
+_SELECTOR_CALL = re.compile(r'''(?:querySelector(?:All)?|closest)\(\s*(['"`])([^'"`\n]*)\1''')
+_HASH = re.compile(r'#([A-Za-z_][\w-]*)')
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+# Text up to each brace; a run ending in '{' is a selector (or at-rule) prelude
+_CSS_RUN = re.compile(r'([^{}]*)([{}])')
+_STYLE_BLOCK = re.compile(r'<style[^>]*>(.*?)</style>', re.S | re.I)
+_NEWLINE = re.compile(r'\n')
+# Interpolation inside a template literal or string concatenation
+_DYNAMIC = re.compile(r'''\$\{|['"`]\s*\+|\+\s*['"`]''')
+
+
+def _split_dynamic(value):
+    """(prefix, suffix) around the interpolated part of a template id."""
+    parts = _DYNAMIC.split(value)
+    prefix, suffix = parts[0], parts[-1] if len(parts) > 1 else ''
+    # Drop the rest of the interpolated expression: "${a.b}-x" -> "-x"
+    suffix = suffix[suffix.rfind('}') + 1:] if '}' in suffix else ''
+    return prefix, suffix
+
+
+class FileScan:
+    __slots__ = ('path', 'ids', 'patterns', 'refs', 'pattern_refs', 'styled')
+
+    def __init__(self, path):
+        self.path = path
+        self.ids = []           # (id, line, 'html' | 'js')
+        self.patterns = []      # (prefix, suffix, line)
+        self.refs = []          # (id, line)
+        self.pattern_refs = []  # (prefix, suffix, line)
+        self.styled = set()
+
+
+def scan_file(path):
+    with open(path, encoding='utf-8', errors='replace') as f:
+        text = f.read()
+    rel = os.path.relpath(path, ROOT_DIR).replace(os.sep, '/')
+    scan = FileScan(rel)
+    newlines = [m.start() for m in _NEWLINE.finditer(text)]
+
+    def line(pos):
+        return bisect.bisect_left(newlines, pos) + 1
+
+    if path.endswith('.css'):
+        scan.styled.update(_css_ids(text))
+        return scan
+
+    kind = 'html' if path.endswith('.html') else 'js'
+    for m in _ID_ATTR.finditer(text):
+        _define(scan, m.group(1) if m.group(1) is not None else m.group(2), line(m.start()), kind)
+    if kind == 'js':
+        for m in _ID_PROPERTY.finditer(text):
+            _define(scan, m.group(2), line(m.start()), kind)
+    else:
+        for m in _STYLE_BLOCK.finditer(text):
+            scan.styled.update(_css_ids(m.group(1)))
+
+    for m in _BY_ID.finditer(text):
+        value = m.group(2)
+        if m.group(3) or _DYNAMIC.search(value):
+            prefix, suffix = _split_dynamic(value) if not m.group(3) else (value, '')
+            if prefix or suffix:
+                scan.pattern_refs.append((prefix, suffix, line(m.start())))
+        elif value:
+            scan.refs.append((value, line(m.start())))
+    for m in _SELECTOR_CALL.finditer(text):
+        # Ids after an interpolation are partial and cannot be resolved
+        selector = _DYNAMIC.split(m.group(2))[0]
+        for ref in _HASH.findall(selector):
+            scan.refs.append((ref, line(m.start())))
+    return scan
+
+
+def _define(scan, value, line, kind):
+    if _DYNAMIC.search(value):
+        prefix, suffix = _split_dynamic(value)
+        if prefix or suffix:
+            scan.patterns.append((prefix, suffix, line))
+    elif value:
+        scan.ids.append((value, line, kind))
+
+
+def _css_ids(text):
+    found = set()
+    for prelude, brace in _CSS_RUN.findall(_CSS_COMMENT.sub('', text)):
+        if brace == '{' and not prelude.lstrip().startswith('@'):
+            found.update(_HASH.findall(prelude))
+    return found
+
+
+def page_files(page):
+    files = []
+    for pattern in PAGES[page]:
+        files.extend(sorted(glob.glob(os.path.join(ROOT_DIR, pattern))))
+    return files
+
+
+def scan_pages(pages):
+    """{page: [FileScan]}, every file read once across all pages in parallel."""
+    files = {page: page_files(page) for page in pages}
+    unique = sorted({path for paths in files.values() for path in paths})
+    with ThreadPoolExecutor(max_workers=min(16, len(unique) or 1)) as pool:
+        scans = dict(zip(unique, pool.map(scan_file, unique)))
+    return {page: [scans[path] for path in paths] for page, paths in files.items()}
+
+
+def _matches(value, prefix, suffix):
+    return len(value) > len(prefix) + len(suffix) and value.startswith(prefix) and value.endswith(suffix)
+
+
+def check_page(scans):
+    """{'defined' | 'duplicate' | 'missing' | 'unused': {id: [locations]}} for one page."""
+    defined, patterns, styled = {}, [], set()
+    refs, pattern_refs = {}, []
+    for scan in scans:
+        for value, line, kind in scan.ids:
+            defined.setdefault(value, []).append((f"{scan.path}:{line}", kind))
+        patterns.extend((prefix, suffix) for prefix, suffix, _ in scan.patterns)
+        for value, line in scan.refs:
+            refs.setdefault(value, []).append(f"{scan.path}:{line}")
+        pattern_refs.extend((prefix, suffix) for prefix, suffix, _ in scan.pattern_refs)
+        styled |= scan.styled
+
+    duplicate = {}
+    for value, places in defined.items():
+        html = [p for p, kind in places if kind == 'html']
+        # The same template id in several script branches is normal (one modal, several renderers)
+        if len(html) > 1 or (html and len(places) > len(html)):
+            duplicate[value] = [p for p, _ in places]
+
+    missing = {}
+    for value, places in refs.items():
+        if value in defined:
+            continue
+        if any(_matches(value, prefix, suffix) for prefix, suffix in patterns):
+            continue
+        missing[value] = places
+
+    unused = {}
+    for value, places in defined.items():
+        if value in refs or value in styled or any(_matches(value, prefix, suffix) for prefix, suffix in pattern_refs):
+            continue
+        unused[value] = [p for p, _ in places]
+    return {'defined': {value: [p for p, _ in places] for value, places in defined.items()},
+            'duplicate': duplicate, 'missing': missing, 'unused': unused}
+
+
+def check(pages=None):
+    return {page: check_page(scans) for page, scans in scan_pages(pages or list(PAGES)).items()}
+
+
+@instrument.instrumented('check_dom_ids')
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report duplicate, missing and unused DOM ids")
+    parser.add_argument('--page', choices=sorted(PAGES), action='append', help='check only this page (repeatable)')
+    parser.add_argument('--id', action='append', dest='ids',
+                        help='report only this id, with where it is defined (repeatable)')
+    parser.add_argument('--unused', action='store_true', help='also list unused ids')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+
+    results = check(args.page)
+    if args.ids:
+        wanted = set(args.ids)
+        results = {page: {kind: {k: v for k, v in found.items() if k in wanted} for kind, found in result.items()}
+                   for page, result in results.items()}
+    for result in results.values():
+        # Every id is "defined" somewhere; only worth listing for the ids asked about
+        if not args.ids:
+            result.pop('defined')
+            if not args.unused:
+                result.pop('unused')
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=1))
+    else:
+        for page, result in results.items():
+            for kind, found in result.items():
+                for value, places in sorted(found.items()):
+                    print(f"{page}: {kind} #{value}  ({len(places)}x) {', '.join(places)}")
+        summary = ', '.join(f"{page}: " + ' / '.join(f"{len(found)} {kind}" for kind, found in result.items())
+                            for page, result in results.items())
+        print(summary)
+
+    failed = any(result['missing'] or any(sum(p.split(':')[0].endswith('.html') for p in places) > 1
+                                          for places in result['duplicate'].values())
+                 for result in results.values())
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
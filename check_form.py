@@ -1,9 +1,7 @@
+"""Runs check_dom_ids.py for id="employee-form" on the app page."""
+import sys
 
-with open(r'e:\ИИ\NP\index.html', 'r', encoding='utf-8') as f:
-    content = f.read()
-    if 'id="employee-form"' in content:
-        print("Found id=\"employee-form\"")
-        count = content.count('id="employee-form"')
-        print(f"Count: {count}")
-    else:
-        print("Not found")
+import check_dom_ids
+
+if __name__ == '__main__':
+    sys.exit(check_dom_ids.main(['--page', 'app', '--id', 'employee-form'] + sys.argv[1:]))
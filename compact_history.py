@@ -0,0 +1,279 @@
+"""Move old history entries out of projects/*/data.json into monthly archives.
+
+data.json keeps the newest --keep entries (and, with --days, everything newer
+than that); older entries are appended to gzip files next to it:
+
+    projects/<folder>/history-archive/2025-11.jsonl.gz   one entry per line
+    projects/<folder>/history-archive/index.json         months, counts, date ranges
+
+Archives are append-only: each run adds one gzip member per month, which
+gzip readers see as a single continuous stream. data.json gets a small
+"historyArchive" stub ({count, through}) so clients know there is more.
+
+Safety:
+    - a <folder>/data.json.lock file keeps two compactors off the same project
+    - archives and index are written and fsynced before data.json is replaced
+    - data.json is re-stat'ed right before the atomic replace; if anything
+      rewrote it meanwhile the project is skipped and picked up next run
+    - entries already in the archives (from a run that died between the two
+      steps, or written back by a client holding pre-compaction history)
+      are recognised by hash and never archived twice
+
+Usage:
+    python compact_history.py compact [--keep 100] [--days 90] [--dry-run]
+    python compact_history.py history FOLDER [--since 2025-01-01]   # full history, oldest first
+    python compact_history.py stats
+"""
+import argparse
+import collections
+import datetime
+import glob
+import gzip
+import hashlib
+import json
+import os
+import sys
+import time
+
+import instrument
+import json_stream
+from project_files import PROJECTS_DIR, atomic_write, dump_project, iter_data_files, load_project
+
+ARCHIVE_DIR = 'history-archive'
+INDEX_FILE = 'index.json'
+LOCK_SUFFIX = '.lock'
+DEFAULT_KEEP = 100
+# A lock older than this belongs to a compactor that died
+LOCK_STALE_S = 600
+
+
+class Busy(Exception):
+    """The project is locked or changed underneath us; try again later."""
+
+
+def _entry_hash(entry):
+    raw = json.dumps(entry, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _date(entry):
+    """The entry's date, or '' when it has none or a non-string one (hand-edited files)."""
+    date = entry.get('date') if isinstance(entry, dict) else None
+    return date if isinstance(date, str) else ''
+
+
+def _month(entry):
+    date = _date(entry)
+    if len(date) >= 7 and date[4] == '-':
+        return date[:7]
+    return 'undated'
+
+
+class ProjectLock:
+    def __init__(self, data_path):
+        self.path = data_path + LOCK_SUFFIX
+
+    def __enter__(self):
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                age = time.time() - os.stat(self.path).st_mtime
+            except FileNotFoundError:
+                age = LOCK_STALE_S
+            if age < LOCK_STALE_S:
+                raise Busy('locked by another compactor')
+            os.remove(self.path)
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        with os.fdopen(fd, 'w') as f:
+            f.write(f"{os.getpid()} {time.time():.0f}\n")
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def archive_dir(data_path):
+    return os.path.join(os.path.dirname(data_path), ARCHIVE_DIR)
+
+
+def load_index(data_path):
+    try:
+        with open(os.path.join(archive_dir(data_path), INDEX_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'count': 0, 'months': {}}
+
+
+def _append_month(directory, month, entries):
+    path = os.path.join(directory, f"{month}.jsonl.gz")
+    payload = ''.join(json.dumps(e, ensure_ascii=False) + '\n' for e in entries).encode('utf-8')
+    with open(path, 'ab') as f:
+        f.write(gzip.compress(payload, mtime=0))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _archived_hashes(directory):
+    """Counter of entry hashes in every month file, indexed or not."""
+    seen = collections.Counter()
+    for path in glob.glob(os.path.join(directory, '*.jsonl.gz')):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                seen[_entry_hash(json.loads(line))] += 1
+    return seen
+
+
+def split_history(history, keep=DEFAULT_KEEP, days=None, now=None):
+    """Return (to_archive, to_keep). Entries stay if among the newest keep or within days."""
+    cutoff = None
+    if days is not None:
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        cutoff = (now - datetime.timedelta(days=days)).strftime('%Y-%m-%dT%H:%M:%S')
+    boundary = max(len(history) - keep, 0) if keep is not None else len(history)
+    if cutoff is not None:
+        # history is appended in time order; keep from the first recent entry on
+        for i, entry in enumerate(history[:boundary]):
+            if _date(entry) >= cutoff:
+                boundary = i
+                break
+    return history[:boundary], history[boundary:]
+
+
+def compact_project(data_path, keep=DEFAULT_KEEP, days=None, dry_run=False):
+    """Archive old entries of one project. Returns the number of entries newly archived."""
+    with ProjectLock(data_path):
+        before = os.stat(data_path)
+        project = load_project(data_path)
+        history = project.get('history')
+        if not isinstance(history, list):
+            return 0
+        old, recent = split_history(history, keep, days)
+        index = load_index(data_path)
+
+        # Entries can come back after archiving: a run that died before replacing
+        # data.json, or a client saving the history it loaded before compaction.
+        # Each archived copy accounts for one identical entry in old.
+        directory = archive_dir(data_path)
+        seen = _archived_hashes(directory) if old else collections.Counter()
+        fresh = []
+        for entry in old:
+            h = _entry_hash(entry)
+            if seen[h]:
+                seen[h] -= 1
+            else:
+                fresh.append(entry)
+        if not old or dry_run:
+            return len(fresh)
+
+        if fresh:
+            os.makedirs(directory, exist_ok=True)
+            by_month = {}
+            for entry in fresh:
+                by_month.setdefault(_month(entry), []).append(entry)
+            for month, entries in sorted(by_month.items()):
+                _append_month(directory, month, entries)
+                info = index['months'].setdefault(month, {'count': 0, 'first': None, 'last': None})
+                info['count'] += len(entries)
+                dates = [_date(e) for e in entries if _date(e)]
+                if dates:
+                    info['first'] = min([d for d in (info['first'], *dates) if d])
+                    info['last'] = max([d for d in (info['last'], *dates) if d])
+            index['count'] += len(fresh)
+            index.pop('last_hash', None)
+            atomic_write(os.path.join(directory, INDEX_FILE),
+                         json.dumps(index, ensure_ascii=False, indent=2).encode('utf-8'))
+
+        project['history'] = recent
+        dated = [m['last'] for m in index['months'].values() if m.get('last')]
+        project['historyArchive'] = {'count': index['count'], 'through': max(dated) if dated else None}
+        data = dump_project(project)
+
+        after = os.stat(data_path)
+        if (after.st_mtime_ns, after.st_size) != (before.st_mtime_ns, before.st_size):
+            raise Busy('data.json changed during compaction')
+        atomic_write(data_path, data)
+        return len(fresh)
+
+
+def iter_archived(data_path, since=None):
+    """Archived entries of one project, oldest month first."""
+    directory = archive_dir(data_path)
+    index = load_index(data_path)
+    for month in sorted(index['months']):
+        info = index['months'][month]
+        if since and info.get('last') and info['last'] < since:
+            continue
+        with gzip.open(os.path.join(directory, f"{month}.jsonl.gz"), 'rt', encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                if since is None or _date(entry) >= since:
+                    yield entry
+
+
+def iter_full_history(data_path, since=None):
+    """Archived entries followed by the ones still in data.json, streamed."""
+    yield from iter_archived(data_path, since)
+    yield from json_stream.history_since(data_path, since)
+
+
+def compact_tree(projects_dir=PROJECTS_DIR, keep=DEFAULT_KEEP, days=None, dry_run=False):
+    """Yield (folder, moved, error) for every project."""
+    for folder, path, _ in iter_data_files(projects_dir):
+        try:
+            yield folder, compact_project(path, keep, days, dry_run), None
+        except Busy as e:
+            yield folder, 0, str(e)
+        except (OSError, ValueError) as e:
+            yield folder, 0, f"{type(e).__name__}: {e}"
+
+
+@instrument.instrumented('compact_history')
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive old project history entries")
+    parser.add_argument('--projects', default=PROJECTS_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('compact', help='move old entries into monthly archives')
+    p.add_argument('--keep', type=int, default=DEFAULT_KEEP, help='newest entries to keep in data.json')
+    p.add_argument('--days', type=int, help='also keep everything newer than this many days')
+    p.add_argument('--dry-run', action='store_true')
+
+    p = sub.add_parser('history', help='print the full history of one project as JSON lines')
+    p.add_argument('folder')
+    p.add_argument('--since')
+
+    sub.add_parser('stats', help='archived / live entries per project')
+
+    args = parser.parse_args(argv)
+    if args.command == 'compact':
+        total = failed = 0
+        for folder, moved, error in compact_tree(args.projects, args.keep, args.days, args.dry_run):
+            if error:
+                failed += 1
+                print(f"  skipped {folder}: {error}")
+            elif moved:
+                total += moved
+                print(f"  {folder}: {moved} entries {'would be ' if args.dry_run else ''}archived")
+        print(f"{'Would archive' if args.dry_run else 'Archived'} {total} entries, {failed} projects skipped")
+        return 1 if failed else 0
+
+    if args.command == 'history':
+        path = os.path.join(args.projects, args.folder, 'data.json')
+        for entry in iter_full_history(path, args.since):
+            print(json.dumps(entry, ensure_ascii=False))
+        return 0
+
+    for folder, path, _ in iter_data_files(args.projects):
+        index = load_index(path)
+        live = sum(1 for _ in json_stream.iter_items(path, 'history'))
+        if index['count'] or live:
+            print(f"{folder}  live={live}  archived={index['count']}  months={len(index['months'])}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,258 @@
+"""Find identical uploads across project folders and hard-link them together.
+
+The same PDF or photo is often uploaded to several projects or sections and
+stored again each time. This tool hashes every file under projects/ (except
+data.json and history archives), groups identical content and replaces the
+extra copies with hard links to one of them.
+
+Hashes are cached in .upload-hashes.sqlite keyed by path, size and mtime, so
+a rerun only reads new or changed files. Files with a size nobody else has
+cannot have a duplicate and are never read at all.
+
+Note: hard-linked copies share their bytes. Uploads are write-once (the server
+writes new files, it does not edit them in place), which is what makes this safe.
+
+Usage:
+    python dedup_uploads.py report [--top 20] [--json]
+    python dedup_uploads.py link [--min-size 4096] [--dry-run]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import stat
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import instrument
+from compact_history import ARCHIVE_DIR
+from project_files import DATA_FILE, PROJECTS_DIR, ROOT_DIR
+
+CACHE_FILE = os.path.join(ROOT_DIR, '.upload-hashes.sqlite')
+
+# Files and folders that are project metadata, not uploads
+SKIP_DIRS = {ARCHIVE_DIR}
+SKIP_SUFFIXES = ('.lock', '.tmp')
+
+READ_SIZE = 1 << 20
+# hashlib releases the GIL on large updates, so threads keep several disks busy
+HASH_WORKERS = 8
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hashes (
+    path      TEXT PRIMARY KEY,
+    size      INTEGER NOT NULL,
+    mtime_ns  INTEGER NOT NULL,
+    sha256    TEXT NOT NULL
+);
+"""
+
+
+def iter_uploads(projects_dir=PROJECTS_DIR):
+    """Yield (relative_path, stat) for every uploaded file."""
+    for dirpath, dirnames, filenames in os.walk(projects_dir):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS and not d.startswith('.'))
+        top_level = os.path.dirname(os.path.normpath(dirpath)) == os.path.normpath(projects_dir)
+        for name in sorted(filenames):
+            if (top_level and name == DATA_FILE) or name.endswith(SKIP_SUFFIXES):
+                continue
+            path = os.path.join(dirpath, name)
+            st = os.lstat(path)
+            if stat.S_ISREG(st.st_mode):
+                yield os.path.relpath(path, projects_dir), st
+
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(READ_SIZE)
+            if not chunk:
+                return h.hexdigest()
+            h.update(chunk)
+
+
+def connect(cache_file=CACHE_FILE):
+    conn = sqlite3.connect(cache_file)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def scan(conn, projects_dir=PROJECTS_DIR, min_size=1, workers=HASH_WORKERS):
+    """Return [(rel_path, stat, sha256)] for every file that may have a twin.
+
+    sha256 is None for files whose size is unique; they are not read.
+    """
+    files = [(rel, st) for rel, st in iter_uploads(projects_dir) if st.st_size >= min_size]
+    sizes = {}
+    for _, st in files:
+        sizes[st.st_size] = sizes.get(st.st_size, 0) + 1
+
+    cached = {row[0]: row[1:] for row in conn.execute('SELECT path, size, mtime_ns, sha256 FROM hashes')}
+    result, todo = [], []
+    for rel, st in files:
+        hit = cached.get(rel)
+        if hit and hit[0] == st.st_size and hit[1] == st.st_mtime_ns:
+            result.append((rel, st, hit[2]))
+        elif sizes[st.st_size] > 1:
+            todo.append((rel, st))
+        else:
+            result.append((rel, st, None))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        digests = list(pool.map(lambda item: file_hash(os.path.join(projects_dir, item[0])), todo))
+    with conn:
+        conn.executemany('INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?)',
+                         [(rel, st.st_size, st.st_mtime_ns, d) for (rel, st), d in zip(todo, digests)])
+        seen = [(rel,) for rel, _ in files]
+        conn.execute('CREATE TEMP TABLE seen (path TEXT PRIMARY KEY)')
+        conn.executemany('INSERT INTO seen VALUES (?)', seen)
+        conn.execute('DELETE FROM hashes WHERE path NOT IN (SELECT path FROM seen)')
+        conn.execute('DROP TABLE seen')
+    result.extend((rel, st, d) for (rel, st), d in zip(todo, digests))
+    result.sort()
+    return result, len(todo)
+
+
+def duplicate_groups(scanned):
+    """{sha256: [(rel_path, stat), ...]} for content stored more than once."""
+    groups = {}
+    for rel, st, digest in scanned:
+        if digest is not None:
+            groups.setdefault(digest, []).append((rel, st))
+    return {d: members for d, members in groups.items() if len(members) > 1}
+
+
+def _inodes(members):
+    return {(st.st_dev, st.st_ino) for _, st in members}
+
+
+def summarize(scanned, groups):
+    logical = sum(st.st_size for _, st, _ in scanned)
+    physical = sum(st.st_size for st in {(st.st_dev, st.st_ino): st for _, st, _ in scanned}.values())
+    reclaimable = sum(members[0][1].st_size * (len(_inodes(members)) - 1) for members in groups.values())
+    return {
+        'files': len(scanned),
+        'logical_bytes': logical,
+        'physical_bytes': physical,
+        'duplicate_groups': len(groups),
+        'duplicate_files': sum(len(m) - 1 for m in groups.values()),
+        'already_linked_bytes': logical - physical,
+        'reclaimable_bytes': reclaimable,
+    }
+
+
+def link_group(projects_dir, members, dry_run=False):
+    """Point every copy at the first one. Returns (bytes freed, relinked paths)."""
+    keep_rel, keep_st = members[0]
+    keep_path = os.path.join(projects_dir, keep_rel)
+    keep_inode = (keep_st.st_dev, keep_st.st_ino)
+    # An inode is only freed once every name pointing at it has been relinked
+    names = {}
+    for _, st in members:
+        names[(st.st_dev, st.st_ino)] = names.get((st.st_dev, st.st_ino), 0) + 1
+    freed, linked, counted = 0, [], set()
+    for rel, st in members[1:]:
+        inode = (st.st_dev, st.st_ino)
+        if inode == keep_inode:
+            continue
+        path = os.path.join(projects_dir, rel)
+        if dry_run:
+            if inode not in counted and st.st_nlink <= names[inode]:
+                freed += st.st_size
+            counted.add(inode)
+            continue
+        # The file may have been replaced since it was hashed
+        current = os.lstat(path)
+        if (current.st_size, current.st_mtime_ns) != (st.st_size, st.st_mtime_ns):
+            continue
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.link(keep_path, tmp_path)
+        except OSError as e:
+            print(f"  cannot link {rel}: {e}")
+            continue
+        os.replace(tmp_path, path)
+        linked.append(rel)
+        if inode not in counted and st.st_nlink <= names[inode]:
+            freed += st.st_size
+        counted.add(inode)
+    return freed, linked
+
+
+def _human(n):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(n) < 1024 or unit == 'GB':
+            return f"{n:.1f} {unit}" if unit != 'B' else f"{n} B"
+        n /= 1024
+
+
+@instrument.instrumented('dedup_uploads')
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deduplicate uploaded project files with hard links")
+    parser.add_argument('--projects', default=PROJECTS_DIR)
+    parser.add_argument('--cache', default=CACHE_FILE)
+    parser.add_argument('--min-size', type=int, default=1, help='ignore files smaller than this many bytes')
+    parser.add_argument('--workers', type=int, default=HASH_WORKERS)
+    # The same options after the command; SUPPRESS keeps a value given before it
+    common = argparse.ArgumentParser(add_help=False, argument_default=argparse.SUPPRESS)
+    common.add_argument('--projects')
+    common.add_argument('--cache')
+    common.add_argument('--min-size', type=int, help='ignore files smaller than this many bytes')
+    common.add_argument('--workers', type=int)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('report', parents=[common], help='show duplicate content and potential savings')
+    p.add_argument('--top', type=int, default=20, help='largest duplicate groups to list')
+    p.add_argument('--json', action='store_true')
+
+    p = sub.add_parser('link', parents=[common], help='replace duplicate copies with hard links')
+    p.add_argument('--dry-run', action='store_true')
+
+    args = parser.parse_args(argv)
+    conn = connect(args.cache)
+    scanned, hashed = scan(conn, args.projects, args.min_size, args.workers)
+    groups = duplicate_groups(scanned)
+    summary = summarize(scanned, groups)
+
+    if args.command == 'report':
+        ranked = sorted(groups.values(), key=lambda m: m[0][1].st_size * (len(_inodes(m)) - 1), reverse=True)
+        if args.json:
+            summary['groups'] = [{'size': m[0][1].st_size, 'copies': len(m), 'linked': len(m) - len(_inodes(m)) + 1,
+                                  'paths': [rel for rel, _ in m]} for m in ranked[:args.top]]
+            print(json.dumps(summary, ensure_ascii=False, indent=2))
+            return 0
+        print(f"{summary['files']} files, {_human(summary['logical_bytes'])} "
+              f"({_human(summary['physical_bytes'])} on disk), {hashed} hashed this run")
+        print(f"{summary['duplicate_files']} duplicate copies in {summary['duplicate_groups']} groups; "
+              f"already linked {_human(summary['already_linked_bytes'])}, "
+              f"reclaimable {_human(summary['reclaimable_bytes'])}")
+        for members in ranked[:args.top]:
+            size = members[0][1].st_size
+            copies = len(_inodes(members))
+            if copies < 2:
+                continue
+            print(f"  {_human(size * (copies - 1)):>10}  {len(members)} x {_human(size)}")
+            for rel, _ in members:
+                print(f"      {rel}")
+        return 0
+
+    freed = 0
+    for digest, members in groups.items():
+        group_freed, linked = link_group(args.projects, members, args.dry_run)
+        freed += group_freed
+        # Relinked names now carry the kept file's mtime; record it so the next run does not rehash
+        rows = []
+        for rel in linked:
+            st = os.lstat(os.path.join(args.projects, rel))
+            rows.append((rel, st.st_size, st.st_mtime_ns, digest))
+        with conn:
+            conn.executemany('INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?)', rows)
+    print(f"{'Would free' if args.dry_run else 'Freed'} {_human(freed)} "
+          f"across {summary['duplicate_groups']} duplicate groups")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
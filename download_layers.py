@@ -1,6 +1,10 @@
 import os
 import urllib.request
 
+import instrument
+
+instrument.install()
+
 base_url = "https://unpkg.com/leaflet@1.9.4/dist/images/"
 target_dir = r"e:\ИИ\NP\lib\leaflet\images"
 
@@ -1,6 +1,10 @@
 import os
 import urllib.request
 
+import instrument
+
+instrument.install()
+
 def download_file(url, filepath):
     try:
         os.makedirs(os.path.dirname(filepath), exist_ok=True)
@@ -0,0 +1,337 @@
+"""Encoding, BOM and line-ending survey of the text assets and project files.
+
+Replaces eyeballing the first bytes of a file (inspect_css_header.py). Every
+text file of the tree and of projects/ is checked in a thread pool: the
+first HEAD_BYTES decide BOM, UTF-16 and binary (NUL bytes without a UTF-16
+BOM); the rest is streamed through an incremental UTF-8 decoder while CRLF,
+LF and bare CR are counted, so a file is read once and never held whole in
+memory. Reported per file:
+
+    encoding   ascii, utf-8, utf-16-le/-be, cp1251 (invalid UTF-8 that decodes
+               as cp1251 and reads as Cyrillic), unknown (invalid UTF-8
+               otherwise), binary
+    bom        the file starts with a byte-order mark
+    eol        lf, crlf, cr, mixed or none, with the counts
+    nul        NUL bytes in a file that is otherwise text
+
+`fix` rewrites the files that need it, each through snapshot_store and an
+atomic replace, and skips any file that changed since it was scanned:
+BOMs are stripped (except in .csv, where Excel needs it), mixed line endings
+take the file's majority (.bat/.cmd stay CRLF), and with --transcode
+cp1251 / UTF-16 text becomes UTF-8. Binary, NUL-containing and unknown files
+are never touched.
+
+Usage:
+    python encoding_survey.py scan [--all] [--json] [--no-projects] [FILE ...]
+    python encoding_survey.py fix [--eol lf|crlf] [--transcode] [--dry-run] [FILE ...]
+"""
+import argparse
+import codecs
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import instrument
+import snapshot_store
+from project_files import PROJECTS_DIR, ROOT_DIR, atomic_write
+
+HEAD_BYTES = 64 * 1024
+CHUNK_BYTES = 1 << 20
+WORKERS = 16
+
+TEXT_EXTENSIONS = {'.html', '.htm', '.css', '.js', '.mjs', '.json', '.jsonl', '.md', '.txt', '.csv',
+                   '.xml', '.svg', '.py', '.bat', '.cmd', '.yaml', '.yml', '.example', '.webmanifest'}
+CRLF_EXTENSIONS = {'.bat', '.cmd'}
+BOM_EXTENSIONS = {'.csv'}
+# Dependencies, tool state and generated output
+SKIP_DIRS = {'.git', 'node_modules', '__pycache__', '.snapshots', 'search-index', 'map-tiles',
+             'exports', 'history-archive'}
+
+_BOMS = [(codecs.BOM_UTF8, 'utf-8'), (codecs.BOM_UTF16_LE, 'utf-16-le'), (codecs.BOM_UTF16_BE, 'utf-16-be')]
+# Bytes to delete to keep only the high half, and only cp1251 letters (А-я, Ё, ё)
+_LOW_BYTES = bytes(range(0x80))
+_NOT_CYRILLIC = bytes(b for b in range(0x100) if not (b >= 0xC0 or b in (0xA8, 0xB8)))
+
+
+def iter_text_files(root=ROOT_DIR, projects_dir=PROJECTS_DIR, include_projects=True):
+    """Yield paths of text files in the tree; projects/ only when include_projects."""
+    projects_dir = os.path.abspath(projects_dir)
+    roots = [root] + ([projects_dir] if include_projects and not projects_dir.startswith(root + os.sep) else [])
+    for top in roots:
+        for dirpath, dirnames, filenames in os.walk(top):
+            dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS
+                                 and (include_projects or os.path.join(dirpath, d) != projects_dir))
+            for name in sorted(filenames):
+                if os.path.splitext(name)[1].lower() in TEXT_EXTENSIONS and not name.endswith('.tmp'):
+                    yield os.path.join(dirpath, name)
+
+
+class _EolCounter:
+    """CRLF / LF / CR counts over a bytes or str stream split at arbitrary points."""
+
+    def __init__(self, newline=b'\n', cr=b'\r'):
+        self.newline, self.cr = newline, cr
+        self.crlf = self.lf = self.bare_cr = 0
+        self.pending_cr = False
+
+    def feed(self, chunk):
+        if self.pending_cr:
+            if chunk.startswith(self.newline):
+                self.crlf += 1
+                chunk = chunk[len(self.newline):]
+            else:
+                self.bare_cr += 1
+            self.pending_cr = False
+        crlf = chunk.count(self.cr + self.newline)
+        self.crlf += crlf
+        self.lf += chunk.count(self.newline) - crlf
+        self.bare_cr += chunk.count(self.cr) - crlf
+        if chunk.endswith(self.cr):
+            self.bare_cr -= 1
+            self.pending_cr = True
+
+    def close(self):
+        if self.pending_cr:
+            self.bare_cr += 1
+            self.pending_cr = False
+
+    def kind(self):
+        present = [name for name, n in (('crlf', self.crlf), ('lf', self.lf), ('cr', self.bare_cr)) if n]
+        return present[0] if len(present) == 1 else ('mixed' if present else 'none')
+
+
+def scan_file(path, root=ROOT_DIR):
+    """One report dict for path; reads the head first and streams the rest."""
+    st = os.stat(path)
+    rel = os.path.relpath(path, root)
+    report = {'path': path if rel.startswith('..') else rel.replace(os.sep, '/'), 'size': st.st_size,
+              'mtime_ns': st.st_mtime_ns, 'encoding': None, 'bom': False, 'eol': 'none',
+              'crlf': 0, 'lf': 0, 'cr': 0, 'nul': False, 'invalid_at': None}
+    with open(path, 'rb') as f:
+        head = f.read(HEAD_BYTES)
+        encoding = None
+        for bom, name in _BOMS:
+            if head.startswith(bom):
+                encoding, report['bom'] = name, True
+                break
+        if encoding in ('utf-16-le', 'utf-16-be'):
+            # Line endings are counted on the decoded text; NULs are part of every character
+            decoder = codecs.getincrementaldecoder(encoding)()
+            eol = _EolCounter('\n', '\r')
+            report['encoding'] = encoding
+            chunk = head[2:]
+            try:
+                while chunk:
+                    eol.feed(decoder.decode(chunk))
+                    chunk = f.read(CHUNK_BYTES)
+                decoder.decode(b'', final=True)
+            except UnicodeDecodeError:
+                report['encoding'] = 'unknown'
+            eol.close()
+            _set_eol(report, eol)
+            return report
+        if b'\0' in head:
+            report['nul'] = True
+            # NULs in something that is not even UTF-8: an image or archive with a text extension
+            try:
+                codecs.getincrementaldecoder('utf-8')().decode(head)
+            except UnicodeDecodeError:
+                report['encoding'] = 'binary'
+                return report
+
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        eol = _EolCounter()
+        ascii_only = True
+        cyrillic = other = 0
+        offset = 3 if report['bom'] else 0
+        chunk = head[offset:]
+        while chunk:
+            eol.feed(chunk)
+            if b'\0' in chunk:
+                report['nul'] = True
+            if ascii_only and not chunk.isascii():
+                ascii_only = False
+            if report['invalid_at'] is None:
+                try:
+                    decoder.decode(chunk)
+                except UnicodeDecodeError as e:
+                    report['invalid_at'] = offset + e.start
+            if report['invalid_at'] is not None:
+                high = len(chunk.translate(None, _LOW_BYTES))
+                letters = len(chunk.translate(None, _NOT_CYRILLIC))
+                cyrillic += letters
+                other += high - letters
+            offset += len(chunk)
+            chunk = f.read(CHUNK_BYTES)
+        eol.close()
+        if report['invalid_at'] is None:
+            try:
+                decoder.decode(b'', final=True)
+            except UnicodeDecodeError:
+                report['invalid_at'] = offset
+
+    if report['invalid_at'] is not None:
+        looks_cp1251 = cyrillic and cyrillic >= 4 * other
+        report['encoding'] = 'cp1251' if looks_cp1251 and _decodes(path, 'cp1251') else 'unknown'
+    else:
+        report['encoding'] = 'ascii' if ascii_only else 'utf-8'
+    _set_eol(report, eol)
+    return report
+
+
+def _decodes(path, encoding):
+    """Whether the whole file decodes; cp1251 leaves 0x98 undefined, for one."""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    with open(path, 'rb') as f:
+        try:
+            for chunk in iter(lambda: f.read(CHUNK_BYTES), b''):
+                decoder.decode(chunk)
+            decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            return False
+    return True
+
+
+def _set_eol(report, eol):
+    report['eol'] = eol.kind()
+    report['crlf'], report['lf'], report['cr'] = eol.crlf, eol.lf, eol.bare_cr
+
+
+def problems(report):
+    found = []
+    if report['encoding'] in ('binary', 'unknown', 'cp1251', 'utf-16-le', 'utf-16-be'):
+        found.append(report['encoding'])
+    if report['bom'] and os.path.splitext(report['path'])[1].lower() not in BOM_EXTENSIONS:
+        found.append('bom')
+    if report['eol'] in ('mixed', 'cr'):
+        found.append(f"eol {report['eol']}")
+    if report['nul'] and report['encoding'] != 'binary':
+        found.append('nul')
+    return found
+
+
+def scan(paths, root=ROOT_DIR, workers=WORKERS):
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda p: scan_file(p, root), paths))
+
+
+def plan_fix(report, eol=None, transcode=False):
+    """(target eol bytes or None, strip_bom, source encoding) or None when nothing to do."""
+    if report['encoding'] in ('binary', 'unknown') or report['nul']:
+        return None
+    if report['encoding'] in ('cp1251', 'utf-16-le', 'utf-16-be') and not transcode:
+        return None
+    ext = os.path.splitext(report['path'])[1].lower()
+    strip_bom = report['bom'] and ext not in BOM_EXTENSIONS
+    target = None
+    if ext in CRLF_EXTENSIONS:
+        target = 'crlf'
+    elif eol:
+        target = eol
+    elif report['eol'] in ('mixed', 'cr'):
+        target = 'crlf' if report['crlf'] > report['lf'] + report['cr'] else 'lf'
+    counts = {'crlf': report['crlf'], 'lf': report['lf'], 'cr': report['cr']}
+    if target and not any(n for kind, n in counts.items() if kind != target):
+        target = None
+    transcoding = report['encoding'] in ('cp1251', 'utf-16-le', 'utf-16-be')
+    if not (target or strip_bom or transcoding):
+        return None
+    return target, strip_bom, report['encoding']
+
+
+def fix_file(path, report, plan, snapshot=True):
+    """Rewrite one file per plan. Returns None, or why the file was skipped."""
+    target, strip_bom, encoding = plan
+    try:
+        st = os.stat(path)
+        if (st.st_size, st.st_mtime_ns) != (report['size'], report['mtime_ns']):
+            return 'changed since scan'
+        with open(path, 'rb') as f:
+            data = f.read()
+        # The BOM decodes to U+FEFF in every encoding, and a kept one is re-encoded as UTF-8
+        text = data.decode('utf-8' if encoding == 'ascii' else encoding)
+    except OSError as e:
+        return f"{type(e).__name__}: {e}"
+    except UnicodeDecodeError as e:
+        return f"not {encoding} at byte {e.start}"
+    if strip_bom and text.startswith('\ufeff'):
+        text = text[1:]
+    if target:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+        if target == 'crlf':
+            text = text.replace('\n', '\r\n')
+    output = text.encode('utf-8')
+    if output == data:
+        return None
+    if snapshot:
+        snapshot_store.snapshot(path, reason='encoding_survey.py fix')
+    atomic_write(path, output)
+    return None
+
+
+def _describe(report):
+    eol = report['eol']
+    if eol == 'mixed':
+        eol = f"mixed (crlf {report['crlf']}, lf {report['lf']}, cr {report['cr']})"
+    extra = f"  invalid UTF-8 at byte {report['invalid_at']}" if report['invalid_at'] is not None else ''
+    if report['nul'] and report['encoding'] != 'binary':
+        extra += '  NUL bytes'
+    return f"{report['encoding']:9} {'bom' if report['bom'] else '   '} {eol}{extra}"
+
+
+@instrument.instrumented('encoding_survey')
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Survey / normalise encodings and line endings")
+    parser.add_argument('command', choices=['scan', 'fix'])
+    parser.add_argument('paths', nargs='*', help='only these files (default: the whole tree)')
+    parser.add_argument('--no-projects', action='store_true', help='skip projects/')
+    parser.add_argument('--all', action='store_true', help='list clean files too')
+    parser.add_argument('--json', action='store_true')
+    parser.add_argument('--eol', choices=['lf', 'crlf'], help='fix: convert every file to this line ending')
+    parser.add_argument('--transcode', action='store_true', help='fix: rewrite cp1251 / UTF-16 text as UTF-8')
+    parser.add_argument('--dry-run', action='store_true')
+    parser.add_argument('--no-snapshot', action='store_true', help='fix: do not record snapshots first')
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    args = parser.parse_intermixed_args(argv)
+
+    paths = ([os.path.abspath(p) for p in args.paths] if args.paths
+             else list(iter_text_files(include_projects=not args.no_projects)))
+    reports = scan(paths, workers=args.workers)
+
+    if args.command == 'scan':
+        flagged = [r for r in reports if problems(r)]
+        shown = reports if args.all else flagged
+        if args.json:
+            print(json.dumps(shown, ensure_ascii=False, indent=1))
+        else:
+            for r in shown:
+                print(f"{_describe(r)}  {r['path']}")
+            by_encoding, by_eol = {}, {}
+            for r in reports:
+                by_encoding[r['encoding']] = by_encoding.get(r['encoding'], 0) + 1
+                by_eol[r['eol']] = by_eol.get(r['eol'], 0) + 1
+            print(f"{len(reports)} files, {len(flagged)} with problems; "
+                  f"encodings {by_encoding}; line endings {by_eol}")
+        return 1 if flagged else 0
+
+    plans = [(path, r, plan_fix(r, args.eol, args.transcode)) for path, r in zip(paths, reports)]
+    plans = [item for item in plans if item[2]]
+    for _, r, (target, strip_bom, encoding) in plans:
+        steps = [f"{encoding} -> utf-8" if encoding in ('cp1251', 'utf-16-le', 'utf-16-be') else '',
+                 'strip bom' if strip_bom else '', f"eol -> {target}" if target else '']
+        print(f"{'would fix' if args.dry_run else 'fix'}: {r['path']}  ({', '.join(s for s in steps if s)})")
+    if args.dry_run:
+        return 0
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        skipped = list(pool.map(lambda item: fix_file(item[0], item[1], item[2], not args.no_snapshot), plans))
+    for (_, r, _), reason in zip(plans, skipped):
+        if reason:
+            print(f"  skipped ({reason}): {r['path']}")
+    failed = sum(1 for reason in skipped if reason)
+    print(f"{len(skipped) - failed} files rewritten, {failed} skipped")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,314 @@
+"""Bulk export of projects/ and creds.json as NDJSON for database import.
+
+migrate.js inserts one document at a time after a findOne per user and per
+project. This writes the same documents, normalised the way migrate.js
+does, as one NDJSON file per collection that mongoimport (or any bulk
+loader) takes in a single pass:
+
+    users.ndjson      creds.json users: username, password, role
+    projects.ndjson   data.json + folderName, archived history merged back
+    rejected.ndjson   records the import would refuse, with the reason
+
+Normalisation follows migrate.js and the mongoose models: a missing project
+id is derived from data.json's mtime (migrate.js used Date.now()), sections
+get an id and status 'in-progress' when missing, a project whose id or
+name + client was already exported is skipped (migrate.js' findOne), and
+projects without a string name or client are rejected (required String
+fields in the model).
+Dates (createdAt, updatedAt, history[].date, files[].uploadedAt) become
+Extended JSON {"$date": ...} unless --plain-dates is given.
+
+data.json files are parsed in a process pool in folder order and written in
+batches of --batch records; with --gzip every batch is its own gzip member.
+After each batch .checkpoint.json in the output directory records the last
+folder and the byte offset of every file, so an interrupted run resumes
+with the next folder (the files are first cut back to the checkpoint).
+
+Usage:
+    python export_ndjson.py [-o exports/ndjson] [--gzip] [--batch 500] [--restart]
+    mongoimport --db lineart --collection projects --file exports/ndjson/projects.ndjson
+"""
+import argparse
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import instrument
+from compact_history import iter_archived
+from project_files import PROJECTS_DIR, ROOT_DIR, atomic_write, iter_data_files, load_project
+
+OUTPUT_DIR = os.path.join(ROOT_DIR, 'exports', 'ndjson')
+CREDS_FILE = os.path.join(ROOT_DIR, 'creds.json')
+CHECKPOINT_FILE = '.checkpoint.json'
+CHECKPOINT_VERSION = 1
+DEFAULT_BATCH = 500
+PARALLEL_THRESHOLD = 64
+COLLECTIONS = ('users', 'projects', 'rejected')
+USER_ROLES = {'admin', 'engineer', 'manager'}
+
+
+def _date(value, extended):
+    """Mongo Extended JSON date for an ISO string or epoch milliseconds; other values unchanged."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = datetime.datetime.fromtimestamp(value / 1000, datetime.timezone.utc)
+    elif isinstance(value, str):
+        try:
+            value = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return value
+    else:
+        return value
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    iso = value.astimezone(datetime.timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+    return {'$date': iso} if extended else iso
+
+
+def _files(files, extended):
+    if not isinstance(files, list):
+        return files
+    return [dict(f, uploadedAt=_date(f['uploadedAt'], extended)) if isinstance(f, dict) and 'uploadedAt' in f else f
+            for f in files]
+
+
+def normalize_project(folder, data_path, mtime_ns, extended=True):
+    """The document migrate.js would create for one folder."""
+    p = load_project(data_path)
+    if not isinstance(p, dict):
+        raise ValueError('data.json is not an object')
+    if not p.get('id'):
+        p['id'] = str(mtime_ns // 1_000_000)
+    p['id'] = str(p['id'])
+
+    history = p.get('history') if isinstance(p.get('history'), list) else []
+    if p.pop('historyArchive', None):
+        # compact_history.py moved older entries out of data.json; the database gets them all
+        history = list(iter_archived(data_path)) + history
+    p['history'] = [dict(h, date=_date(h['date'], extended)) if isinstance(h, dict) and 'date' in h else h
+                    for h in history]
+
+    if isinstance(p.get('sections'), list):
+        sections = []
+        for i, s in enumerate(p['sections']):
+            if isinstance(s, dict):
+                # Deterministic where migrate.js used Math.random(), so a re-export is identical
+                s = dict(s, id=s.get('id') or hashlib.sha1(f"{folder}/{i}".encode()).hexdigest()[:9],
+                         status=s.get('status') or 'in-progress')
+                if 'files' in s:
+                    s['files'] = _files(s['files'], extended)
+            sections.append(s)
+        p['sections'] = sections
+    if 'photos' in p:
+        p['photos'] = _files(p['photos'], extended)
+    for key in ('createdAt', 'updatedAt'):
+        if key in p:
+            p[key] = _date(p[key], extended)
+    p['folderName'] = folder
+    return p
+
+
+def _normalize_job(job):
+    folder, data_path, mtime_ns, extended = job
+    try:
+        return normalize_project(folder, data_path, mtime_ns, extended), None
+    except (OSError, ValueError) as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def load_users(creds_file=CREDS_FILE):
+    try:
+        with open(creds_file, encoding='utf-8-sig') as f:
+            creds = json.load(f)
+    except FileNotFoundError:
+        return []
+    return creds.get('users') or [] if isinstance(creds, dict) else []
+
+
+class Writer:
+    """NDJSON (optionally gzip-member-per-batch) output of one collection."""
+
+    def __init__(self, path, compress, offset):
+        self.path = path
+        self.compress = compress
+        # Anything past the checkpoint is a batch that was cut off mid-write
+        with open(path, 'ab') as f:
+            f.truncate(offset)
+        self.offset = offset
+        self.pending = []
+
+    def add(self, doc):
+        self.pending.append(json.dumps(doc, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n')
+
+    def flush(self):
+        if not self.pending:
+            return
+        data = b''.join(self.pending)
+        if self.compress:
+            data = gzip.compress(data, compresslevel=6, mtime=0)
+        with open(self.path, 'ab') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self.offset += len(data)
+        self.pending = []
+
+
+def _read_written(path, compress):
+    """Yield the documents already written (to rebuild state on resume)."""
+    with (gzip.open if compress else open)(path, 'rb') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+class Exporter:
+    def __init__(self, out_dir=OUTPUT_DIR, compress=False, batch=DEFAULT_BATCH, extended=True, restart=False):
+        self.out_dir = out_dir
+        self.compress = compress
+        self.batch = batch
+        self.extended = extended
+        os.makedirs(out_dir, exist_ok=True)
+        self.checkpoint_path = os.path.join(out_dir, CHECKPOINT_FILE)
+        options = {'gzip': compress, 'extended': extended}
+        checkpoint = None if restart else self._load_checkpoint()
+        if checkpoint and checkpoint.get('options') != options:
+            raise ValueError(f"{self.checkpoint_path} was written with {checkpoint.get('options')}; "
+                             f"use the same options or --restart")
+        self.checkpoint = checkpoint or {'version': CHECKPOINT_VERSION, 'options': options,
+                                         'users_done': False, 'last_folder': None, 'offsets': {}, 'counts': {}}
+        suffix = '.ndjson.gz' if compress else '.ndjson'
+        self.writers = {name: Writer(os.path.join(out_dir, name + suffix), compress,
+                                     self.checkpoint['offsets'].get(name, 0))
+                        for name in COLLECTIONS}
+        self.counts = dict({'skipped': 0}, **self.checkpoint['counts'])
+
+        # migrate.js' findOne by id or by name + client, over what is already exported
+        self.ids, self.names = set(), set()
+        writer = self.writers['projects']
+        for doc in _read_written(writer.path, compress):
+            self._seen(doc)
+
+    def _load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return checkpoint if checkpoint.get('version') == CHECKPOINT_VERSION else None
+
+    def _seen(self, doc):
+        self.ids.add(doc['id'])
+        self.names.add((doc.get('name'), doc.get('client')))
+
+    def _save_checkpoint(self):
+        for writer in self.writers.values():
+            writer.flush()
+        self.checkpoint['offsets'] = {name: w.offset for name, w in self.writers.items()}
+        self.checkpoint['counts'] = self.counts
+        atomic_write(self.checkpoint_path, json.dumps(self.checkpoint, ensure_ascii=False, indent=1).encode('utf-8'))
+
+    def _count(self, key):
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def export_users(self, users):
+        if self.checkpoint['users_done']:
+            return
+        seen = set()
+        for u in users:
+            if (not isinstance(u, dict) or not isinstance(u.get('username'), str) or not u['username']
+                    or not u.get('password')):
+                self.writers['rejected'].add({'collection': 'users',
+                                              'reason': 'string username and password required',
+                                              'record': {'username': u.get('username') if isinstance(u, dict) else None}})
+                self._count('rejected')
+                continue
+            if u['username'] in seen:
+                self._count('skipped')
+                continue
+            seen.add(u['username'])
+            role = u.get('role') or 'engineer'
+            if role not in USER_ROLES:
+                self.writers['rejected'].add({'collection': 'users', 'reason': f"role {role!r} not allowed",
+                                              'record': {'username': u['username']}})
+                self._count('rejected')
+                continue
+            self.writers['users'].add({'username': u['username'], 'password': u['password'], 'role': role})
+            self._count('users')
+        self.checkpoint['users_done'] = True
+        self._save_checkpoint()
+
+    def _add_project(self, folder, doc, error):
+        if error:
+            self.writers['rejected'].add({'collection': 'projects', 'folder': folder, 'reason': error})
+            self._count('rejected')
+        elif not doc.get('name') or not doc.get('client'):
+            self.writers['rejected'].add({'collection': 'projects', 'folder': folder,
+                                          'reason': 'name and client required', 'record': doc})
+            self._count('rejected')
+        elif not isinstance(doc['name'], str) or not isinstance(doc['client'], str):
+            # Hand-edited files; the model would refuse them and they cannot key the duplicate check
+            kinds = f"name is {type(doc['name']).__name__}, client is {type(doc['client']).__name__}"
+            self.writers['rejected'].add({'collection': 'projects', 'folder': folder,
+                                          'reason': f"name and client must be strings ({kinds})", 'record': doc})
+            self._count('rejected')
+        elif doc['id'] in self.ids or (doc.get('name'), doc.get('client')) in self.names:
+            self._count('skipped')
+        else:
+            self._seen(doc)
+            self.writers['projects'].add(doc)
+            self._count('projects')
+
+    def export_projects(self, projects_dir=PROJECTS_DIR, workers=None, progress=None):
+        last = self.checkpoint['last_folder']
+        jobs = [(folder, path, st.st_mtime_ns, self.extended) for folder, path, st in iter_data_files(projects_dir)
+                if last is None or folder > last]
+        pool = ProcessPoolExecutor(max_workers=workers) if len(jobs) >= PARALLEL_THRESHOLD else None
+        try:
+            results = pool.map(_normalize_job, jobs, chunksize=16) if pool else map(_normalize_job, jobs)
+            for n, ((folder, *_), (doc, error)) in enumerate(zip(jobs, results), 1):
+                self._add_project(folder, doc, error)
+                if n % self.batch == 0 or n == len(jobs):
+                    self.checkpoint['last_folder'] = folder
+                    self._save_checkpoint()
+                    if progress:
+                        progress(n, len(jobs))
+        finally:
+            if pool:
+                pool.shutdown(cancel_futures=True)
+        return len(jobs)
+
+
+@instrument.instrumented('export_ndjson')
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export projects and users as NDJSON for bulk import")
+    parser.add_argument('--projects', default=PROJECTS_DIR)
+    parser.add_argument('--creds', default=CREDS_FILE)
+    parser.add_argument('-o', '--output', default=OUTPUT_DIR)
+    parser.add_argument('--gzip', action='store_true', help='write .ndjson.gz (one gzip member per batch)')
+    parser.add_argument('--batch', type=int, default=DEFAULT_BATCH, help='records per write and checkpoint')
+    parser.add_argument('--plain-dates', action='store_true', help='keep dates as ISO strings')
+    parser.add_argument('--restart', action='store_true', help='ignore the checkpoint and start over')
+    parser.add_argument('--jobs', type=int, help='worker processes (default: CPU count)')
+    args = parser.parse_args(argv)
+
+    try:
+        exporter = Exporter(args.output, args.gzip, args.batch, not args.plain_dates, args.restart)
+    except ValueError as e:
+        parser.error(str(e))
+    resumed = exporter.checkpoint['last_folder']
+    if resumed:
+        print(f"resuming after {resumed!r}")
+    exporter.export_users(load_users(args.creds))
+    exporter.export_projects(args.projects, args.jobs,
+                             lambda n, total: print(f"  {n}/{total} folders", file=sys.stderr))
+    counts = exporter.counts
+    print(f"{args.output}: {counts.get('projects', 0)} projects, {counts.get('users', 0)} users, "
+          f"{counts.get('skipped', 0)} duplicates skipped, {counts.get('rejected', 0)} rejected")
+    return 1 if counts.get('rejected') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
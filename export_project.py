@@ -0,0 +1,338 @@
+"""Export projects/<folder> trees as ZIP archives, streamed with constant memory.
+
+Unlike server/archiver.js (everything at zlib level 9, one blocking job),
+files that are already compressed (photos, PDFs, office documents, archives)
+are stored as-is, and the rest is deflated by a thread pool while earlier
+entries are being written. Output can go to a file or stdout; nothing is
+ever seeked, so every entry carries its sizes up front (ZIP64 when needed).
+
+Each archive contains the project tree, metadata.json (same fields as
+archiver.js) and manifest.json with the size and sha256 of every file.
+
+Usage:
+    python export_project.py one FOLDER [-o project.zip | -o -]
+    python export_project.py many FOLDER [FOLDER ...] [--out-dir exports] [--jobs 4]
+    python export_project.py many --all [--out-dir exports]
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import instrument
+from project_files import DATA_FILE, PROJECTS_DIR, ROOT_DIR, iter_data_files, load_project
+
+EXPORT_DIR = os.path.join(ROOT_DIR, 'exports')
+
+# Compressing these again costs CPU and saves next to nothing
+STORED_EXTENSIONS = {
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.pdf', '.zip', '.rar', '.7z', '.gz',
+    '.bz2', '.xz', '.mp4', '.mov', '.avi', '.mp3', '.docx', '.xlsx', '.pptx', '.odt', '.ods',
+}
+SKIP_SUFFIXES = ('.lock', '.tmp')
+
+LEVEL = 6
+READ_SIZE = 1 << 20
+# Files up to this size are compressed whole in the pool; larger ones are
+# deflated while streaming (with a trailing data descriptor)
+POOL_MAX = 8 << 20
+COMPRESS_WORKERS = os.cpu_count() or 2
+
+STORED, DEFLATED = 0, 8
+_UTF8_FLAG = 0x0800
+_DESCRIPTOR_FLAG = 0x0008
+_MAX32 = 0xFFFFFFFF
+
+
+def _dos_time(mtime):
+    t = time.localtime(max(mtime, 315532800))  # 1980-01-01, the earliest ZIP date
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), \
+        ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+
+class ZipStream:
+    """Minimal ZIP writer for non-seekable outputs."""
+
+    def __init__(self, out):
+        self.out = out
+        self.offset = 0
+        self.entries = []
+
+    def _write(self, data):
+        self.out.write(data)
+        self.offset += len(data)
+
+    def _local_header(self, name, method, mtime, crc, csize, usize, flags):
+        zip64 = csize >= _MAX32 or usize >= _MAX32
+        extra = struct.pack('<HHQQ', 1, 16, usize, csize) if zip64 else b''
+        dtime, ddate = _dos_time(mtime)
+        self._write(struct.pack('<IHHHHHIIIHH', 0x04034b50, 45 if zip64 else 20, flags, method, dtime, ddate,
+                                crc, _MAX32 if zip64 else csize, _MAX32 if zip64 else usize, len(name), len(extra))
+                    + name + extra)
+
+    def add_bytes(self, name, method, mtime, crc, usize, data, mode=0o644):
+        """Add an entry whose (possibly compressed) payload is already known."""
+        name = name.encode('utf-8')
+        offset = self.offset
+        self._local_header(name, method, mtime, crc, len(data), usize, _UTF8_FLAG)
+        self._write(data)
+        self.entries.append((name, method, mtime, crc, len(data), usize, offset, _UTF8_FLAG, mode))
+
+    def add_stored_file(self, name, path, mtime, crc, usize, mode=0o644):
+        """Copy a file whose CRC was computed beforehand."""
+        name = name.encode('utf-8')
+        offset = self.offset
+        self._local_header(name, STORED, mtime, crc, usize, usize, _UTF8_FLAG)
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(READ_SIZE)
+                if not chunk:
+                    break
+                self._write(chunk)
+        self.entries.append((name, STORED, mtime, crc, usize, usize, offset, _UTF8_FLAG, mode))
+
+    def add_deflated_file(self, name, path, mtime, level=LEVEL, mode=0o644):
+        """Deflate a large file while writing it; sizes follow in a data descriptor.
+
+        Returns (usize, sha256).
+        """
+        name = name.encode('utf-8')
+        offset = self.offset
+        flags = _UTF8_FLAG | _DESCRIPTOR_FLAG
+        # Sizes are unknown yet: always announce ZIP64 so they may exceed 4 GB
+        dtime, ddate = _dos_time(mtime)
+        extra = struct.pack('<HHQQ', 1, 16, 0, 0)
+        self._write(struct.pack('<IHHHHHIIIHH', 0x04034b50, 45, flags, DEFLATED, dtime, ddate,
+                                0, _MAX32, _MAX32, len(name), len(extra)) + name + extra)
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        crc, usize, csize = 0, 0, 0
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(READ_SIZE)
+                if not chunk:
+                    break
+                crc = zlib.crc32(chunk, crc)
+                sha.update(chunk)
+                usize += len(chunk)
+                data = compressor.compress(chunk)
+                csize += len(data)
+                self._write(data)
+        data = compressor.flush()
+        csize += len(data)
+        self._write(data)
+        self._write(struct.pack('<IIQQ', 0x08074b50, crc, csize, usize))
+        self.entries.append((name, DEFLATED, mtime, crc, csize, usize, offset, flags, mode))
+        return usize, sha.hexdigest()
+
+    def close(self):
+        start = self.offset
+        for name, method, mtime, crc, csize, usize, offset, flags, mode in self.entries:
+            fields = [v for v in (usize, csize, offset) if v >= _MAX32]
+            extra = struct.pack(f'<HH{len(fields)}Q', 1, 8 * len(fields), *fields) if fields else b''
+            dtime, ddate = _dos_time(mtime)
+            self._write(struct.pack('<IHHHHHHIIIHHHHHII', 0x02014b50, (3 << 8) | 45, 45 if fields else 20, flags,
+                                    method, dtime, ddate, crc, min(csize, _MAX32), min(usize, _MAX32),
+                                    len(name), len(extra), 0, 0, 0, (0o100000 | mode) << 16,
+                                    min(offset, _MAX32)) + name + extra)
+        size = self.offset - start
+        count = len(self.entries)
+        if count >= 0xFFFF or size >= _MAX32 or start >= _MAX32:
+            zip64_end = self.offset
+            self._write(struct.pack('<IQHHIIQQQQ', 0x06064b50, 44, 45, 45, 0, 0, count, count, size, start))
+            self._write(struct.pack('<IIQI', 0x07064b50, 0, zip64_end, 1))
+        self._write(struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+                                min(size, _MAX32), min(start, _MAX32), 0))
+        self.out.flush()
+
+
+def _deflate(data, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _prepare(path, size, level):
+    """Runs in the pool: (method, crc, sha256, payload or None)."""
+    stored = os.path.splitext(path)[1].lower() in STORED_EXTENSIONS
+    if not stored and size > POOL_MAX:
+        return DEFLATED, None, None, None   # streamed by the writer
+    crc = 0
+    sha = hashlib.sha256()
+    if stored:
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(READ_SIZE)
+                if not chunk:
+                    break
+                crc = zlib.crc32(chunk, crc)
+                sha.update(chunk)
+        return STORED, crc, sha.hexdigest(), None
+    with open(path, 'rb') as f:
+        data = f.read()
+    crc = zlib.crc32(data)
+    sha.update(data)
+    packed = _deflate(data, level)
+    if len(packed) >= len(data):
+        return STORED, crc, sha.hexdigest(), data
+    return DEFLATED, crc, sha.hexdigest(), packed
+
+
+def iter_project_files(folder_path):
+    """Yield (archive_name, path, stat) for every file of one project."""
+    for dirpath, dirnames, filenames in os.walk(folder_path):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.endswith(SKIP_SUFFIXES):
+                continue
+            path = os.path.join(dirpath, name)
+            st = os.stat(path)
+            yield os.path.relpath(path, folder_path).replace(os.sep, '/'), path, st
+
+
+def metadata(project):
+    """The metadata.json written by server/archiver.js."""
+    return {
+        'name': project.get('name'),
+        'client': project.get('client'),
+        'status': project.get('status'),
+        'createdAt': project.get('createdAt'),
+        'amount': project.get('amount'),
+        'currency': project.get('currency'),
+        'sections': len(project.get('sections') or []),
+        'exportedAt': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='milliseconds')
+                      .replace('+00:00', 'Z'),
+    }
+
+
+def export_project(folder_path, out, level=LEVEL, workers=COMPRESS_WORKERS):
+    """Write the ZIP of one project folder to the binary stream out. Returns the manifest."""
+    zf = ZipStream(out)
+    files = list(iter_project_files(folder_path))
+    manifest = {'folder': os.path.basename(os.path.normpath(folder_path)), 'files': []}
+    # Bounded look-ahead keeps at most this many compressed files in memory
+    window = workers * 2
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for item in files:
+            pending.append((item, pool.submit(_prepare, item[1], item[2].st_size, level)))
+            if len(pending) < window:
+                continue
+            _write_entry(zf, manifest, *pending.pop(0), level)
+        for item, future in pending:
+            _write_entry(zf, manifest, item, future, level)
+
+    now = time.time()
+    try:
+        project = load_project(os.path.join(folder_path, DATA_FILE))
+    except (OSError, ValueError):
+        project = {}
+    for name, payload in (('metadata.json', metadata(project)), ('manifest.json', manifest)):
+        raw = json.dumps(payload, ensure_ascii=False, indent=2).encode('utf-8')
+        packed = _deflate(raw, level)
+        zf.add_bytes(name, DEFLATED, now, zlib.crc32(raw), len(raw), packed)
+    zf.close()
+    return manifest
+
+
+def _write_entry(zf, manifest, item, future, level):
+    name, path, st = item
+    method, crc, sha, payload = future.result()
+    if crc is None:
+        size, sha = zf.add_deflated_file(name, path, st.st_mtime, level)
+    elif payload is None:
+        zf.add_stored_file(name, path, st.st_mtime, crc, st.st_size)
+        size = st.st_size
+    else:
+        zf.add_bytes(name, method, st.st_mtime, crc, st.st_size, payload)
+        size = st.st_size
+    manifest['files'].append({'path': name, 'size': size, 'sha256': sha,
+                              'stored': method == STORED})
+
+
+def export_to_file(folder_path, zip_path, level=LEVEL, workers=COMPRESS_WORKERS):
+    """Export into zip_path via a temporary file. Returns (zip_path, files, bytes)."""
+    tmp_path = f"{zip_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        manifest = export_project(folder_path, f, level, workers)
+    os.replace(tmp_path, zip_path)
+    return zip_path, len(manifest['files']), os.path.getsize(zip_path)
+
+
+def _export_job(job):
+    folder_path, zip_path, level, workers = job
+    try:
+        return export_to_file(folder_path, zip_path, level, workers), None
+    except OSError as e:
+        return (zip_path, 0, 0), f"{type(e).__name__}: {e}"
+
+
+def export_many(folder_paths, out_dir=EXPORT_DIR, level=LEVEL, jobs=None):
+    """Export several projects side by side, one process per archive."""
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = jobs or max(1, (os.cpu_count() or 2) // 2)
+    # Each process also runs a small compression pool
+    workers = max(1, (os.cpu_count() or 2) // jobs)
+    work = [(p, os.path.join(out_dir, os.path.basename(os.path.normpath(p)) + '.zip'), level, workers)
+            for p in folder_paths]
+    if len(work) == 1 or jobs == 1:
+        yield from map(_export_job, work)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        yield from pool.map(_export_job, work)
+
+
+@instrument.instrumented('export_project')
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export project folders as ZIP archives")
+    parser.add_argument('--projects', default=PROJECTS_DIR)
+    parser.add_argument('--level', type=int, default=LEVEL, help='deflate level for compressible files')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('one', help='export one project to a file or stdout')
+    p.add_argument('folder')
+    p.add_argument('-o', '--output', help="archive path, '-' for stdout (default: exports/<folder>.zip)")
+
+    p = sub.add_parser('many', help='export several projects in parallel')
+    p.add_argument('folders', nargs='*')
+    p.add_argument('--all', action='store_true', help='every project folder')
+    p.add_argument('--out-dir', default=EXPORT_DIR)
+    p.add_argument('--jobs', type=int, help='archives built at the same time')
+
+    args = parser.parse_args(argv)
+    if args.command == 'one':
+        folder_path = os.path.join(args.projects, args.folder)
+        if not os.path.isdir(folder_path):
+            print(f"No such project folder: {folder_path}", file=sys.stderr)
+            return 1
+        if args.output == '-':
+            export_project(folder_path, sys.stdout.buffer, args.level)
+            return 0
+        zip_path = args.output or os.path.join(EXPORT_DIR, args.folder + '.zip')
+        os.makedirs(os.path.dirname(os.path.abspath(zip_path)), exist_ok=True)
+        _, count, size = export_to_file(folder_path, zip_path, args.level)
+        print(f"{zip_path}: {count} files, {size} bytes")
+        return 0
+
+    folders = [os.path.dirname(path) for _, path, _ in iter_data_files(args.projects)] if args.all else \
+        [os.path.join(args.projects, f) for f in args.folders]
+    if not folders:
+        parser.error('give project folders or --all')
+    failed = 0
+    for (zip_path, count, size), error in export_many(folders, args.out_dir, args.level, args.jobs):
+        if error:
+            failed += 1
+            print(f"  FAILED {zip_path}: {error}")
+        else:
+            print(f"  {zip_path}: {count} files, {size} bytes")
+    print(f"Exported {len(folders) - failed} of {len(folders)} projects to {args.out_dir}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
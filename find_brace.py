@@ -1,3 +1,7 @@
+import instrument
+
+instrument.install()
+
 file_path = r'e:\ИИ\NP\style.css'
 
 with open(file_path, 'r', encoding='utf-8') as f:
@@ -1,6 +1,11 @@
 
 import os
 
+import instrument
+import snapshot_store
+
+instrument.install()
+
 file_path = 'e:/ИИ/NP/index.html'
 
 with open(file_path, 'r', encoding='utf-8') as f:
@@ -54,6 +59,7 @@ part7 = [
 
 new_content = part1 + part2 + part3 + part4 + part5 + part6 + part7
 
+snapshot_store.snapshot(file_path, reason='fix_html_corruption.py')
 with open(file_path, 'w', encoding='utf-8') as f:
     f.writelines(new_content)
 
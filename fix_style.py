@@ -1,5 +1,10 @@
 import os
 
+import instrument
+import snapshot_store
+
+instrument.install()
+
 file_path = r'e:\ИИ\NP\style.css'
 
 with open(file_path, 'r', encoding='utf-8') as f:
@@ -37,6 +42,7 @@ if len(root_indices) > 1:
 content = '\n'.join(clean_lines)
 
 # Write back
+snapshot_store.snapshot(file_path, reason='fix_style.py')
 with open(file_path, 'w', encoding='utf-8') as f:
     f.write(content)
 
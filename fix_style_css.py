@@ -1,6 +1,11 @@
 
 import os
 
+import instrument
+import snapshot_store
+
+instrument.install()
+
 file_path = r'e:\ИИ\NP\style.css'
 
 # The correct new styles to append
@@ -68,6 +73,7 @@ with open(file_path, 'r', encoding='utf-8') as f:
 
 clean_lines = lines[:2583]
 
+snapshot_store.snapshot(file_path, reason='fix_style_css.py')
 with open(file_path, 'w', encoding='utf-8') as f:
     f.writelines(clean_lines)
     f.write(new_styles)
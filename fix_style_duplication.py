@@ -1,3 +1,8 @@
+import instrument
+import snapshot_store
+
+instrument.install()
+
 lines = open('e:/ИИ/NP/style.css', 'r', encoding='utf-8').readlines()
 # We want to keep lines 1-1972 (indices 0-1971)
 # And lines 2177-end (indices 2176-end)
@@ -9,6 +14,7 @@ print(f"Line 2177: {lines[2176]}")
 
 if "background-color" in lines[1972] and "New Section" in lines[2176]:
     new_content = "".join(lines[:1972] + lines[2176:])
+    snapshot_store.snapshot('e:/ИИ/NP/style.css', reason='fix_style_duplication.py')
     with open('e:/ИИ/NP/style.css', 'w', encoding='utf-8') as f:
         f.write(new_content)
     print("File updated successfully.")
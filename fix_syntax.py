@@ -1,6 +1,11 @@
 
 import os
 
+import instrument
+import snapshot_store
+
+instrument.install()
+
 file_path = r'e:\ИИ\NP\app.js'
 
 with open(file_path, 'r', encoding='utf-8') as f:
@@ -13,6 +18,7 @@ new_content = new_content.replace('< option', '<option')
 new_content = new_content.replace('</option >', '</option>')
 
 if content != new_content:
+    snapshot_store.snapshot(file_path, reason='fix_syntax.py')
     with open(file_path, 'w', encoding='utf-8') as f:
         f.write(new_content)
     print("Fixed syntax errors in app.js")
@@ -1,5 +1,10 @@
 import os
 
+import instrument
+import snapshot_store
+
+instrument.install()
+
 file_path = r'e:\ИИ\NP\app.js'
 
 try:
@@ -25,6 +30,7 @@ try:
             count += occurrences
 
     if count > 0:
+        snapshot_store.snapshot(file_path, reason='force_fix_syntax.py')
         with open(file_path, 'w', encoding='utf-8') as f:
             f.write(new_content)
         print(f"Successfully replaced {count} malformed tags.")
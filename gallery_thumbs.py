@@ -0,0 +1,207 @@
+"""Generate thumbnails and previews for projects/*/gallery images.
+
+For every gallery image two downscaled JPEGs are written next to it:
+
+    gallery/be21bc61c88db32ba207cfdfe69feb53.jpg            original
+    gallery/_thumb/be21bc61c88db32ba207cfdfe69feb53.jpg     fits 320x320 (grid tiles, 2x of 150 px)
+    gallery/_preview/be21bc61c88db32ba207cfdfe69feb53.jpg   fits 1280x1280 (lightbox, comparisons)
+
+The preview is made from the original and the thumbnail from the preview.
+JPEG originals are decoded at a reduced scale straight away (Image.draft),
+which is most of the speedup for camera photos.
+
+gallery/_thumb/index.json remembers size, mtime and sha1 of each original,
+so unchanged images are skipped without being read, and a touched file with
+the same content is not re-encoded. Thumbnails of deleted originals are removed.
+
+Requires Pillow (pip install Pillow).
+
+Usage:
+    python gallery_thumbs.py [FOLDER ...] [--force] [--workers 4]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+import instrument
+from project_files import PROJECTS_DIR, atomic_write, iter_data_files
+
+GALLERY_DIR = 'gallery'
+INDEX_FILE = 'index.json'
+# (folder, max width/height, JPEG quality)
+SIZES = [
+    ('_preview', 1280, 82),
+    ('_thumb', 320, 78),
+]
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp', '.tif', '.tiff'}
+# Bump when the output format changes so every image is regenerated
+VERSION = 1
+
+
+def output_name(name):
+    return os.path.splitext(name)[0] + '.jpg'
+
+
+def _settings():
+    return [VERSION] + [list(s) for s in SIZES]
+
+
+def _sha1(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _flatten(img):
+    """RGB image with any transparency composited onto white."""
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel('A'))
+        return background
+    return img.convert('RGB')
+
+
+def render(job):
+    """Runs in worker processes: write every size for one original. Returns (name, sha1, error)."""
+    gallery, name, sha1 = job
+    try:
+        sha1 = sha1 or _sha1(os.path.join(gallery, name))
+        with Image.open(os.path.join(gallery, name)) as img:
+            largest = SIZES[0][1]
+            # Let libjpeg decode at 1/2, 1/4 or 1/8 scale when that is still big enough
+            img.draft('RGB', (largest, largest))
+            img = _flatten(ImageOps.exif_transpose(img))
+            for folder, size, quality in SIZES:
+                img.thumbnail((size, size), Image.LANCZOS)
+                target = os.path.join(gallery, folder, output_name(name))
+                tmp_path = f"{target}.{os.getpid()}.tmp"
+                img.save(tmp_path, 'JPEG', quality=quality, optimize=True, progressive=size > 400)
+                os.replace(tmp_path, target)
+        return name, sha1, None
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        return name, sha1, f"{type(e).__name__}: {e}"
+
+
+def load_index(gallery):
+    try:
+        with open(os.path.join(gallery, SIZES[-1][0], INDEX_FILE), encoding='utf-8') as f:
+            index = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    return index.get('images', {}) if index.get('settings') == _settings() else {}
+
+
+def plan_gallery(gallery, force=False):
+    """Return (jobs, index, stale) for one gallery folder.
+
+    jobs are (gallery, name, sha1 or None) for images that need rendering;
+    index is the new cache content for images that are already up to date.
+    """
+    cached = {} if force else load_index(gallery)
+    index, jobs = {}, []
+    names = sorted(n for n in os.listdir(gallery)
+                   if os.path.splitext(n)[1].lower() in IMAGE_EXTENSIONS
+                   and os.path.isfile(os.path.join(gallery, n)))
+    for name in names:
+        st = os.stat(os.path.join(gallery, name))
+        entry = cached.get(name)
+        outputs_exist = all(os.path.exists(os.path.join(gallery, folder, output_name(name)))
+                            for folder, _, _ in SIZES)
+        if entry and outputs_exist:
+            if (entry['size'], entry['mtime_ns']) == (st.st_size, st.st_mtime_ns):
+                index[name] = entry
+                continue
+            sha1 = _sha1(os.path.join(gallery, name))
+            if sha1 == entry['sha1']:
+                index[name] = dict(entry, size=st.st_size, mtime_ns=st.st_mtime_ns)
+                continue
+            jobs.append((gallery, name, sha1))
+        else:
+            jobs.append((gallery, name, None))
+
+    wanted = {output_name(n) for n in names}
+    stale = []
+    for folder, _, _ in SIZES:
+        directory = os.path.join(gallery, folder)
+        if os.path.isdir(directory):
+            stale.extend(os.path.join(directory, n) for n in os.listdir(directory)
+                         if n != INDEX_FILE and n not in wanted)
+    return jobs, index, stale
+
+
+def save_index(gallery, index):
+    data = {'settings': _settings(), 'images': index}
+    atomic_write(os.path.join(gallery, SIZES[-1][0], INDEX_FILE),
+                 json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8'))
+
+
+def process(galleries, force=False, workers=None):
+    """Bring thumbnails of all galleries up to date. Returns (rendered, skipped, removed, errors)."""
+    plans = {}
+    all_jobs = []
+    for gallery in galleries:
+        for folder, _, _ in SIZES:
+            os.makedirs(os.path.join(gallery, folder), exist_ok=True)
+        jobs, index, stale = plan_gallery(gallery, force)
+        plans[gallery] = (index, stale, len(jobs))
+        all_jobs.extend(jobs)
+
+    results = []
+    if all_jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(render, all_jobs, chunksize=4))
+
+    errors = []
+    for (gallery, name, _), (_, sha1, error) in zip(all_jobs, results):
+        if error:
+            errors.append((os.path.join(gallery, name), error))
+            continue
+        st = os.stat(os.path.join(gallery, name))
+        plans[gallery][0][name] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha1': sha1}
+
+    removed = 0
+    for gallery, (index, stale, _) in plans.items():
+        for path in stale:
+            os.remove(path)
+            removed += 1
+        save_index(gallery, index)
+    skipped = sum(len(index) for index, _, _ in plans.values()) - (len(results) - len(errors))
+    return len(results) - len(errors), skipped, removed, errors
+
+
+@instrument.instrumented('gallery_thumbs')
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build gallery thumbnails and previews")
+    parser.add_argument('folders', nargs='*', help='project folders (default: all)')
+    parser.add_argument('--projects', default=PROJECTS_DIR)
+    parser.add_argument('--force', action='store_true', help='ignore the cache and render everything')
+    parser.add_argument('--workers', type=int)
+    args = parser.parse_args(argv)
+
+    if Image is None:
+        print("Pillow is not installed: pip install Pillow", file=sys.stderr)
+        return 2
+
+    folders = args.folders or [folder for folder, _, _ in iter_data_files(args.projects)]
+    galleries = [g for g in (os.path.join(args.projects, f, GALLERY_DIR) for f in folders) if os.path.isdir(g)]
+    rendered, skipped, removed, errors = process(galleries, args.force, args.workers)
+    for path, error in errors:
+        print(f"  failed {path}: {error}")
+    print(f"{len(galleries)} galleries: {rendered} rendered, {skipped} up to date, "
+          f"{removed} stale removed, {len(errors)} failed")
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
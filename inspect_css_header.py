@@ -1,8 +1,9 @@
+"""Runs encoding_survey.py scan on style.css."""
 import os
+import sys
 
-file_path = r'e:\ИИ\NP\style.css'
+import encoding_survey
 
-with open(file_path, 'rb') as f:
-    content = f.read(50)
-    
-print(content)
+if __name__ == '__main__':
+    target = os.path.join(encoding_survey.ROOT_DIR, 'style.css')
+    sys.exit(encoding_survey.main(['scan', '--all', target] + sys.argv[1:]))
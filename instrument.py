@@ -0,0 +1,325 @@
+"""Shared instrumentation for the maintenance scripts.
+
+Every checker, fixer, downloader and tool records one JSON line per run:
+wall and CPU time, bytes read and written through open(), the files it
+touched and the process peak RSS.
+
+    import instrument
+    instrument.install()                 # top-level scripts: measured until exit
+
+    @instrument.instrumented('asset_budget')
+    def main(): ...
+
+    @instrument.instrumented('api_standin', track_files=False)
+    def main(): ...                      # long-running servers: time and RSS only
+
+    with instrument.measure('rebuild'):  # any block
+        ...
+
+Environment:
+    LINEART_METRICS   JSON-lines output file (default: metrics.jsonl next to
+                      this script); '-' writes to stderr
+    LINEART_PROFILE   directory for per-run cProfile dumps (off when unset)
+
+Summary of the recorded runs:
+    python instrument.py report [--sort wall_s]
+"""
+import argparse
+import atexit
+import builtins
+import cProfile
+import functools
+import json
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+METRICS_FILE = os.path.join(ROOT_DIR, 'metrics.jsonl')
+
+# Only this many paths are listed per record; the counts are always exact
+MAX_LISTED_FILES = 50
+
+_real_open = builtins.open
+_active = []
+
+
+def _peak_rss_kb():
+    """Process high-water mark in KiB, or None where it is not available."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak // 1024 if sys.platform == 'darwin' else peak
+    except ImportError:
+        pass
+    if sys.platform == 'win32':
+        try:
+            import ctypes
+            from ctypes import wintypes
+
+            class _Counters(ctypes.Structure):
+                _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                            ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                            ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+            counters = _Counters()
+            counters.cb = ctypes.sizeof(counters)
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+                return counters.PeakWorkingSetSize // 1024
+        except (OSError, AttributeError):
+            pass
+    return None
+
+
+class _TrackedFile:
+    """Proxy around a file object that counts bytes moved through it."""
+
+    def __init__(self, f, path, binary):
+        self._f = f
+        self._path = path
+        self._encoding = None if binary else (getattr(f, 'encoding', None) or 'utf-8')
+
+    def _size(self, data):
+        if self._encoding is None:
+            return len(data)
+        return len(data.encode(self._encoding, errors='replace'))
+
+    def _count(self, key, amount):
+        for m in _tracking():
+            m.counters[key] += amount
+            m.files.setdefault(self._path, set()).add('r' if key == 'bytes_read' else 'w')
+
+    def read(self, *args):
+        data = self._f.read(*args)
+        self._count('bytes_read', self._size(data))
+        return data
+
+    def readline(self, *args):
+        data = self._f.readline(*args)
+        self._count('bytes_read', self._size(data))
+        return data
+
+    def readlines(self, *args):
+        lines = self._f.readlines(*args)
+        self._count('bytes_read', sum(self._size(line) for line in lines))
+        return lines
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = next(self._f)
+        self._count('bytes_read', self._size(line))
+        return line
+
+    def write(self, data):
+        self._count('bytes_written', self._size(data))
+        return self._f.write(data)
+
+    def writelines(self, lines):
+        lines = list(lines)
+        self._count('bytes_written', sum(self._size(line) for line in lines))
+        return self._f.writelines(lines)
+
+    def __enter__(self):
+        self._f.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._f.__exit__(*exc)
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+
+def _tracking():
+    return [m for m in _active if m.track_files]
+
+
+def _tracking_open(file, mode='r', *args, **kwargs):
+    f = _real_open(file, mode, *args, **kwargs)
+    tracking = _tracking()
+    if not tracking or isinstance(file, int):
+        return f
+    path = os.path.abspath(os.fsdecode(file))
+    for m in tracking:
+        m.files.setdefault(path, set())
+    return _TrackedFile(f, path, 'b' in mode)
+
+
+class measure:
+    """Context manager recording one metrics line for the enclosed block.
+
+    With track_files=False open() is left alone and the record has no I/O
+    fields: for servers, whose file set grows without bound and whose
+    request latencies the open() proxy would skew.
+    """
+
+    def __init__(self, name, metrics_file=None, profile_dir=None, track_files=True):
+        self.name = name
+        self.track_files = track_files
+        self.metrics_file = metrics_file or os.environ.get('LINEART_METRICS') or METRICS_FILE
+        self.profile_dir = profile_dir or os.environ.get('LINEART_PROFILE')
+        self.counters = {'bytes_read': 0, 'bytes_written': 0}
+        self.files = {}
+        self.extra = {}
+        self.record = None
+        self._profiler = None
+
+    def note(self, **fields):
+        """Attach tool-specific fields (e.g. items processed) to the record."""
+        self.extra.update(fields)
+
+    def __enter__(self):
+        # cProfile allows one active profiler; nested blocks reuse the outer one
+        if self.profile_dir and not any(m._profiler for m in _active):
+            self._profiler = cProfile.Profile()
+        _active.append(self)
+        builtins.open = _tracking_open if _tracking() else _real_open
+        self._started = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self._wall = time.perf_counter()
+        self._times = os.times()
+        if self._profiler:
+            self._profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._profiler:
+            self._profiler.disable()
+        wall = time.perf_counter() - self._wall
+        times = os.times()
+        if self in _active:
+            _active.remove(self)
+        builtins.open = _tracking_open if _tracking() else _real_open
+
+        failed = exc_type is not None and not (issubclass(exc_type, SystemExit) and not exc.code)
+        read = sorted(p for p, modes in self.files.items() if 'r' in modes)
+        written = sorted(p for p, modes in self.files.items() if 'w' in modes)
+        self.record = {
+            'tool': self.name,
+            'start': self._started,
+            'status': 'error' if failed else 'ok',
+            'wall_s': round(wall, 4),
+            'cpu_s': round((times.user - self._times.user) + (times.system - self._times.system), 4),
+            'children_cpu_s': round((times.children_user - self._times.children_user)
+                                    + (times.children_system - self._times.children_system), 4),
+            'bytes_read': self.counters['bytes_read'],
+            'bytes_written': self.counters['bytes_written'],
+            'files_touched': len(self.files),
+            'files_read': read[:MAX_LISTED_FILES],
+            'files_written': written[:MAX_LISTED_FILES],
+            'peak_rss_kb': _peak_rss_kb(),
+            'argv': sys.argv[1:],
+        }
+        if not self.track_files:
+            for key in ('bytes_read', 'bytes_written', 'files_touched', 'files_read', 'files_written'):
+                del self.record[key]
+        if exc_type is not None and not issubclass(exc_type, SystemExit):
+            self.record['error'] = f"{exc_type.__name__}: {exc}"
+        self.record.update(self.extra)
+
+        if self._profiler:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            stamp = time.strftime('%Y%m%d-%H%M%S')
+            profile_path = os.path.join(self.profile_dir, f"{self.name}-{stamp}-{os.getpid()}.prof")
+            self._profiler.dump_stats(profile_path)
+            self.record['profile'] = profile_path
+
+        _emit(self.record, self.metrics_file)
+        return False
+
+
+def _emit(record, metrics_file):
+    line = json.dumps(record, ensure_ascii=False) + '\n'
+    if metrics_file == '-':
+        sys.stderr.write(line)
+        return
+    try:
+        with _real_open(metrics_file, 'a', encoding='utf-8') as f:
+            f.write(line)
+    except OSError as e:
+        print(f"instrument: could not write {metrics_file}: {e}", file=sys.stderr)
+
+
+def instrumented(name=None, track_files=True):
+    """Decorator form of measure(); usable as @instrumented or @instrumented('name')."""
+    def decorate(func, label):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with measure(label, track_files=track_files) as m:
+                result = func(*args, **kwargs)
+                if isinstance(result, int):
+                    m.note(exit_code=result)
+                return result
+        return wrapper
+
+    if callable(name):
+        return decorate(name, name.__qualname__)
+    return lambda func: decorate(func, name or func.__name__)
+
+
+def install(name=None):
+    """Measure the rest of a top-level script until the interpreter exits."""
+    if name is None:
+        name = os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0]
+    m = measure(name)
+    m.__enter__()
+
+    def finish():
+        exc = getattr(sys, 'last_value', None)
+        m.__exit__(type(exc) if exc else None, exc, None)
+
+    atexit.register(finish)
+    return m
+
+
+def load_records(path=METRICS_FILE):
+    if not os.path.exists(path):
+        return []
+    with _real_open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarize(records):
+    tools = {}
+    for r in records:
+        t = tools.setdefault(r['tool'], {'tool': r['tool'], 'runs': 0, 'errors': 0, 'wall_s': 0.0,
+                                         'cpu_s': 0.0, 'bytes_read': 0, 'bytes_written': 0,
+                                         'max_wall_s': 0.0, 'peak_rss_kb': 0})
+        t['runs'] += 1
+        t['errors'] += r.get('status') != 'ok'
+        t['wall_s'] += r.get('wall_s', 0)
+        t['cpu_s'] += r.get('cpu_s', 0) + r.get('children_cpu_s', 0)
+        t['bytes_read'] += r.get('bytes_read', 0)
+        t['bytes_written'] += r.get('bytes_written', 0)
+        t['max_wall_s'] = max(t['max_wall_s'], r.get('wall_s', 0))
+        t['peak_rss_kb'] = max(t['peak_rss_kb'], r.get('peak_rss_kb') or 0)
+    return list(tools.values())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize recorded tool metrics")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('report', help='per-tool totals from the metrics file')
+    p.add_argument('--file', default=os.environ.get('LINEART_METRICS') or METRICS_FILE)
+    p.add_argument('--sort', default='wall_s',
+                   choices=['wall_s', 'cpu_s', 'runs', 'bytes_read', 'bytes_written', 'peak_rss_kb'])
+    args = parser.parse_args(argv)
+
+    rows = sorted(summarize(load_records(args.file)), key=lambda t: t[args.sort], reverse=True)
+    total_wall = sum(t['wall_s'] for t in rows) or 1
+    print(f"{'tool':<24}{'runs':>6}{'err':>5}{'wall s':>10}{'share':>8}{'cpu s':>10}"
+          f"{'read KB':>10}{'write KB':>10}{'rss KB':>10}")
+    for t in rows:
+        print(f"{t['tool']:<24}{t['runs']:>6}{t['errors']:>5}{t['wall_s']:>10.3f}"
+              f"{t['wall_s'] / total_wall:>8.1%}{t['cpu_s']:>10.3f}{t['bytes_read'] // 1024:>10}"
+              f"{t['bytes_written'] // 1024:>10}{t['peak_rss_kb']:>10}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -573,9 +573,11 @@ export function renderProjectDetailsSafe(project) {
 
             galleryGrid.innerHTML = (project.photos || []).map((photo, index) => {
                 let src = window.currentLightboxImages[index];
+                // Small copy made by gallery_thumbs.py; falls back to the original until it exists
+                let thumb = src.replace(/\/gallery\/([^/]+?)(\.[^./]*)?$/, '/gallery/_thumb/$1.jpg');
                 return `
             <div class="gallery-item" onclick="openLightbox(${index})">
-            <img src="${src}" alt="Project Photo">
+            <img src="${thumb}" loading="lazy" onerror="this.onerror=null; this.src='${src}'" alt="Project Photo">
                 <div class="gallery-actions">
                     <button class="btn-icon-sm" onclick="event.stopPropagation(); downloadFile('${src}', '${photo}')" title="Скачать">
                         <svg xmlns="http://www.w3.org/2000/svg" width="20" height="20" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"><path d="M21 15v4a2 2 0 0 1-2 2H5a2 2 0 0 1-2-2v-4"></path><polyline points="7 10 12 15 17 10"></polyline><line x1="12" y1="15" x2="12" y2="3"></line></svg>
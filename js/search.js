@@ -3,6 +3,7 @@ import { state } from './state.js';
 import { openProjectDetails } from './projects.js';
 import { openClientDetailsPage, openEngineerDetailsPage } from './persons.js';
 import { formatMoney, getStatusName } from './utils.js';
+import { searchPrebuilt } from './searchIndex.js';
 
 export class SearchManager {
     constructor() {
@@ -150,6 +151,42 @@ export class SearchManager {
 
         this.selectedIndex = 0;
         this.renderResults();
+        this.appendIndexed(query);
+    }
+
+    // Sections, uploaded documents and history text are only in the prebuilt
+    // index (search_index.py); its hits are appended once the shards arrive.
+    async appendIndexed(query) {
+        const hits = await searchPrebuilt(query);
+        if (!this.isOpen || this.input.value !== query) return;
+
+        const shown = new Set(this.results.map(r => `${r.type}:${r.id}`));
+        const extra = [];
+        hits.forEach(h => {
+            if (h.type === 'project') {
+                const p = state.projects.find(p => String(p.id) === h.ref);
+                if (!p || shown.has(`project:${p.id}`)) return;
+                extra.push({
+                    type: 'project',
+                    id: p.id,
+                    title: p.name,
+                    subtitle: p.address || 'Нет адреса',
+                    status: p.status,
+                    metadata: formatMoney(p.amount, p.currency)
+                });
+            } else if (h.type === 'section' || h.type === 'document') {
+                extra.push({
+                    type: h.type,
+                    id: h.type === 'document' ? h.ref : h.projectId,
+                    title: h.title,
+                    subtitle: h.subtitle,
+                    metadata: h.type === 'document' ? 'Документ' : 'Раздел'
+                });
+            }
+        });
+        if (!extra.length) return;
+        this.results = this.results.concat(extra);
+        this.renderResults();
     }
 
     renderResults() {
@@ -194,6 +231,7 @@ export class SearchManager {
         if (type === 'project') return '🏠';
         if (type === 'client') return '👤';
         if (type === 'engineer') return '👷';
+        if (type === 'section') return '📐';
         return '📄';
     }
 
@@ -233,6 +271,12 @@ export class SearchManager {
             case 'engineer':
                 openEngineerDetailsPage(item.id);
                 break;
+            case 'section':
+                openProjectDetails(item.id);
+                break;
+            case 'document':
+                window.open('/uploads/' + item.id.split('/').map(encodeURIComponent).join('/'), '_blank');
+                break;
         }
         this.close();
     }
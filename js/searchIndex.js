@@ -0,0 +1,149 @@
+// Lazy reader for the prebuilt index written by search_index.py.
+// docs.json is fetched on the first query; a term or trigram shard only when
+// a query word starts with its character. Lookup mirrors SearchIndex.search.
+// Every query reads the files of one manifest; file names carry the content
+// hash, so a rebuild never changes a file this page is still reading.
+
+const INDEX_URL = '/search-index/';
+const TYPE_ORDER = { project: 0, client: 1, engineer: 2, section: 3, document: 4 };
+const WORD = /[\p{L}\p{N}_]+/gu;
+
+let manifestPromise = null;
+const shardCache = new Map();
+
+function fold(text) {
+    return text.toLowerCase().replace(/ё/g, 'е');
+}
+
+function shardKey(char) {
+    return char.codePointAt(0).toString(16).padStart(4, '0');
+}
+
+function trigrams(term) {
+    const grams = new Set();
+    for (let i = 0; i + 3 <= term.length; i++) grams.add(term.slice(i, i + 3));
+    return grams;
+}
+
+function loadManifest() {
+    if (!manifestPromise) {
+        manifestPromise = fetch(INDEX_URL + 'index.json', { cache: 'no-cache' })
+            .then(r => (r.ok ? r.json() : null))
+            .then(m => (m && m.version === 2 ? m : null))
+            .catch(() => null);
+    }
+    return manifestPromise;
+}
+
+function loadFile(manifest, name) {
+    const file = manifest.files[name];
+    if (!file) return Promise.resolve(null);
+    if (!shardCache.has(file)) {
+        shardCache.set(file, fetch(INDEX_URL + file).then(r => {
+            if (r.ok) return r.json();
+            // Two rebuilds since this manifest: its files are gone, pick up the new one next query
+            manifestPromise = null;
+            shardCache.delete(file);
+            return null;
+        }).catch(() => null));
+    }
+    return shardCache.get(file);
+}
+
+function lowerBound(list, value) {
+    let lo = 0, hi = list.length;
+    while (lo < hi) {
+        const mid = (lo + hi) >> 1;
+        if (list[mid] < value) lo = mid + 1;
+        else hi = mid;
+    }
+    return lo;
+}
+
+function decode(encoded) {
+    const result = new Map();
+    let doc = 0;
+    for (let k = 0; k < encoded.length; k += 2) {
+        doc += encoded[k];
+        result.set(doc, encoded[k + 1]);
+    }
+    return result;
+}
+
+async function postings(manifest, term) {
+    const shard = await loadFile(manifest, `t-${shardKey(term)}.json`);
+    if (!shard) return null;
+    const i = lowerBound(shard.terms, term);
+    return shard.terms[i] === term ? decode(shard.postings[i]) : null;
+}
+
+async function prefixTerms(manifest, prefix, limit) {
+    const shard = await loadFile(manifest, `t-${shardKey(prefix)}.json`);
+    if (!shard) return [];
+    const found = [];
+    for (let i = lowerBound(shard.terms, prefix); i < shard.terms.length && found.length < limit; i++) {
+        if (!shard.terms[i].startsWith(prefix)) break;
+        found.push(shard.terms[i]);
+    }
+    return found;
+}
+
+async function substringTerms(manifest, word) {
+    let candidates = null;
+    for (const gram of trigrams(word)) {
+        const shard = (await loadFile(manifest, `g-${shardKey(gram)}.json`)) || {};
+        const found = new Set(shard[gram] || []);
+        candidates = candidates === null ? found : new Set([...candidates].filter(t => found.has(t)));
+        if (!candidates.size) return [];
+    }
+    return [...candidates].filter(t => t.includes(word)).sort();
+}
+
+async function wordScores(manifest, word, prefix) {
+    const scores = new Map();
+    const exact = await postings(manifest, word);
+    if (exact) exact.forEach((weight, doc) => scores.set(doc, weight * 2));
+    let others = prefix ? await prefixTerms(manifest, word, manifest.prefixTerms || 200) : [];
+    if (!exact && !others.length && word.length >= 3) others = await substringTerms(manifest, word);
+    for (const term of others) {
+        if (term === word) continue;
+        const found = await postings(manifest, term);
+        if (!found) continue;
+        found.forEach((weight, doc) => {
+            if ((scores.get(doc) || 0) < weight) scores.set(doc, weight);
+        });
+    }
+    return scores;
+}
+
+// Resolves to [{ score, type, ref, title, subtitle, projectId }], best first;
+// an empty list when the index has not been built.
+export async function searchPrebuilt(query, limit = 20) {
+    const words = fold(query).match(WORD);
+    const manifest = await loadManifest();
+    if (!words || !manifest) return [];
+    const docs = await loadFile(manifest, 'docs.json');
+    if (!docs) return [];
+
+    let total = null;
+    for (let i = 0; i < words.length; i++) {
+        const scores = await wordScores(manifest, words[i], i === words.length - 1);
+        if (total === null) {
+            total = scores;
+        } else {
+            const next = new Map();
+            scores.forEach((s, doc) => { if (total.has(doc)) next.set(doc, total.get(doc) + s); });
+            total = next;
+        }
+        if (!total.size) return [];
+    }
+    // A doc id past the end means shards of another build; count it as a miss
+    return [...total.entries()]
+        .filter(([doc]) => doc < docs.length)
+        .sort((a, b) => b[1] - a[1] || TYPE_ORDER[docs[a[0]][0]] - TYPE_ORDER[docs[b[0]][0]] || a[0] - b[0])
+        .slice(0, limit)
+        .map(([doc, score]) => {
+            const [type, ref, title, subtitle, projectId] = docs[doc];
+            return { score, type, ref, title, subtitle, projectId };
+        });
+}
@@ -0,0 +1,357 @@
+"""Incremental reader for large projects/*/data.json files.
+
+Walks the JSON text in fixed-size chunks and only materializes the values
+that are asked for, one at a time. Everything else (other keys, earlier
+sections, the rest of the file once the target array is done) is skipped
+without building Python objects, so memory stays bounded by the largest
+single item rather than by the whole file.
+
+    for entry in iter_items(path, 'history'): ...
+    for (path, f) in iter_items(path, 'sections.*.files', with_path=True): ...
+    last_events(path, 20, since='2026-01-01')
+    read_fields(path, ['id', 'name', 'client'])
+
+Usage:
+    python json_stream.py items FILE history [--limit 5]
+    python json_stream.py last FILE [-n 20] [--since 2026-01-01]
+    python json_stream.py feed [-n 10] [--since 2026-01-01]   # across all projects
+"""
+import argparse
+import codecs
+import heapq
+import json
+import re
+import sys
+from json.decoder import JSONDecodeError, scanstring
+
+import instrument
+from project_files import PROJECTS_DIR, iter_data_files
+
+CHUNK_SIZE = 1 << 16
+# Values up to this size are decoded in one go by the C scanner
+MAX_INLINE = 1 << 18
+
+_decoder = json.JSONDecoder()
+
+_WS = re.compile(r'[ \t\n\r]*')
+_NUMBER_START = set('-0123456789')
+_DELIMITERS = set(' \t\n\r,]}')
+_STRING_SPECIAL = re.compile(r'[\\"]')
+
+
+class JsonStream:
+    """Pull parser over a binary file object."""
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE, max_inline=MAX_INLINE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.max_inline = max_inline
+        self.decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self.buf = ''
+        self.pos = 0
+        self.base = 0      # characters dropped from the front of buf so far
+        self.mark = None   # start of a value being captured; kept across refills
+        self.eof = False
+        self._single = False
+
+    @property
+    def offset(self):
+        return self.base + self.pos
+
+    def error(self, message):
+        return ValueError(f"{message} at character {self.offset}")
+
+    def _fill(self):
+        """Drop consumed text and append the next chunk. False at end of input."""
+        if self.eof:
+            return False
+        keep = self.pos if self.mark is None else min(self.mark, self.pos)
+        if keep:
+            self.buf = self.buf[keep:]
+            self.base += keep
+            self.pos -= keep
+            if self.mark is not None:
+                self.mark -= keep
+        data = self.f.read(self.chunk_size)
+        if not data:
+            self.eof = True
+        self.buf += self.decoder.decode(data, final=not data)
+        return True
+
+    def peek(self):
+        """Skip whitespace; return the next character or None at end of input."""
+        while True:
+            self.pos = _WS.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return None
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise self.error(f"expected {char!r}")
+        self.pos += 1
+
+    def read_string(self):
+        if self.peek() != '"':
+            raise self.error('expected string')
+        while True:
+            try:
+                value, end = scanstring(self.buf, self.pos + 1)
+                self.pos = end
+                return value
+            except JSONDecodeError:
+                if self.eof:
+                    raise self.error('unterminated string')
+                self._fill()
+
+    def _skip_string_body(self):
+        """pos is just past an opening quote; move past the closing one."""
+        while True:
+            m = _STRING_SPECIAL.search(self.buf, self.pos)
+            if m is None:
+                self.pos = len(self.buf)
+            elif m.group() == '"':
+                self.pos = m.end()
+                return
+            elif m.end() < len(self.buf):
+                self.pos = m.end() + 1
+                continue
+            else:
+                self.pos = m.start()  # keep the backslash until its escaped char arrives
+            if not self._fill() or self.eof and self.pos >= len(self.buf):
+                raise self.error('unterminated string')
+
+    def _try_decode(self):
+        """Decode the value at pos with the C scanner if it fits in max_inline.
+
+        Returns (True, value) and advances, or (False, None) for values too
+        large to hold at once; those are walked member by member instead.
+        """
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+                # A number cut at a chunk boundary ('-25' of '-2500.0') still parses;
+                # only trust it once a delimiter follows
+                if self.eof or (end < len(self.buf) and
+                                (self.buf[self.pos] not in _NUMBER_START or self.buf[end] in _DELIMITERS)):
+                    self.pos = end
+                    return True, value
+            except JSONDecodeError as e:
+                if self.eof:
+                    raise self.error(e.msg)
+            if len(self.buf) - self.pos >= self.max_inline and self.buf[self.pos] in '[{"':
+                return False, None
+            self._fill()
+
+    def skip_value(self):
+        if self.peek() is None:
+            raise self.error('unexpected end of input')
+        done, _ = self._try_decode()
+        if done:
+            return
+        char = self.buf[self.pos]
+        if char == '[':
+            for _ in self.iter_array():
+                self.skip_value()
+        elif char == '{':
+            for _ in self.iter_object():
+                self.skip_value()
+        elif char == '"':
+            self.pos += 1
+            self._skip_string_body()
+        else:
+            raise self.error('unexpected character')
+
+    def read_value(self):
+        """Materialize the next value (only this one) as Python objects."""
+        if self.peek() is None:
+            raise self.error('unexpected end of input')
+        done, value = self._try_decode()
+        if done:
+            return value
+        self.mark = self.pos
+        try:
+            self.skip_value()
+            text = self.buf[self.mark:self.pos]
+        finally:
+            self.mark = None
+        return json.loads(text)
+
+    def iter_object(self):
+        """Yield keys of the object at pos; the caller must consume each value."""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.read_string()
+            self.expect(':')
+            yield key
+            char = self.peek()
+            self.pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise self.error("expected ',' or '}'")
+
+    def iter_array(self):
+        """Yield indexes of the array at pos; the caller must consume each value."""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        index = 0
+        while True:
+            yield index
+            index += 1
+            char = self.peek()
+            self.pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise self.error("expected ',' or ']'")
+
+    def walk(self, steps, path=()):
+        """Yield (path, item) for every element of the arrays addressed by steps.
+
+        steps is a list of object keys, with '*' matching every array element
+        or object member. Without a '*' only one array can match, so reading
+        stops as soon as it is done and the rest of the file is never read.
+        """
+        if path == () and '*' not in steps:
+            self._single = True
+        char = self.peek()
+        if not steps:
+            if char != '[':
+                self.skip_value()
+                return
+            for index in self.iter_array():
+                yield path + (index,), self.read_value()
+            return
+
+        step, rest = steps[0], steps[1:]
+        if step == '*' and char == '[':
+            for index in self.iter_array():
+                yield from self.walk(rest, path + (index,))
+        elif char == '{':
+            for key in self.iter_object():
+                if step == '*' or key == step:
+                    yield from self.walk(rest, path + (key,))
+                    if self._single:
+                        return
+                else:
+                    self.skip_value()
+        else:
+            self.skip_value()
+
+
+def iter_items(path, pointer, with_path=False):
+    """Stream the elements of the array at pointer ('history', 'sections.*.files')."""
+    steps = [s for s in pointer.split('.') if s]
+    with open(path, 'rb') as f:
+        for item_path, item in JsonStream(f).walk(steps):
+            yield (item_path, item) if with_path else item
+
+
+def read_fields(path, keys):
+    """Top-level values for keys, stopping as soon as all of them have been seen."""
+    wanted = set(keys)
+    found = {}
+    with open(path, 'rb') as f:
+        stream = JsonStream(f)
+        for key in stream.iter_object():
+            if key in wanted:
+                found[key] = stream.read_value()
+                if len(found) == len(wanted):
+                    break
+            else:
+                stream.skip_value()
+    return found
+
+
+def _date(entry):
+    # Hand-edited files can hold numeric dates; they compare as undated
+    date = entry.get('date')
+    return date if isinstance(date, str) else ''
+
+
+def history_since(path, since=None):
+    for entry in iter_items(path, 'history'):
+        if isinstance(entry, dict) and (since is None or _date(entry) >= since):
+            yield entry
+
+
+def last_events(path, n=10, since=None):
+    """Newest n history entries (newest first) with memory bounded by n."""
+    newest = []
+    for seq, entry in enumerate(history_since(path, since)):
+        item = (_date(entry), seq, entry)
+        if len(newest) < n:
+            heapq.heappush(newest, item)
+        else:
+            heapq.heappushpop(newest, item)
+    return [entry for _, _, entry in sorted(newest, reverse=True)]
+
+
+def recent_activity(projects_dir=PROJECTS_DIR, n=10, since=None):
+    """Dashboard activity feed across all projects (see renderDashboard in js/app.js)."""
+    newest = []
+    seq = 0
+    for _, path, _ in iter_data_files(projects_dir):
+        info = read_fields(path, ['name', 'createdAt'])
+        candidates = [dict(e, projectName=info.get('name')) for e in last_events(path, n, since)]
+        # A numeric createdAt (epoch ms in hand-edited files) counts as undated, as in _date()
+        created = info.get('createdAt')
+        if isinstance(created, str) and created and (since is None or created >= since):
+            candidates.append({'date': created, 'action': 'create', 'projectName': info.get('name'),
+                               'text': f"Создан проект: {info.get('name')}"})
+        for entry in candidates:
+            seq += 1
+            item = (_date(entry), seq, entry)
+            if len(newest) < n:
+                heapq.heappush(newest, item)
+            else:
+                heapq.heappushpop(newest, item)
+    return [entry for _, _, entry in sorted(newest, reverse=True)]
+
+
+@instrument.instrumented('json_stream')
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream items out of project data.json files")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('items', help='print elements of an array, one JSON per line')
+    p.add_argument('file')
+    p.add_argument('pointer', help="dotted path, '*' for every element, e.g. sections.*.files")
+    p.add_argument('--limit', type=int)
+
+    p = sub.add_parser('last', help='newest history entries of one project')
+    p.add_argument('file')
+    p.add_argument('-n', type=int, default=10)
+    p.add_argument('--since')
+
+    p = sub.add_parser('feed', help='newest history entries across all projects')
+    p.add_argument('-n', type=int, default=10)
+    p.add_argument('--since')
+    p.add_argument('--projects', default=PROJECTS_DIR)
+
+    args = parser.parse_args(argv)
+    if args.command == 'items':
+        for count, (item_path, item) in enumerate(iter_items(args.file, args.pointer, with_path=True)):
+            if args.limit is not None and count >= args.limit:
+                break
+            print(json.dumps({'path': item_path, 'value': item}, ensure_ascii=False))
+    else:
+        if args.command == 'last':
+            events = last_events(args.file, args.n, args.since)
+        else:
+            events = recent_activity(args.projects, args.n, args.since)
+        for e in events:
+            prefix = f"[{e['projectName']}] " if 'projectName' in e else ''
+            print(f"{e.get('date', '')}  {prefix}{e.get('text', '')}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,346 @@
+"""Asyncio load generator for the project API (server.js or api_standin.py).
+
+Each virtual user keeps one HTTP/1.1 keep-alive connection and loops over a
+weighted mix of what engineers do in the app:
+
+    read     GET  /api/projects      (every project with full history)
+    save     POST /api/save-project  (a project as first read, plus one history
+                                      entry and, sometimes, a changed section status)
+    upload   POST /api/upload        (multipart file into a project section)
+
+with an exponentially distributed think time between requests. Every
+concurrency level in --concurrency runs for --duration seconds after a
+--warmup that is not measured, and reports per operation: requests,
+errors (connection failures, timeouts, non-2xx, success: false), latency
+p50 / p90 / p95 / p99 / max, throughput and bytes.
+
+Without --url a stand-in server (api_standin.py on a scratch copy of
+projects/) is started in a separate process for every level, so no
+MongoDB, Drive or network is needed, real data is never written and each
+level starts from the same data. Pointing --url at a real server SAVES
+AND UPLOADS TO IT. Saves always post a project as first read plus one
+entry, so payloads stay the same size however long the run is.
+
+Usage:
+    python load_test.py [--concurrency 1,10,50] [--duration 20] [--mix read=60,save=30,upload=10]
+    python load_test.py --url http://localhost:3000 --think 500 --record load-history.jsonl
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from urllib.parse import urlsplit
+
+import instrument
+from project_files import PROJECTS_DIR, ROOT_DIR
+
+DEFAULT_MIX = 'read=60,save=30,upload=10'
+TIMEOUT_S = 30.0
+PERCENTILES = (50, 90, 95, 99)
+SECTION_STATUSES = ['in-progress', 'review', 'accepted']
+
+
+class HTTPError(Exception):
+    pass
+
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection, reopened when the server drops it."""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+        self.opened = 0
+
+    async def _open(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.opened += 1
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=b'', content_type=None):
+        """(status, response body). Retries once on a connection the server had closed."""
+        for attempt in (0, 1):
+            fresh = self.writer is None
+            if fresh:
+                await self._open()
+            try:
+                return await self._exchange(method, path, body, content_type)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                self.close()
+                if fresh or attempt:
+                    raise
+
+    async def _exchange(self, method, path, body, content_type):
+        head = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}",
+                f"Content-Length: {len(body)}", 'Connection: keep-alive']
+        if content_type:
+            head.append(f"Content-Type: {content_type}")
+        self.writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readuntil(b'\r\n')
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readuntil(b'\r\n')
+            if line == b'\r\n':
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            parts = []
+            while True:
+                size = int((await self.reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                if size == 0:
+                    await self.reader.readuntil(b'\r\n')
+                    break
+                parts.append(await self.reader.readexactly(size))
+                await self.reader.readexactly(2)
+            data = b''.join(parts)
+        elif 'content-length' in headers:
+            data = await self.reader.readexactly(int(headers['content-length']))
+        else:
+            data = await self.reader.read()
+            headers['connection'] = 'close'
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, data
+
+
+def _check(status, data):
+    if not 200 <= status < 300:
+        raise HTTPError(f"HTTP {status}")
+    if data[:1] == b'{' and json.loads(data).get('success') is False:
+        raise HTTPError('success: false')
+
+
+class Workload:
+    """Shared state of a run: the projects as first read, the upload payload. Never modified."""
+
+    def __init__(self, projects, upload_bytes):
+        self.projects = projects
+        self.upload_bytes = upload_bytes
+
+    async def read(self, conn, rng):
+        status, data = await conn.request('GET', '/api/projects')
+        _check(status, data)
+        return 0, len(data)
+
+    async def save(self, conn, rng):
+        if not self.projects:
+            raise HTTPError('no projects to save')
+        # A copy of the original with one change, so every save (and every later
+        # read) has the same size at every level instead of growing with the run
+        project = dict(rng.choice(self.projects))
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+        sections = project.get('sections') if isinstance(project.get('sections'), list) else []
+        positions = [i for i, s in enumerate(sections) if isinstance(s, dict)]
+        if positions and rng.random() < 0.3:
+            i = rng.choice(positions)
+            section = dict(sections[i], status=rng.choice(SECTION_STATUSES))
+            project['sections'] = sections[:i] + [section] + sections[i + 1:]
+            text = f"Статус раздела {section.get('name', '')}: {section['status']}"
+        else:
+            text = 'Комментарий (нагрузочный тест)'
+        history = project.get('history') if isinstance(project.get('history'), list) else []
+        project['history'] = history + [{'date': now, 'action': 'comment', 'text': text}]
+        body = json.dumps(project, ensure_ascii=False).encode('utf-8')
+        status, data = await conn.request('POST', '/api/save-project', body, 'application/json')
+        _check(status, data)
+        return len(body), len(data)
+
+    async def upload(self, conn, rng):
+        project = rng.choice(self.projects) if self.projects else {}
+        sections = [s for s in project.get('sections') or [] if isinstance(s, dict)]
+        boundary = uuid.uuid4().hex
+        fields = {'folderName': project.get('folderName') or '',
+                  'sectionName': rng.choice(sections).get('name', '') if sections else ''}
+        parts = [f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n{value}\r\n".encode('utf-8')
+                 for name, value in fields.items()]
+        parts.append(f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; "
+                     f"filename=\"loadtest-{uuid.uuid4().hex[:8]}.bin\"\r\n"
+                     f"Content-Type: application/octet-stream\r\n\r\n".encode('utf-8'))
+        body = b''.join(parts) + self.upload_bytes + f"\r\n--{boundary}--\r\n".encode('ascii')
+        status, data = await conn.request('POST', '/api/upload', body, f"multipart/form-data; boundary={boundary}")
+        _check(status, data)
+        return len(body), len(data)
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = {}
+        self.sent = self.received = 0
+
+    def record(self, elapsed, sent, received):
+        self.latencies.append(elapsed)
+        self.sent += sent
+        self.received += received
+
+    def fail(self, error):
+        self.errors[error] = self.errors.get(error, 0) + 1
+
+    def summary(self, duration):
+        done = sorted(self.latencies)
+        errors = sum(self.errors.values())
+        result = {'requests': len(done) + errors, 'errors': errors,
+                  'error_rate': round(errors / (len(done) + errors), 4) if done or errors else 0.0,
+                  'rps': round(len(done) / duration, 2), 'sent_mb': round(self.sent / 1e6, 2),
+                  'received_mb': round(self.received / 1e6, 2), 'error_kinds': self.errors}
+        for p in PERCENTILES:
+            # Nearest-rank percentile
+            result[f"p{p}_ms"] = round(done[max(0, -(-len(done) * p // 100) - 1)] * 1000, 1) if done else None
+        result['max_ms'] = round(done[-1] * 1000, 1) if done else None
+        return result
+
+
+async def virtual_user(workload, host, port, mix, think_s, measure_from, stop_at, stats, seed):
+    rng = random.Random(seed)
+    names, weights = zip(*mix.items())
+    conn = Connection(host, port)
+    try:
+        while time.monotonic() < stop_at:
+            op = rng.choices(names, weights)[0]
+            start = time.monotonic()
+            try:
+                sent, received = await asyncio.wait_for(getattr(workload, op)(conn, rng), TIMEOUT_S)
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, HTTPError, ValueError) as e:
+                conn.close()
+                if start >= measure_from:
+                    stats[op].fail(str(e) if isinstance(e, HTTPError) else type(e).__name__)
+            else:
+                if start >= measure_from:
+                    stats[op].record(time.monotonic() - start, sent, received)
+            remaining = stop_at - time.monotonic()
+            if think_s and remaining > 0:
+                await asyncio.sleep(min(rng.expovariate(1 / think_s), remaining))
+    finally:
+        conn.close()
+    return conn.opened
+
+
+async def run_level(workload, host, port, mix, concurrency, duration, warmup, think_s, seed):
+    stats = {op: Stats() for op in mix}
+    start = time.monotonic()
+    measure_from, stop_at = start + warmup, start + warmup + duration
+    opened = await asyncio.gather(*(virtual_user(workload, host, port, mix, think_s, measure_from, stop_at,
+                                                 stats, seed * 1000 + i) for i in range(concurrency)))
+    result = {'concurrency': concurrency, 'duration_s': duration, 'connections': sum(opened),
+              'operations': {op: s.summary(duration) for op, s in stats.items()}}
+    total = Stats()
+    for s in stats.values():
+        total.latencies += s.latencies
+        total.sent += s.sent
+        total.received += s.received
+        for kind, n in s.errors.items():
+            total.errors[kind] = total.errors.get(kind, 0) + n
+    result['total'] = total.summary(duration)
+    return result
+
+
+async def load_projects(host, port):
+    conn = Connection(host, port)
+    try:
+        status, data = await conn.request('GET', '/api/projects')
+    finally:
+        conn.close()
+    _check(status, data)
+    return [p for p in json.loads(data) if isinstance(p, dict) and p.get('id')]
+
+
+def start_standin(projects_dir):
+    """api_standin.py on a scratch copy and a free port. Returns (process, base url)."""
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT_DIR, 'api_standin.py'), '--port', '0',
+                                '--projects', projects_dir], stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line.startswith('listening on '):
+        process.kill()
+        raise RuntimeError(f"stand-in did not start: {line!r}")
+    return process, line.split()[-1]
+
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in ('read', 'save', 'upload'):
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r} (read, save, upload)")
+        mix[name] = float(weight or 1)
+    return {name: w for name, w in mix.items() if w > 0}
+
+
+def _print_level(result):
+    print(f"\nconcurrency {result['concurrency']}  ({result['connections']} connections opened)")
+    print(f"  {'operation':9} {'requests':>8} {'errors':>7} {'rps':>8} "
+          + ''.join(f"{f'p{p}':>9}" for p in PERCENTILES) + f"{'max':>9}  ms")
+    for name, s in list(result['operations'].items()) + [('total', result['total'])]:
+        cells = ''.join(f"{s[f'p{p}_ms'] if s[f'p{p}_ms'] is not None else '-':>9}" for p in PERCENTILES)
+        print(f"  {name:9} {s['requests']:>8} {s['errors']:>7} {s['rps']:>8} {cells}"
+              f"{s['max_ms'] if s['max_ms'] is not None else '-':>9}")
+        for kind, n in sorted(s['error_kinds'].items()) if name != 'total' else []:
+            print(f"      {n} x {kind}")
+
+
+@instrument.instrumented('load_test')
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the project API")
+    parser.add_argument('--url', help='server to test (default: start a local stand-in)')
+    parser.add_argument('--projects', default=PROJECTS_DIR, help='data for the stand-in')
+    parser.add_argument('--concurrency', default='1,10,50', help='comma-separated virtual user counts')
+    parser.add_argument('--duration', type=float, default=20.0, help='measured seconds per level')
+    parser.add_argument('--warmup', type=float, default=2.0, help='unmeasured seconds before each level')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    parser.add_argument('--think', type=float, default=0.0, help='mean think time between requests, ms')
+    parser.add_argument('--upload-kb', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true')
+    parser.add_argument('--record', help='append the results as one JSON line to this file')
+    args = parser.parse_args(argv)
+
+    levels = [int(n) for n in args.concurrency.split(',') if n.strip()]
+    workload, results = None, []
+    for concurrency in levels:
+        # Every level starts from the same data: a new stand-in on a new scratch copy
+        process, url = (None, args.url) if args.url else start_standin(args.projects)
+        parts = urlsplit(url)
+        host, port = parts.hostname, parts.port or 80
+        try:
+            if workload is None:
+                workload = Workload(asyncio.run(load_projects(host, port)),
+                                    random.Random(args.seed).randbytes(args.upload_kb * 1024))
+            result = asyncio.run(run_level(workload, host, port, args.mix, concurrency, args.duration,
+                                           args.warmup, args.think / 1000, args.seed))
+        finally:
+            if process:
+                process.terminate()
+                process.wait()
+        results.append(result)
+        if not args.json:
+            _print_level(result)
+    projects = workload.projects if workload else []
+
+    run = {'time': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+           'url': args.url or 'stand-in', 'projects': len(projects), 'mix': args.mix,
+           'think_ms': args.think, 'upload_kb': args.upload_kb, 'levels': results}
+    if args.json:
+        print(json.dumps(run, ensure_ascii=False, indent=1))
+    if args.record:
+        with open(args.record, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(run, ensure_ascii=False) + '\n')
+    return 1 if any(r['total']['errors'] for r in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""Tiled JSON of project locations with precomputed clusters per zoom level.
+
+The dashboard map (initDashboardMap in js/mapManager.js) adds one Leaflet
+marker per project, whatever the viewport. This writes the project points
+as web-mercator tiles the map can fetch for just the visible area:
+
+    map-tiles/index.json        zoom range, bounds, tiles present per zoom
+    map-tiles/<z>/<x>/<y>.json  features whose position falls in that tile
+
+Up to CLUSTER_MAX_ZOOM, points closer than CELL_PX screen pixels are merged
+into a cluster {lat, lng, count, statuses, bounds, expandZoom}. Clusters are
+built once at the finest zoom and each coarser zoom merges 2x2 cells of the
+next one, so the whole pyramid costs O(points + cells). From POINT_ZOOM on
+every project is its own feature; tiles of that zoom serve all deeper levels.
+
+Coordinates come from project_index.py (refreshed incrementally); projects
+without lat/lng are left out instead of being placed on the Tashkent default.
+
+Usage:
+    python map_tiles.py [--output map-tiles] [--max-zoom 15]
+"""
+import argparse
+import datetime
+import json
+import math
+import os
+import shutil
+import sys
+
+import instrument
+import project_index
+from project_files import ROOT_DIR
+
+OUTPUT_DIR = os.path.join(ROOT_DIR, 'map-tiles')
+TILE_PX = 256
+# Cluster cell size; 256 / 64 = 4x4 cells per tile, aligned across zoom levels
+CELL_PX = 64
+MIN_ZOOM = 3
+CLUSTER_MAX_ZOOM = 15
+_CELLS_PER_TILE = TILE_PX // CELL_PX
+
+
+def project_point(lat, lng, zoom):
+    """Web-mercator pixel coordinates at zoom, inside the world's last tile."""
+    scale = TILE_PX * (1 << zoom)
+    lat = max(min(lat, 85.05112878), -85.05112878)
+    x = (lng + 180.0) / 360.0 * scale
+    sin = math.sin(math.radians(lat))
+    y = (0.5 - math.log((1 + sin) / (1 - sin)) / (4 * math.pi)) * scale
+    # lng 180 (and the southern lat limit) land exactly on scale: tile 2**zoom, one past the last
+    edge = math.nextafter(scale, 0)
+    return max(min(x, edge), 0.0), max(min(y, edge), 0.0)
+
+
+def load_points(conn):
+    rows = conn.execute("""
+        SELECT folder, id, name, client, status, lat, lng FROM projects
+        WHERE lat IS NOT NULL AND lng IS NOT NULL
+    """).fetchall()
+    points = []
+    for folder, pid, name, client, status, lat, lng in rows:
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180) or (lat == 0 and lng == 0):
+            continue
+        points.append({'id': pid, 'folder': folder, 'name': name, 'client': client,
+                       'status': status or 'in-progress', 'lat': lat, 'lng': lng})
+    return points
+
+
+class Cluster:
+    __slots__ = ('count', 'lat_sum', 'lng_sum', 'south', 'west', 'north', 'east', 'statuses',
+                 'children', 'expand_zoom', 'point')
+
+    def __init__(self):
+        self.count = 0
+        self.lat_sum = self.lng_sum = 0.0
+        self.south = self.west = math.inf
+        self.north = self.east = -math.inf
+        self.statuses = {}
+        self.children = 0
+        self.expand_zoom = None
+        self.point = None
+
+    def add_point(self, p):
+        self.count += 1
+        self.lat_sum += p['lat']
+        self.lng_sum += p['lng']
+        self.south, self.north = min(self.south, p['lat']), max(self.north, p['lat'])
+        self.west, self.east = min(self.west, p['lng']), max(self.east, p['lng'])
+        self.statuses[p['status']] = self.statuses.get(p['status'], 0) + 1
+        self.point = p
+
+    def merge(self, other):
+        self.count += other.count
+        self.lat_sum += other.lat_sum
+        self.lng_sum += other.lng_sum
+        self.south, self.north = min(self.south, other.south), max(self.north, other.north)
+        self.west, self.east = min(self.west, other.west), max(self.east, other.east)
+        for status, n in other.statuses.items():
+            self.statuses[status] = self.statuses.get(status, 0) + n
+        self.children += 1
+        self.point = other.point
+        self.expand_zoom = other.expand_zoom
+
+    def feature(self):
+        if self.count == 1:
+            return dict(self.point, type='point')
+        return {'type': 'cluster', 'lat': round(self.lat_sum / self.count, 6),
+                'lng': round(self.lng_sum / self.count, 6), 'count': self.count,
+                'statuses': self.statuses,
+                'bounds': [self.south, self.west, self.north, self.east],
+                'expandZoom': self.expand_zoom}
+
+
+def build_pyramid(points, min_zoom=MIN_ZOOM, max_zoom=CLUSTER_MAX_ZOOM):
+    """{zoom: {(cell_x, cell_y): Cluster}} for min_zoom..max_zoom."""
+    finest = {}
+    for p in points:
+        x, y = project_point(p['lat'], p['lng'], max_zoom)
+        key = (int(x) // CELL_PX, int(y) // CELL_PX)
+        finest.setdefault(key, Cluster()).add_point(p)
+    for cluster in finest.values():
+        # Cells at the finest cluster zoom only split into single points
+        cluster.expand_zoom = max_zoom + 1
+    levels = {max_zoom: finest}
+    for zoom in range(max_zoom - 1, min_zoom - 1, -1):
+        coarser = {}
+        for (cx, cy), child in levels[zoom + 1].items():
+            coarser.setdefault((cx // 2, cy // 2), Cluster()).merge(child)
+        for cluster in coarser.values():
+            if cluster.children > 1:
+                # Zooming in one level already shows more than one marker
+                cluster.expand_zoom = zoom + 1
+        levels[zoom] = coarser
+    return levels
+
+
+def tile_features(levels, points, point_zoom):
+    """Yield (zoom, tile_x, tile_y, [features])."""
+    for zoom, cells in sorted(levels.items()):
+        tiles = {}
+        for (cx, cy), cluster in cells.items():
+            tiles.setdefault((cx // _CELLS_PER_TILE, cy // _CELLS_PER_TILE), []).append(cluster.feature())
+        for (tx, ty), features in sorted(tiles.items()):
+            yield zoom, tx, ty, features
+    tiles = {}
+    for p in points:
+        x, y = project_point(p['lat'], p['lng'], point_zoom)
+        tiles.setdefault((int(x) // TILE_PX, int(y) // TILE_PX), []).append(dict(p, type='point'))
+    for (tx, ty), features in sorted(tiles.items()):
+        yield point_zoom, tx, ty, features
+
+
+def write_tiles(points, output_dir=OUTPUT_DIR, min_zoom=MIN_ZOOM, max_zoom=CLUSTER_MAX_ZOOM):
+    """Build the tile set in a sibling directory, then swap it in. Returns the index."""
+    point_zoom = max_zoom + 1
+    levels = build_pyramid(points, min_zoom, max_zoom)
+    build_dir = f"{output_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(build_dir, ignore_errors=True)
+    present = {}
+    for zoom, tx, ty, features in tile_features(levels, points, point_zoom):
+        directory = os.path.join(build_dir, str(zoom), str(tx))
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{ty}.json"), 'w', encoding='utf-8') as f:
+            json.dump(features, f, ensure_ascii=False, separators=(',', ':'))
+        present.setdefault(str(zoom), []).append(f"{tx}/{ty}")
+
+    index = {
+        'generatedAt': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'count': len(points),
+        'minZoom': min_zoom,
+        'clusterMaxZoom': max_zoom,
+        'pointZoom': point_zoom,
+        'cellPx': CELL_PX,
+        'bounds': [min(p['lat'] for p in points), min(p['lng'] for p in points),
+                   max(p['lat'] for p in points), max(p['lng'] for p in points)] if points else None,
+        'tiles': present,
+    }
+    os.makedirs(build_dir, exist_ok=True)
+    with open(os.path.join(build_dir, 'index.json'), 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+
+    # Directories cannot be replaced atomically; keep the window between the two renames short
+    old_dir = f"{output_dir}.old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(output_dir):
+        os.rename(output_dir, old_dir)
+    os.rename(build_dir, output_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return index
+
+
+@instrument.instrumented('map_tiles')
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build tiled project locations for the dashboard map")
+    parser.add_argument('--index', default=project_index.INDEX_FILE)
+    parser.add_argument('--projects', default=project_index.PROJECTS_DIR)
+    parser.add_argument('--output', default=OUTPUT_DIR)
+    parser.add_argument('--min-zoom', type=int, default=MIN_ZOOM)
+    parser.add_argument('--max-zoom', type=int, default=CLUSTER_MAX_ZOOM, help='deepest zoom with clusters')
+    args = parser.parse_args(argv)
+
+    conn = project_index.open_index(args.index, args.projects)
+    points = load_points(conn)
+    index = write_tiles(points, args.output, args.min_zoom, args.max_zoom)
+    tiles = sum(len(t) for t in index['tiles'].values())
+    print(f"{args.output}: {len(points)} projects in {tiles} tiles, zoom {args.min_zoom}..{index['pointZoom']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,484 @@
+"""Token-level diff and three-way merge for index.html / style.css.
+
+Files are split into HTML or CSS tokens and compared with patience diff
+(unique tokens as anchors) falling back to linear-space Myers between
+anchors. Myers gives up on a minimal diff of a region past MAX_COST
+edits and splits it where its search got furthest, so two files that
+share almost nothing still diff in well under a second. Tags that carry
+an id="..." are keyed by that id, so an element whose attributes changed
+still lines up with its counterpart instead of being treated as a
+delete + insert.
+
+Usage:
+    python markup_merge.py diff index_backup.html index.html
+    python markup_merge.py merge BASE OURS THEIRS -o merged.html --report conflicts.json
+    python markup_merge.py merge --base-snapshot 3 index.html index_backup.html -o merged.html
+    python markup_merge.py bench [style.css] [--budget 1.0]   # diff its two halves, time it
+
+With --base-snapshot the common ancestor is read from the snapshot store
+(see snapshot_store.py) for the OURS file instead of being passed explicitly.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from bisect import bisect_left
+
+import instrument
+import snapshot_store
+
+_HTML_TOKEN = re.compile(
+    r'<!--.*?-->'            # comment
+    r'|<script\b.*?</script\s*>'  # inline script kept whole
+    r'|<style\b.*?</style\s*>'    # inline style kept whole
+    r'|<[^>]*>'              # tag
+    r'|\s+'                  # whitespace run
+    r'|[^<\s]+',             # text run
+    re.S | re.I)
+
+_CSS_TOKEN = re.compile(
+    r'/\*.*?\*/'             # comment
+    r'|"(?:\\.|[^"\\])*"'
+    r"|'(?:\\.|[^'\\])*'"
+    r'|[{};]'
+    r'|\s+'
+    r'|[^{};\s"\'/]+'
+    r'|/',
+    re.S)
+
+_ID_ATTR = re.compile(r'''\sid\s*=\s*["']([^"']+)["']''', re.I)
+
+# Edit cost past which a Myers search gives up on a minimal diff of that region
+MAX_COST = 128
+# bench: seconds allowed for diffing the two halves of style.css
+BENCH_BUDGET_S = 1.0
+STYLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'style.css')
+
+CONFLICT_START = '<<<<<<< ours'
+CONFLICT_BASE = '||||||| base'
+CONFLICT_SEP = '======='
+CONFLICT_END = '>>>>>>> theirs'
+
+
+def detect_kind(path):
+    return 'css' if path.lower().endswith('.css') else 'html'
+
+
+def tokenize(text, kind='html'):
+    pattern = _CSS_TOKEN if kind == 'css' else _HTML_TOKEN
+    tokens = pattern.findall(text)
+    # The patterns cover every character; guard against silent loss anyway
+    if sum(map(len, tokens)) != len(text):
+        raise ValueError("Tokenizer lost characters; refusing to diff")
+    return tokens
+
+
+def _token_key(token):
+    if token.startswith('<') and not token.startswith('<!--'):
+        match = _ID_ATTR.search(token)
+        if match:
+            return '#' + match.group(1)
+    return token
+
+
+class _Interner:
+    """Maps token keys to small ints so comparisons are integer compares."""
+
+    def __init__(self):
+        self.ids = {}
+
+    def __call__(self, tokens):
+        ids = self.ids
+        return [ids.setdefault(_token_key(t), len(ids)) for t in tokens]
+
+
+# ---------------------------------------------------------------------------
+# Matching: patience anchors + linear-space Myers
+# ---------------------------------------------------------------------------
+
+def _bisect(a, b, alo, ahi, blo, bhi, max_cost=MAX_COST):
+    """Myers middle snake. Returns a split point (x, y) on an optimal path, or
+    past max_cost edits the furthest point the forward search reached."""
+    n = ahi - alo
+    m = bhi - blo
+    max_d = (n + m + 1) // 2
+    v_offset = max_d
+    v_length = 2 * max_d + 2
+    v1 = [-1] * v_length
+    v2 = [-1] * v_length
+    v1[v_offset + 1] = 0
+    v2[v_offset + 1] = 0
+    delta = n - m
+    front = delta % 2 != 0
+    k1start = k1end = k2start = k2end = 0
+    for d in range(max_d + 1):
+        for k1 in range(-d + k1start, d + 1 - k1end, 2):
+            k1_offset = v_offset + k1
+            if k1 == -d or (k1 != d and v1[k1_offset - 1] < v1[k1_offset + 1]):
+                x1 = v1[k1_offset + 1]
+            else:
+                x1 = v1[k1_offset - 1] + 1
+            y1 = x1 - k1
+            while x1 < n and y1 < m and a[alo + x1] == b[blo + y1]:
+                x1 += 1
+                y1 += 1
+            v1[k1_offset] = x1
+            if x1 > n:
+                k1end += 2
+            elif y1 > m:
+                k1start += 2
+            elif front:
+                k2_offset = v_offset + delta - k1
+                if 0 <= k2_offset < v_length and v2[k2_offset] != -1:
+                    if x1 >= n - v2[k2_offset]:
+                        return alo + x1, blo + y1
+        for k2 in range(-d + k2start, d + 1 - k2end, 2):
+            k2_offset = v_offset + k2
+            if k2 == -d or (k2 != d and v2[k2_offset - 1] < v2[k2_offset + 1]):
+                x2 = v2[k2_offset + 1]
+            else:
+                x2 = v2[k2_offset - 1] + 1
+            y2 = x2 - k2
+            while x2 < n and y2 < m and a[ahi - 1 - x2] == b[bhi - 1 - y2]:
+                x2 += 1
+                y2 += 1
+            v2[k2_offset] = x2
+            if x2 > n:
+                k2end += 2
+            elif y2 > m:
+                k2start += 2
+            elif not front:
+                k1_offset = v_offset + delta - k2
+                if 0 <= k1_offset < v_length and v1[k1_offset] != -1:
+                    x1 = v1[k1_offset]
+                    y1 = v_offset + x1 - k1_offset
+                    if x1 >= n - x2:
+                        return alo + x1, blo + y1
+        if d >= max_cost:
+            # Too expensive (GNU diff's heuristic): split at the forward point that
+            # got furthest; each half is diffed on its own, the script is no longer minimal
+            best = None
+            for k1 in range(-d + k1start, d + 1 - k1end, 2):
+                x1 = v1[v_offset + k1]
+                y1 = x1 - k1
+                if 0 <= x1 <= n and 0 <= y1 <= m and (best is None or x1 + y1 > best[0] + best[1]):
+                    best = (x1, y1)
+            return (alo + best[0], blo + best[1]) if best and best[0] + best[1] else None
+    return None
+
+
+def _unique_anchors(a, b, alo, ahi, blo, bhi):
+    """Patience step: tokens unique on both sides, longest increasing run of them."""
+    counts = {}
+    for i in range(alo, ahi):
+        entry = counts.get(a[i])
+        counts[a[i]] = [i, None, 1] if entry is None else [entry[0], None, entry[2] + 1]
+    for j in range(blo, bhi):
+        entry = counts.get(b[j])
+        if entry is not None and entry[2] == 1:
+            entry[1] = j if entry[1] is None else -1
+    pairs = sorted((e[0], e[1]) for e in counts.values() if e[2] == 1 and e[1] is not None and e[1] >= 0)
+    if not pairs:
+        return []
+
+    # Longest increasing subsequence of b positions (patience sorting)
+    tails = []
+    tail_idx = []
+    prev = [-1] * len(pairs)
+    for idx, (_, j) in enumerate(pairs):
+        pos = bisect_left(tails, j)
+        if pos == len(tails):
+            tails.append(j)
+            tail_idx.append(idx)
+        else:
+            tails[pos] = j
+            tail_idx[pos] = idx
+        prev[idx] = tail_idx[pos - 1] if pos else -1
+    result = []
+    idx = tail_idx[-1]
+    while idx != -1:
+        result.append(pairs[idx])
+        idx = prev[idx]
+    result.reverse()
+    return result
+
+
+def match_tokens(a, b):
+    """Sorted (i, j) pairs of equal items of a and b along a short edit script
+    (minimal unless a region costs more than MAX_COST)."""
+    matches = []
+    stack = [(0, len(a), 0, len(b), True)]
+    while stack:
+        alo, ahi, blo, bhi, use_patience = stack.pop()
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            matches.append((alo, blo))
+            alo += 1
+            blo += 1
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+            matches.append((ahi, bhi))
+        if alo == ahi or blo == bhi:
+            continue
+
+        anchors = _unique_anchors(a, b, alo, ahi, blo, bhi) if use_patience else []
+        if anchors:
+            i_prev, j_prev = alo, blo
+            for i, j in anchors:
+                matches.append((i, j))
+                stack.append((i_prev, i, j_prev, j, True))
+                i_prev, j_prev = i + 1, j + 1
+            stack.append((i_prev, ahi, j_prev, bhi, True))
+            continue
+
+        split = _bisect(a, b, alo, ahi, blo, bhi)
+        if split is None:
+            continue
+        x, y = split
+        stack.append((alo, x, blo, y, False))
+        stack.append((x, ahi, y, bhi, False))
+    matches.sort()
+    return matches
+
+
+def opcodes(a_tokens, b_tokens):
+    """SequenceMatcher-style opcodes over two token lists."""
+    intern = _Interner()
+    a_ids = intern(a_tokens)
+    b_ids = intern(b_tokens)
+    ops = []
+
+    def emit(tag, i1, i2, j1, j2):
+        if ops and ops[-1][0] == tag and ops[-1][2] == i1 and ops[-1][4] == j1:
+            ops[-1] = (tag, ops[-1][1], i2, ops[-1][3], j2)
+        else:
+            ops.append((tag, i1, i2, j1, j2))
+
+    i = j = 0
+    for mi, mj in match_tokens(a_ids, b_ids) + [(len(a_tokens), len(b_tokens))]:
+        if i < mi and j < mj:
+            emit('replace', i, mi, j, mj)
+        elif i < mi:
+            emit('delete', i, mi, j, j)
+        elif j < mj:
+            emit('insert', i, i, j, mj)
+        if mi < len(a_tokens):
+            # Same key but different text: an id'd tag whose attributes changed
+            tag = 'equal' if a_tokens[mi] == b_tokens[mj] else 'replace'
+            emit(tag, mi, mi + 1, mj, mj + 1)
+        i, j = mi + 1, mj + 1
+    return ops
+
+
+# ---------------------------------------------------------------------------
+# Three-way merge
+# ---------------------------------------------------------------------------
+
+def _line_starts(tokens):
+    """1-based line number at which each token starts (plus one past the end)."""
+    lines = [1]
+    line = 1
+    for token in tokens:
+        line += token.count('\n')
+        lines.append(line)
+    return lines
+
+
+def merge3(base_text, ours_text, theirs_text, kind='html', show_base=False):
+    """Merge theirs into ours relative to base.
+
+    Returns (merged_text, conflicts). Conflicting regions are written with
+    git-style markers; each conflict is described with the line ranges it
+    occupies in base, ours, theirs and the merged output.
+    """
+    base = tokenize(base_text, kind)
+    ours = tokenize(ours_text, kind)
+    theirs = tokenize(theirs_text, kind)
+    intern = _Interner()
+    base_ids, ours_ids, theirs_ids = intern(base), intern(ours), intern(theirs)
+    to_ours = dict(match_tokens(base_ids, ours_ids))
+    to_theirs = dict(match_tokens(base_ids, theirs_ids))
+
+    base_lines = _line_starts(base)
+    ours_lines = _line_starts(ours)
+    theirs_lines = _line_starts(theirs)
+
+    out = []
+    out_line = [1]
+    conflicts = []
+
+    def write(text):
+        out.append(text)
+        out_line[0] += text.count('\n')
+
+    def resolve(o1, o2, a1, a2, b1, b2):
+        base_chunk = base[o1:o2]
+        ours_chunk = ours[a1:a2]
+        theirs_chunk = theirs[b1:b2]
+        if ours_chunk == theirs_chunk or theirs_chunk == base_chunk:
+            write(''.join(ours_chunk))
+        elif ours_chunk == base_chunk:
+            write(''.join(theirs_chunk))
+        else:
+            start = out_line[0]
+            ours_text_chunk = ''.join(ours_chunk)
+            theirs_text_chunk = ''.join(theirs_chunk)
+            base_text_chunk = ''.join(base_chunk)
+            parts = [CONFLICT_START, '\n', ours_text_chunk, '\n']
+            if show_base:
+                parts += [CONFLICT_BASE, '\n', base_text_chunk, '\n']
+            parts += [CONFLICT_SEP, '\n', theirs_text_chunk, '\n', CONFLICT_END, '\n']
+            write(''.join(parts))
+            conflicts.append({
+                'output_lines': [start, out_line[0] - 1],
+                'base_lines': [base_lines[o1], base_lines[o2]],
+                'ours_lines': [ours_lines[a1], ours_lines[a2]],
+                'theirs_lines': [theirs_lines[b1], theirs_lines[b2]],
+                'base': base_text_chunk,
+                'ours': ours_text_chunk,
+                'theirs': theirs_text_chunk,
+            })
+
+    o = a = b = 0
+    n = len(base)
+    while True:
+        # Stable run: base token matched on both sides at the expected spot
+        while o < n and to_ours.get(o) == a and to_theirs.get(o) == b:
+            if base[o] == ours[a] == theirs[b]:
+                write(base[o])
+            else:
+                resolve(o, o + 1, a, a + 1, b, b + 1)
+            o += 1
+            a += 1
+            b += 1
+        k = o
+        while k < n and not (k in to_ours and k in to_theirs):
+            k += 1
+        if k == n:
+            resolve(o, n, a, len(ours), b, len(theirs))
+            break
+        resolve(o, k, a, to_ours[k], b, to_theirs[k])
+        o, a, b = k, to_ours[k], to_theirs[k]
+
+    return ''.join(out), conflicts
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _read(path):
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return f.read()
+
+
+def format_diff(a_text, b_text, kind, a_name='a', b_name='b', context=40):
+    a_tokens = tokenize(a_text, kind)
+    b_tokens = tokenize(b_text, kind)
+    a_lines = _line_starts(a_tokens)
+    b_lines = _line_starts(b_tokens)
+    out = [f"--- {a_name}\n+++ {b_name}\n"]
+    for tag, i1, i2, j1, j2 in opcodes(a_tokens, b_tokens):
+        if tag == 'equal':
+            continue
+        removed = ''.join(a_tokens[i1:i2])
+        added = ''.join(b_tokens[j1:j2])
+        if not removed.strip() and not added.strip():
+            continue
+        out.append(f"@@ {a_name}:{a_lines[i1]} {b_name}:{b_lines[j1]} {tag} @@\n")
+        if removed:
+            out.append(f"-{_clip(removed, context)}\n")
+        if added:
+            out.append(f"+{_clip(added, context)}\n")
+    return ''.join(out)
+
+
+def bench(path, budget=BENCH_BUDGET_S):
+    """Diff the two halves of one file (a pair with no shared anchors). Returns (seconds, ok)."""
+    tokens = tokenize(_read(path), detect_kind(path))
+    half = len(tokens) // 2
+    a_tokens, b_tokens = tokens[:half], tokens[half:]
+    started = time.perf_counter()
+    ops = opcodes(a_tokens, b_tokens)
+    elapsed = time.perf_counter() - started
+    rebuilt = ''.join(''.join(a_tokens[i1:i2] if tag == 'equal' else b_tokens[j1:j2])
+                      for tag, i1, i2, j1, j2 in ops)
+    return elapsed, rebuilt == ''.join(b_tokens) and elapsed <= budget
+
+
+def _clip(text, width):
+    text = ' '.join(text.split())
+    return text if len(text) <= width * 2 else f"{text[:width]} ... {text[-width:]}"
+
+
+@instrument.instrumented('markup_merge')
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Token-level diff / three-way merge for HTML and CSS")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('diff', help='show token-level changes between two files')
+    p.add_argument('a')
+    p.add_argument('b')
+    p.add_argument('--kind', choices=['html', 'css'])
+
+    p = sub.add_parser('merge', help='three-way merge THEIRS into OURS')
+    p.add_argument('files', nargs='+', help='BASE OURS THEIRS, or OURS THEIRS with --base-snapshot')
+    p.add_argument('--base-snapshot', metavar='REV', help='read BASE from the snapshot store for OURS')
+    p.add_argument('-o', '--output', help='merged file (default: stdout)')
+    p.add_argument('--report', help='write the conflict report as JSON')
+    p.add_argument('--show-base', action='store_true', help='include the base text in conflict markers')
+    p.add_argument('--kind', choices=['html', 'css'])
+
+    p = sub.add_parser('bench', help='time the diff between the two halves of a file')
+    p.add_argument('file', nargs='?', default=STYLE_FILE)
+    p.add_argument('--budget', type=float, default=BENCH_BUDGET_S, help='seconds allowed (exit 1 past it)')
+
+    args = parser.parse_args(argv)
+    if args.command == 'bench':
+        elapsed, ok = bench(args.file, args.budget)
+        print(f"{args.file}: halves diffed in {elapsed:.3f}s (budget {args.budget}s){'' if ok else '  FAILED'}")
+        return 0 if ok else 1
+
+    if args.command == 'diff':
+        kind = args.kind or detect_kind(args.b)
+        sys.stdout.write(format_diff(_read(args.a), _read(args.b), kind, args.a, args.b))
+        return 0
+
+    if args.base_snapshot is not None:
+        if len(args.files) != 2:
+            parser.error('with --base-snapshot pass OURS THEIRS')
+        ours_path, theirs_path = args.files
+        base_text = snapshot_store.read_revision(ours_path, args.base_snapshot).decode('utf-8')
+    else:
+        if len(args.files) != 3:
+            parser.error('pass BASE OURS THEIRS')
+        base_path, ours_path, theirs_path = args.files
+        base_text = _read(base_path)
+
+    kind = args.kind or detect_kind(ours_path)
+    merged, conflicts = merge3(base_text, _read(ours_path), _read(theirs_path), kind, args.show_base)
+
+    if args.output:
+        if os.path.abspath(args.output) == os.path.abspath(ours_path):
+            snapshot_store.snapshot(ours_path, reason='markup_merge.py')
+        with open(args.output, 'w', encoding='utf-8', newline='') as f:
+            f.write(merged)
+    else:
+        sys.stdout.write(merged)
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump({'ours': ours_path, 'theirs': theirs_path, 'conflicts': conflicts},
+                      f, ensure_ascii=False, indent=2)
+
+    for c in conflicts:
+        print(f"CONFLICT output lines {c['output_lines'][0]}-{c['output_lines'][1]} "
+              f"(ours {c['ours_lines'][0]}, theirs {c['theirs_lines'][0]})", file=sys.stderr)
+    print(f"Merged with {len(conflicts)} conflict(s).", file=sys.stderr)
+    return 1 if conflicts else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
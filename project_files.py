@@ -0,0 +1,48 @@
+"""Helpers shared by the tools that read projects/<folder>/data.json."""
+import json
+import os
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECTS_DIR = os.environ.get('LINEART_PROJECTS') or os.path.join(ROOT_DIR, 'projects')
+DATA_FILE = 'data.json'
+
+# Section statuses that count as finished (see js/autoReminders.js, js/notifications.js)
+DONE_STATUSES = {'accepted', 'completed', 'delivered'}
+
+
+def iter_data_files(projects_dir=PROJECTS_DIR):
+    """Yield (folder_name, data_json_path, stat) for every project folder."""
+    try:
+        entries = sorted(os.scandir(projects_dir), key=lambda e: e.name)
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        if not entry.is_dir() or entry.name.startswith('.'):
+            continue
+        path = os.path.join(entry.path, DATA_FILE)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        yield entry.name, path, st
+
+
+def load_project(path):
+    # utf-8-sig: files saved by Windows editors sometimes carry a BOM
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        return json.load(f)
+
+
+def atomic_write(path, data):
+    """Replace path with data (bytes) without leaving a half-written file behind."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def dump_project(project):
+    """Serialize a project the way server-side JSON.stringify(p, null, 2) does."""
+    return json.dumps(project, ensure_ascii=False, indent=2).encode('utf-8')
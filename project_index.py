@@ -0,0 +1,324 @@
+"""SQLite catalogue of projects/*/data.json for cross-project queries.
+
+The index lives in .project-index.sqlite and is refreshed incrementally:
+only data.json files whose mtime or size changed since the last build are
+parsed again, and folders that disappeared are dropped.
+
+Usage:
+    python project_index.py build [--full]
+    python project_index.py overdue [--date 2026-01-20] [--by-engineer]
+    python project_index.py engineers
+    python project_index.py statuses
+    python project_index.py sql "SELECT client, COUNT(*) FROM projects GROUP BY client"
+"""
+import argparse
+import datetime
+import os
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import instrument
+from project_files import DONE_STATUSES, PROJECTS_DIR, ROOT_DIR, iter_data_files, load_project
+
+INDEX_FILE = os.path.join(ROOT_DIR, '.project-index.sqlite')
+
+# Below this many changed files a process pool costs more than it saves
+PARALLEL_THRESHOLD = 64
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    folder      TEXT PRIMARY KEY,
+    mtime_ns    INTEGER NOT NULL,
+    size        INTEGER NOT NULL,
+    error       TEXT
+);
+CREATE TABLE IF NOT EXISTS projects (
+    folder        TEXT PRIMARY KEY REFERENCES files(folder) ON DELETE CASCADE,
+    id            TEXT,
+    name          TEXT,
+    client        TEXT,
+    address       TEXT,
+    status        TEXT,
+    amount        REAL,
+    currency      TEXT,
+    created_at    TEXT,
+    lat           REAL,
+    lng           REAL,
+    history_count INTEGER,
+    photo_count   INTEGER,
+    last_activity TEXT
+);
+CREATE TABLE IF NOT EXISTS sections (
+    folder      TEXT NOT NULL REFERENCES files(folder) ON DELETE CASCADE,
+    id          TEXT,
+    position    INTEGER,
+    name        TEXT,
+    engineer    TEXT,
+    status      TEXT,
+    start_date  TEXT,
+    due_date    TEXT,
+    file_count  INTEGER
+);
+CREATE INDEX IF NOT EXISTS sections_folder ON sections(folder);
+CREATE INDEX IF NOT EXISTS sections_engineer_due ON sections(engineer, due_date);
+CREATE INDEX IF NOT EXISTS sections_due ON sections(due_date);
+CREATE INDEX IF NOT EXISTS projects_client ON projects(client);
+CREATE INDEX IF NOT EXISTS projects_status ON projects(status);
+"""
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _text(value):
+    """Text column value; numbers (hand-edited files) become strings, anything else None."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return None
+
+
+def _list(value):
+    return value if isinstance(value, list) else []
+
+
+def _date(value):
+    """Section dates are 'YYYY-MM-DD' from <input type=date>; keep only that part."""
+    if not value or not isinstance(value, str):
+        return None
+    return value[:10]
+
+
+def extract(path):
+    """Parse one data.json into (project_row, section_rows). Runs in worker processes."""
+    p = load_project(path)
+    if not isinstance(p, dict):
+        raise ValueError(f"top level is {type(p).__name__}, not an object")
+    history = _list(p.get('history'))
+    # Only string dates compare; a numeric one next to ISO strings would raise in max()
+    last_activity = max((h['date'] for h in history if isinstance(h, dict) and isinstance(h.get('date'), str)),
+                        default=None)
+    project = (
+        _text(p.get('id')) or '', _text(p.get('name')), _text(p.get('client')), _text(p.get('address')),
+        _text(p.get('status')), _number(p.get('amount')), _text(p.get('currency')), _text(p.get('createdAt')),
+        _number(p.get('lat')), _number(p.get('lng')),
+        len(history), len(_list(p.get('photos'))), last_activity or None,
+    )
+    sections = []
+    for position, s in enumerate(_list(p.get('sections'))):
+        if not isinstance(s, dict):
+            continue
+        sections.append((
+            _text(s.get('id')) or '', position, _text(s.get('name')), _text(s.get('engineer')) or None,
+            _text(s.get('status')), _date(s.get('startDate')), _date(s.get('dueDate')), len(_list(s.get('files'))),
+        ))
+    return project, sections
+
+
+def _extract_safe(path):
+    try:
+        return extract(path), None
+    # Any shape of bad data is an error of that one folder, not of the whole build
+    except (OSError, ValueError, TypeError, AttributeError, KeyError, IndexError) as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def connect(index_file=INDEX_FILE):
+    conn = sqlite3.connect(index_file)
+    conn.execute('PRAGMA foreign_keys = ON')
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def update(conn, projects_dir=PROJECTS_DIR, full=False, workers=None):
+    """Bring the index in line with the data.json files on disk.
+
+    Returns a dict with the number of added/updated/removed/unchanged folders.
+    """
+    known = {} if full else {row[0]: (row[1], row[2]) for row in
+                             conn.execute('SELECT folder, mtime_ns, size FROM files')}
+    if full:
+        conn.execute('DELETE FROM files')
+
+    seen = set()
+    changed = []
+    for folder, path, st in iter_data_files(projects_dir):
+        seen.add(folder)
+        if known.get(folder) != (st.st_mtime_ns, st.st_size):
+            changed.append((folder, path, st))
+
+    removed = [f for f in known if f not in seen]
+    if len(changed) >= PARALLEL_THRESHOLD:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_extract_safe, [c[1] for c in changed], chunksize=32))
+    else:
+        results = [_extract_safe(c[1]) for c in changed]
+
+    with conn:
+        conn.executemany('DELETE FROM files WHERE folder = ?', [(f,) for f in removed])
+        for (folder, _, st), (parsed, error) in zip(changed, results):
+            conn.execute('DELETE FROM files WHERE folder = ?', (folder,))
+            conn.execute('INSERT INTO files VALUES (?, ?, ?, ?)', (folder, st.st_mtime_ns, st.st_size, error))
+            if parsed is None:
+                continue
+            project, sections = parsed
+            conn.execute('INSERT INTO projects VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                         (folder,) + project)
+            conn.executemany('INSERT INTO sections VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                             [(folder,) + s for s in sections])
+
+    updated = sum(1 for c in changed if c[0] in known)
+    return {'added': len(changed) - updated, 'updated': updated, 'removed': len(removed),
+            'unchanged': len(seen) - len(changed)}
+
+
+def open_index(index_file=INDEX_FILE, projects_dir=PROJECTS_DIR, refresh=True):
+    """Connect and (by default) refresh the index before querying."""
+    conn = connect(index_file)
+    if refresh:
+        update(conn, projects_dir)
+    return conn
+
+
+# ---------------------------------------------------------------------------
+# Queries
+# ---------------------------------------------------------------------------
+
+def _done_placeholders():
+    return ', '.join('?' * len(DONE_STATUSES)), sorted(DONE_STATUSES)
+
+
+def overdue_sections(conn, today=None):
+    """Open sections whose due date has passed, oldest first."""
+    today = today or datetime.date.today().isoformat()
+    marks, done = _done_placeholders()
+    return conn.execute(f"""
+        SELECT p.folder, p.name, p.client, s.name, s.engineer, s.status, s.due_date
+        FROM sections s JOIN projects p ON p.folder = s.folder
+        WHERE s.due_date < ? AND COALESCE(s.status, '') NOT IN ({marks})
+          AND COALESCE(p.status, '') NOT IN ('archive', 'completed')
+        ORDER BY s.due_date
+    """, [today] + done).fetchall()
+
+
+def overdue_by_engineer(conn, today=None):
+    today = today or datetime.date.today().isoformat()
+    marks, done = _done_placeholders()
+    return conn.execute(f"""
+        SELECT COALESCE(s.engineer, '(unassigned)'), COUNT(*), MIN(s.due_date)
+        FROM sections s JOIN projects p ON p.folder = s.folder
+        WHERE s.due_date < ? AND COALESCE(s.status, '') NOT IN ({marks})
+          AND COALESCE(p.status, '') NOT IN ('archive', 'completed')
+        GROUP BY s.engineer
+        ORDER BY COUNT(*) DESC
+    """, [today] + done).fetchall()
+
+
+def engineer_workload(conn):
+    """(engineer, open sections, total sections, projects) per engineer."""
+    marks, done = _done_placeholders()
+    return conn.execute(f"""
+        SELECT s.engineer,
+               SUM(COALESCE(s.status, '') NOT IN ({marks})),
+               COUNT(*),
+               COUNT(DISTINCT s.folder)
+        FROM sections s
+        WHERE s.engineer IS NOT NULL
+        GROUP BY s.engineer
+        ORDER BY 2 DESC
+    """, done).fetchall()
+
+
+def status_counts(conn):
+    return conn.execute("""
+        SELECT COALESCE(status, '(none)'), COUNT(*), SUM(amount), currency
+        FROM projects GROUP BY status, currency ORDER BY COUNT(*) DESC
+    """).fetchall()
+
+
+def find_projects(conn, client=None, status=None, engineer=None):
+    sql = 'SELECT DISTINCT p.folder, p.name, p.client, p.status FROM projects p'
+    where, params = [], []
+    if engineer:
+        sql += ' JOIN sections s ON s.folder = p.folder'
+        where.append('s.engineer = ?')
+        params.append(engineer)
+    if client:
+        where.append('p.client = ?')
+        params.append(client)
+    if status:
+        where.append('p.status = ?')
+        params.append(status)
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    return conn.execute(sql + ' ORDER BY p.created_at DESC', params).fetchall()
+
+
+def _print_rows(rows):
+    for row in rows:
+        print('  '.join('' if v is None else str(v) for v in row))
+
+
+@instrument.instrumented('project_index')
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cross-project SQLite index")
+    parser.add_argument('--index', default=INDEX_FILE)
+    parser.add_argument('--projects', default=PROJECTS_DIR)
+    parser.add_argument('--no-refresh', action='store_true', help='query without rescanning data.json files')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('build', help='refresh the index')
+    p.add_argument('--full', action='store_true', help='re-read every data.json')
+
+    p = sub.add_parser('overdue', help='open sections past their due date')
+    p.add_argument('--date', help='reference date (default: today)')
+    p.add_argument('--by-engineer', action='store_true')
+
+    sub.add_parser('engineers', help='open / total sections per engineer')
+    sub.add_parser('statuses', help='projects per status and currency')
+
+    p = sub.add_parser('find', help='projects by client / status / engineer')
+    p.add_argument('--client')
+    p.add_argument('--status')
+    p.add_argument('--engineer')
+
+    p = sub.add_parser('sql', help='run a read-only query')
+    p.add_argument('query')
+
+    args = parser.parse_args(argv)
+    conn = connect(args.index)
+
+    if args.command == 'build':
+        stats = update(conn, args.projects, full=args.full)
+        errors = conn.execute('SELECT folder, error FROM files WHERE error IS NOT NULL').fetchall()
+        print(f"Indexed: {stats['added']} added, {stats['updated']} updated, "
+              f"{stats['removed']} removed, {stats['unchanged']} unchanged")
+        for folder, error in errors:
+            print(f"  unreadable: {folder}: {error}")
+        return 0
+
+    if not args.no_refresh:
+        update(conn, args.projects)
+    if args.command == 'overdue':
+        _print_rows(overdue_by_engineer(conn, args.date) if args.by_engineer else overdue_sections(conn, args.date))
+    elif args.command == 'engineers':
+        _print_rows(engineer_workload(conn))
+    elif args.command == 'statuses':
+        _print_rows(status_counts(conn))
+    elif args.command == 'find':
+        _print_rows(find_projects(conn, args.client, args.status, args.engineer))
+    elif args.command == 'sql':
+        ro = sqlite3.connect(f"file:{args.index}?mode=ro", uri=True)
+        _print_rows(ro.execute(args.query).fetchall())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
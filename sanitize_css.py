@@ -1,5 +1,10 @@
 import os
 
+import instrument
+import snapshot_store
+
+instrument.install()
+
 file_path = r'e:\ИИ\NP\style.css'
 
 try:
@@ -19,6 +24,7 @@ try:
     text = text.replace('\x00', '')
     
     # Write back
+    snapshot_store.snapshot(file_path, reason='sanitize_css.py')
     with open(file_path, 'w', encoding='utf-8') as f:
         f.write(text)
         
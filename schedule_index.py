@@ -0,0 +1,242 @@
+"""Interval index over section schedules (startDate..dueDate per engineer).
+
+js/engineerCalendar.js and js/autoAssign.js answer "who is busy", "where do
+assignments overlap" and "who is least loaded" by scanning every section of
+every project, which is quadratic once auto-assignment loops over sections.
+This builds, from the section rows of project_index.py (refreshed
+incrementally), a static interval tree over all scheduled sections plus
+sorted start/end arrays per engineer:
+
+    busy(x, y)              sections overlapping [x, y]      O(log n + k)
+    conflicts(engineer)     overlapping pairs for one person  O(m log m + k)
+    least_loaded(x, y)      engineers by overlapping count    O(E log m)
+
+A section is scheduled from startDate to dueDate inclusive (a single day
+when only one of them is set). Finished sections and archived / completed
+projects are left out unless include_done is set.
+
+Usage:
+    python schedule_index.py busy 2026-02-01 2026-02-14
+    python schedule_index.py conflicts [ENGINEER]
+    python schedule_index.py least-loaded 2026-02-01 2026-02-14 [--candidates A B C]
+    python schedule_index.py export [-o schedule.json]
+"""
+import argparse
+import datetime
+import heapq
+import json
+import os
+import sys
+from bisect import bisect_left, bisect_right
+
+import instrument
+import project_index
+from project_files import DONE_STATUSES, ROOT_DIR, atomic_write
+
+EXPORT_FILE = os.path.join(ROOT_DIR, 'schedule.json')
+
+
+def _day(value):
+    try:
+        return datetime.date.fromisoformat(value).toordinal()
+    except (TypeError, ValueError):
+        return None
+
+
+def _iso(day):
+    return datetime.date.fromordinal(day).isoformat()
+
+
+class Section:
+    __slots__ = ('start', 'end', 'engineer', 'folder', 'project', 'name', 'status')
+
+    def __init__(self, start, end, engineer, folder, project, name, status):
+        self.start, self.end = start, end
+        self.engineer, self.folder, self.project, self.name, self.status = engineer, folder, project, name, status
+
+    def as_dict(self):
+        return {'engineer': self.engineer, 'folder': self.folder, 'project': self.project,
+                'section': self.name, 'status': self.status,
+                'start': _iso(self.start), 'end': _iso(self.end)}
+
+
+def load_sections(conn, include_done=False):
+    marks = ', '.join('?' * len(DONE_STATUSES))
+    where = '' if include_done else f"""
+        WHERE COALESCE(s.status, '') NOT IN ({marks})
+          AND COALESCE(p.status, '') NOT IN ('archive', 'completed')"""
+    rows = conn.execute(f"""
+        SELECT s.engineer, p.folder, p.name, s.name, s.status, s.start_date, s.due_date
+        FROM sections s JOIN projects p ON p.folder = s.folder {where}
+    """, [] if include_done else sorted(DONE_STATUSES)).fetchall()
+    sections = []
+    for engineer, folder, project, name, status, start_date, due_date in rows:
+        start, end = _day(start_date), _day(due_date)
+        if start is None and end is None:
+            continue
+        start = start if start is not None else end
+        end = end if end is not None else start
+        if end < start:
+            start, end = end, start
+        sections.append(Section(start, end, engineer, folder, project, name, status))
+    return sections
+
+
+class IntervalTree:
+    """Static interval tree: intervals sorted by start, implicit balanced BST
+    over that order, each node keeping the largest end in its subtree."""
+
+    def __init__(self, items):
+        self.items = sorted(items, key=lambda s: (s.start, s.end))
+        self.max_end = [0] * len(self.items)
+        if self.items:
+            self._build(0, len(self.items))
+
+    def _build(self, lo, hi):
+        mid = (lo + hi) // 2
+        best = self.items[mid].end
+        if lo < mid:
+            best = max(best, self._build(lo, mid))
+        if mid + 1 < hi:
+            best = max(best, self._build(mid + 1, hi))
+        self.max_end[mid] = best
+        return best
+
+    def overlapping(self, x, y):
+        """Items with start <= y and end >= x, in start order."""
+        found = []
+        stack = [(0, len(self.items))] if self.items else []
+        # Depth-first walk, pruning subtrees that end before x or start after y
+        while stack:
+            lo, hi = stack.pop()
+            mid = (lo + hi) // 2
+            if self.max_end[mid] < x:
+                continue
+            item = self.items[mid]
+            if lo < mid:
+                stack.append((lo, mid))
+            if item.start <= y:
+                if item.end >= x:
+                    found.append(item)
+                if mid + 1 < hi:
+                    stack.append((mid + 1, hi))
+        found.sort(key=lambda s: (s.start, s.end))
+        return found
+
+
+class ScheduleIndex:
+    def __init__(self, sections):
+        self.tree = IntervalTree(sections)
+        self.by_engineer = {}
+        for s in self.tree.items:
+            if s.engineer:
+                self.by_engineer.setdefault(s.engineer, []).append(s)
+        # Sorted endpoints per engineer for counting overlaps with two bisections
+        self.starts = {e: [s.start for s in items] for e, items in self.by_engineer.items()}
+        self.ends = {e: sorted(s.end for s in items) for e, items in self.by_engineer.items()}
+
+    def busy(self, x, y):
+        """{engineer: [sections]} for everyone with a section overlapping [x, y]."""
+        result = {}
+        for s in self.tree.overlapping(x, y):
+            result.setdefault(s.engineer or '(unassigned)', []).append(s)
+        return result
+
+    def load(self, engineer, x, y):
+        """Number of the engineer's sections overlapping [x, y]."""
+        # (started by y) - (ended before x); anything ended before x also started by y
+        return bisect_right(self.starts.get(engineer, []), y) - bisect_left(self.ends.get(engineer, []), x)
+
+    def least_loaded(self, x, y, candidates=None):
+        """[(engineer, overlapping sections, total open sections)] least busy first."""
+        names = candidates if candidates is not None else sorted(self.by_engineer)
+        ranked = [(name, self.load(name, x, y), len(self.starts.get(name, []))) for name in names]
+        ranked.sort(key=lambda r: (r[1], r[2], r[0]))
+        return ranked
+
+    def conflicts(self, engineer=None):
+        """Pairs of one engineer's sections whose date ranges overlap."""
+        pairs = []
+        for name in [engineer] if engineer else sorted(self.by_engineer):
+            active = []  # heap of (end, seq, section) still running at the current start
+            for seq, s in enumerate(self.by_engineer.get(name, [])):
+                while active and active[0][0] < s.start:
+                    heapq.heappop(active)
+                pairs.extend((other, s) for _, _, other in active)
+                heapq.heappush(active, (s.end, seq, s))
+        return pairs
+
+
+def open_schedule(index_file=project_index.INDEX_FILE, projects_dir=project_index.PROJECTS_DIR,
+                  include_done=False, refresh=True):
+    conn = project_index.open_index(index_file, projects_dir, refresh)
+    return ScheduleIndex(load_sections(conn, include_done))
+
+
+def export(schedule):
+    """Per-engineer sections and conflicts, shaped for the calendar views."""
+    return {
+        'generatedAt': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'engineers': {name: [s.as_dict() for s in items] for name, items in sorted(schedule.by_engineer.items())},
+        'conflicts': [{'engineer': a.engineer, 'a': a.as_dict(), 'b': b.as_dict(),
+                       'from': _iso(max(a.start, b.start)), 'to': _iso(min(a.end, b.end))}
+                      for a, b in schedule.conflicts()],
+    }
+
+
+def _parse_day(value):
+    day = _day(value)
+    if day is None:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM-DD, got {value!r}")
+    return day
+
+
+@instrument.instrumented('schedule_index')
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Section schedule queries")
+    parser.add_argument('--index', default=project_index.INDEX_FILE)
+    parser.add_argument('--projects', default=project_index.PROJECTS_DIR)
+    parser.add_argument('--include-done', action='store_true', help='also count finished sections')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('busy', help='who has sections between two dates')
+    p.add_argument('start', type=_parse_day)
+    p.add_argument('end', type=_parse_day)
+
+    p = sub.add_parser('conflicts', help='overlapping assignments per engineer')
+    p.add_argument('engineer', nargs='?')
+
+    p = sub.add_parser('least-loaded', help='engineers ranked by sections in a window')
+    p.add_argument('start', type=_parse_day)
+    p.add_argument('end', type=_parse_day)
+    p.add_argument('--candidates', nargs='+', help='only rank these engineers')
+
+    p = sub.add_parser('export', help='write schedule.json for the UI')
+    p.add_argument('-o', '--output', default=EXPORT_FILE)
+
+    args = parser.parse_args(argv)
+    schedule = open_schedule(args.index, args.projects, args.include_done)
+    if args.command in ('busy', 'least-loaded'):
+        args.start, args.end = sorted((args.start, args.end))
+
+    if args.command == 'busy':
+        for engineer, items in sorted(schedule.busy(args.start, args.end).items()):
+            print(f"{engineer}: {len(items)} sections")
+            for s in items:
+                print(f"    {_iso(s.start)}..{_iso(s.end)}  {s.project} / {s.name}")
+    elif args.command == 'conflicts':
+        for a, b in schedule.conflicts(args.engineer):
+            print(f"{a.engineer}: {a.project} / {a.name} ({_iso(a.start)}..{_iso(a.end)})"
+                  f"  x  {b.project} / {b.name} ({_iso(b.start)}..{_iso(b.end)})")
+    elif args.command == 'least-loaded':
+        for name, overlapping, total in schedule.least_loaded(args.start, args.end, args.candidates):
+            print(f"{name}  {overlapping} in window  {total} open")
+    else:
+        data = export(schedule)
+        atomic_write(args.output, json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        print(f"{args.output}: {len(data['engineers'])} engineers, {len(data['conflicts'])} conflicts")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
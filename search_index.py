@@ -0,0 +1,474 @@
+"""Prebuilt full-text search index for the global search (js/search.js).
+
+SearchManager scans the in-memory state on every keystroke and never sees
+the text of uploaded documents. This indexes projects (name, client,
+address, description, history), sections, clients, engineers and the text
+of .txt / .htm / .md / .csv uploads into search-index/:
+
+    index.json            manifest: shard name -> current file name
+    docs.<hash>.json      [type, ref, title, subtitle, projectId] per entity
+    t-<hex>.<hash>.json   terms starting with one character, sorted, with
+                          delta-encoded postings [doc, weight, doc, weight...]
+    g-<hex>.<hash>.json   trigram -> terms containing it, for matches inside words
+
+The client loads docs.json once and a term / trigram shard only when a
+query starts with its character. Text is case folded with ё folded into е.
+The last query word matches as a prefix; a word with no term match falls
+back to the trigram shards (substring match).
+
+Per-project extraction results are cached in .search-cache.json keyed by
+the mtime/size of data.json and of every text upload, so a rebuild only
+re-reads changed projects, and shard files whose content did not change are
+left untouched (their name in index.json stays the same).
+
+File names carry the content hash, so a file never changes once written and
+a page that loaded an older manifest keeps reading one consistent generation.
+The files of the previous generation are kept until the next build; a page
+older than that gets misses until it reloads the manifest.
+
+Usage:
+    python search_index.py build [--full]
+    python search_index.py search "жк тест" [--limit 20]
+"""
+import argparse
+import bisect
+import datetime
+import hashlib
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+
+import instrument
+from compact_history import ARCHIVE_DIR
+from project_files import PROJECTS_DIR, ROOT_DIR, atomic_write, iter_data_files, load_project
+
+INDEX_DIR = os.path.join(ROOT_DIR, 'search-index')
+CACHE_FILE = os.path.join(ROOT_DIR, '.search-cache.json')
+TEXT_EXTENSIONS = {'.txt', '.htm', '.html', '.md', '.csv'}
+SKIP_DIRS = {'gallery', ARCHIVE_DIR}
+# Only the start of very large documents is indexed
+MAX_TEXT = 1 << 20
+PARALLEL_THRESHOLD = 64
+CACHE_VERSION = 1
+INDEX_VERSION = 2
+PREFIX_TERMS = 200
+
+# Weight of a term by the field it came from; a document keeps the best one
+WEIGHTS = {'title': 8, 'client': 4, 'address': 4, 'engineer': 4, 'description': 2, 'history': 1, 'text': 1}
+TYPE_ORDER = {'project': 0, 'client': 1, 'engineer': 2, 'section': 3, 'document': 4}
+
+_WORD = re.compile(r'\w+')
+
+
+def fold(text):
+    return text.casefold().replace('ё', 'е')
+
+
+def _text(value):
+    """Field value as text; numbers (hand-edited files) become strings, anything else None."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return None
+
+
+def terms(text):
+    return [t for t in _WORD.findall(fold(_text(text) or '')) if len(t) > 1 or t.isdigit()]
+
+
+def trigrams(term):
+    return {term[i:i + 3] for i in range(len(term) - 2)}
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ('script', 'style'):
+            self.skip += 1
+
+    def handle_endtag(self, tag):
+        if tag in ('script', 'style') and self.skip:
+            self.skip -= 1
+
+    def handle_data(self, data):
+        if not self.skip:
+            self.parts.append(data)
+
+
+def extract_text(path):
+    with open(path, 'rb') as f:
+        raw = f.read(MAX_TEXT)
+    try:
+        text = raw.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        # Windows-made uploads (Word "Save as web page", notepad) are often cp1251
+        text = raw.decode('cp1251', errors='replace')
+    if os.path.splitext(path)[1].lower() in ('.htm', '.html'):
+        parser = _TextExtractor()
+        parser.feed(text)
+        text = ' '.join(parser.parts)
+    return text
+
+
+def text_uploads(folder_path):
+    """Yield (relative_path, stat) of indexable uploads in one project folder."""
+    for dirpath, dirnames, filenames in os.walk(folder_path):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS and not d.startswith(('.', '_')))
+        for name in sorted(filenames):
+            if os.path.splitext(name)[1].lower() in TEXT_EXTENSIONS:
+                path = os.path.join(dirpath, name)
+                yield os.path.relpath(path, folder_path).replace(os.sep, '/'), os.stat(path)
+
+
+def _add(fields, text, field):
+    weight = WEIGHTS[field]
+    for term in terms(text):
+        if fields.get(term, 0) < weight:
+            fields[term] = weight
+
+
+def extract(job):
+    """Index entries for one project folder. Runs in worker processes."""
+    folder, data_path = job
+    folder_path = os.path.dirname(data_path)
+    p = load_project(data_path)
+    if not isinstance(p, dict):
+        raise ValueError(f"top level is {type(p).__name__}, not an object")
+    pid = _text(p.get('id')) or ''
+    name = _text(p.get('name')) or folder
+    address = _text(p.get('address')) or ''
+    client = _text(p.get('client')) or None
+    entries = []
+
+    fields = {}
+    _add(fields, name, 'title')
+    _add(fields, client, 'client')
+    _add(fields, address, 'address')
+    _add(fields, p.get('description'), 'description')
+    # Folder names are "<client>-<object>" and often carry words the name lacks
+    _add(fields, folder, 'description')
+    for h in p.get('history') if isinstance(p.get('history'), list) else []:
+        if isinstance(h, dict):
+            _add(fields, h.get('text'), 'history')
+    entries.append(['project', pid, name, address, pid, fields])
+
+    engineers = set()
+    for s in p.get('sections') if isinstance(p.get('sections'), list) else []:
+        if not isinstance(s, dict):
+            continue
+        engineer = _text(s.get('engineer'))
+        fields = {}
+        _add(fields, s.get('name'), 'title')
+        _add(fields, name, 'description')
+        _add(fields, engineer, 'engineer')
+        entries.append(['section', f"{pid}:{_text(s.get('id')) or ''}", _text(s.get('name')) or '', name, pid, fields])
+        if engineer:
+            engineers.add(engineer)
+    if isinstance(p.get('engineerContracts'), dict):
+        engineers.update(p['engineerContracts'])
+
+    for rel, _ in text_uploads(folder_path):
+        fields = {}
+        _add(fields, os.path.basename(rel), 'title')
+        _add(fields, extract_text(os.path.join(folder_path, rel)), 'text')
+        entries.append(['document', f"{folder}/{rel}", os.path.basename(rel), name, pid, fields])
+
+    return {'entries': entries, 'client': client, 'engineers': sorted(engineers)}
+
+
+def _signature(data_path, st):
+    folder_path = os.path.dirname(data_path)
+    return [[st.st_mtime_ns, st.st_size]] + [[rel, s.st_mtime_ns, s.st_size] for rel, s in text_uploads(folder_path)]
+
+
+def _extract_safe(job):
+    try:
+        return extract(job), None
+    # Any shape of bad data is an error of that one folder, not of the whole index
+    except (OSError, ValueError, TypeError, AttributeError, KeyError, IndexError) as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def refresh(projects_dir=PROJECTS_DIR, cache_file=CACHE_FILE, full=False, workers=None):
+    """Return ({folder: partial}, errors, parsed_count), extracting only changed projects."""
+    cached = {}
+    if not full:
+        try:
+            with open(cache_file, encoding='utf-8') as f:
+                cache = json.load(f)
+            if cache.get('version') == CACHE_VERSION:
+                cached = cache['projects']
+        except (FileNotFoundError, ValueError):
+            pass
+
+    current, changed = {}, []
+    for folder, path, st in iter_data_files(projects_dir):
+        signature = _signature(path, st)
+        entry = cached.get(folder)
+        if entry and entry['signature'] == signature:
+            current[folder] = entry
+        else:
+            changed.append((folder, path, signature))
+
+    jobs = [(folder, path) for folder, path, _ in changed]
+    if len(jobs) >= PARALLEL_THRESHOLD:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_extract_safe, jobs, chunksize=16))
+    else:
+        results = [_extract_safe(job) for job in jobs]
+
+    errors = []
+    for (folder, _, signature), (partial, error) in zip(changed, results):
+        if error:
+            errors.append((folder, error))
+        else:
+            current[folder] = {'signature': signature, 'partial': partial}
+
+    if changed or len(current) != len(cached):
+        atomic_write(cache_file, json.dumps({'version': CACHE_VERSION, 'projects': current},
+                                            ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    return {folder: entry['partial'] for folder, entry in current.items()}, errors, len(changed)
+
+
+def build(partials):
+    """(docs, {term: {doc: weight}}) over all projects plus client / engineer entities."""
+    entities = []
+    clients, engineers = {}, set()
+    for folder in sorted(partials):
+        partial = partials[folder]
+        entities.extend(partial['entries'])
+        if partial['client']:
+            clients.setdefault(partial['client'], 0)
+            clients[partial['client']] += 1
+        engineers.update(partial['engineers'])
+    for name, count in clients.items():
+        fields = {}
+        _add(fields, name, 'title')
+        entities.append(['client', name, name, f"Проектов: {count}", '', fields])
+    for name in engineers:
+        fields = {}
+        _add(fields, name, 'title')
+        entities.append(['engineer', name, name, 'Сотрудник', '', fields])
+
+    entities.sort(key=lambda e: (TYPE_ORDER[e[0]], e[1]))
+    docs = [e[:5] for e in entities]
+    postings = {}
+    for doc, entity in enumerate(entities):
+        for term, weight in entity[5].items():
+            postings.setdefault(term, {})[doc] = weight
+    return docs, postings
+
+
+def _shard_key(char):
+    return f"{ord(char):04x}"
+
+
+def shard(docs, postings):
+    """{file name: payload} for the whole index except the manifest."""
+    files = {'docs.json': docs}
+    term_shards, gram_shards = {}, {}
+    for term in sorted(postings):
+        shard_terms = term_shards.setdefault(_shard_key(term[0]), {'terms': [], 'postings': []})
+        encoded, last = [], 0
+        for doc in sorted(postings[term]):
+            encoded.extend((doc - last, postings[term][doc]))
+            last = doc
+        shard_terms['terms'].append(term)
+        shard_terms['postings'].append(encoded)
+        for gram in trigrams(term):
+            gram_shards.setdefault(_shard_key(gram[0]), {}).setdefault(gram, []).append(term)
+    for key, payload in term_shards.items():
+        files[f"t-{key}.json"] = payload
+    for key, payload in gram_shards.items():
+        # Trigram sets iterate in hash order; sort so unchanged shards keep their hash
+        files[f"g-{key}.json"] = dict(sorted(payload.items()))
+    return files
+
+
+def _hashed_name(name, digest):
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{digest}{ext}"
+
+
+def write_index(files, index_dir=INDEX_DIR):
+    """Write new shard files, then the manifest, then drop files older than the
+    previous generation. Returns (written, removed)."""
+    os.makedirs(index_dir, exist_ok=True)
+    try:
+        with open(os.path.join(index_dir, 'index.json'), encoding='utf-8') as f:
+            previous = json.load(f)
+        previous = previous.get('files', {}) if previous.get('version') == INDEX_VERSION else {}
+    except (FileNotFoundError, ValueError):
+        previous = {}
+
+    current, written = {}, 0
+    for name, payload in sorted(files.items()):
+        data = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        current[name] = _hashed_name(name, hashlib.sha1(data).hexdigest()[:12])
+        if not os.path.exists(os.path.join(index_dir, current[name])):
+            atomic_write(os.path.join(index_dir, current[name]), data)
+            written += 1
+    if current == previous:
+        # Nothing changed; the previous generation stays available as it was
+        return 0, 0
+
+    manifest = {
+        'version': INDEX_VERSION,
+        'generatedAt': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'docs': len(files['docs.json']),
+        'prefixTerms': PREFIX_TERMS,
+        'files': current,
+    }
+    atomic_write(os.path.join(index_dir, 'index.json'),
+                 json.dumps(manifest, ensure_ascii=False, indent=1).encode('utf-8'))
+    # Pages that loaded the previous manifest still read its files
+    keep = {'index.json', *current.values(), *previous.values()}
+    removed = 0
+    for name in os.listdir(index_dir):
+        if name.endswith('.json') and name not in keep:
+            try:
+                os.remove(os.path.join(index_dir, name))
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return written, removed
+
+
+class SearchIndex:
+    """Reads a built index lazily, one shard at a time (same lookup as the browser)."""
+
+    def __init__(self, index_dir=INDEX_DIR):
+        self.index_dir = index_dir
+        self.shards = {}
+        try:
+            with open(os.path.join(index_dir, 'index.json'), encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            manifest = {}
+        self.files = manifest.get('files', {}) if manifest.get('version') == INDEX_VERSION else {}
+        self.docs = self._load('docs.json') or []
+
+    def _load(self, name):
+        if name not in self.shards:
+            self.shards[name] = None
+            if name in self.files:
+                try:
+                    with open(os.path.join(self.index_dir, self.files[name]), encoding='utf-8') as f:
+                        self.shards[name] = json.load(f)
+                except FileNotFoundError:
+                    pass
+        return self.shards[name]
+
+    def _postings(self, term):
+        shard_data = self._load(f"t-{_shard_key(term[0])}.json")
+        if not shard_data:
+            return None
+        i = bisect.bisect_left(shard_data['terms'], term)
+        if i == len(shard_data['terms']) or shard_data['terms'][i] != term:
+            return None
+        return self._decode(shard_data['postings'][i])
+
+    @staticmethod
+    def _decode(encoded):
+        doc, result = 0, {}
+        for k in range(0, len(encoded), 2):
+            doc += encoded[k]
+            result[doc] = encoded[k + 1]
+        return result
+
+    def _prefix_terms(self, prefix):
+        shard_data = self._load(f"t-{_shard_key(prefix[0])}.json")
+        if not shard_data:
+            return []
+        found = shard_data['terms']
+        i = bisect.bisect_left(found, prefix)
+        j = bisect.bisect_left(found, prefix + '\U0010ffff', i)
+        return found[i:min(j, i + PREFIX_TERMS)]
+
+    def _substring_terms(self, word):
+        candidates = None
+        for gram in trigrams(word):
+            shard_data = self._load(f"g-{_shard_key(gram[0])}.json") or {}
+            found = set(shard_data.get(gram, ()))
+            candidates = found if candidates is None else candidates & found
+            if not candidates:
+                return []
+        return sorted(t for t in candidates if word in t)
+
+    def _word_scores(self, word, prefix):
+        scores = {}
+        exact = self._postings(word)
+        if exact:
+            # Exact hits rank above prefix / substring hits of the same weight
+            scores = {doc: weight * 2 for doc, weight in exact.items()}
+        others = self._prefix_terms(word) if prefix else []
+        if not exact and not others and len(word) >= 3:
+            others = self._substring_terms(word)
+        for term in others:
+            if term == word:
+                continue
+            for doc, weight in (self._postings(term) or {}).items():
+                if scores.get(doc, 0) < weight:
+                    scores[doc] = weight
+        return scores
+
+    def search(self, query, limit=20):
+        words = _WORD.findall(fold(query))
+        if not words:
+            return []
+        total = None
+        for i, word in enumerate(words):
+            scores = self._word_scores(word, prefix=i == len(words) - 1)
+            if total is None:
+                total = scores
+            else:
+                total = {doc: total[doc] + s for doc, s in scores.items() if doc in total}
+            if not total:
+                return []
+        # A doc id past the end means shards of another build; count it as a miss
+        total = {doc: score for doc, score in total.items() if 0 <= doc < len(self.docs)}
+        ranked = sorted(total.items(), key=lambda item: (-item[1], TYPE_ORDER[self.docs[item[0]][0]], item[0]))
+        return [(score, self.docs[doc]) for doc, score in ranked[:limit]]
+
+
+@instrument.instrumented('search_index')
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build / query the prebuilt search index")
+    parser.add_argument('--projects', default=PROJECTS_DIR)
+    parser.add_argument('--output', default=INDEX_DIR)
+    parser.add_argument('--cache', default=CACHE_FILE)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('build', help='refresh the index from projects/')
+    p.add_argument('--full', action='store_true', help='ignore the extraction cache')
+
+    p = sub.add_parser('search', help='query a built index')
+    p.add_argument('query')
+    p.add_argument('--limit', type=int, default=20)
+
+    args = parser.parse_args(argv)
+    if args.command == 'search':
+        for score, (kind, ref, title, subtitle, _) in SearchIndex(args.output).search(args.query, args.limit):
+            print(f"{score:4}  {kind:9} {title}  — {subtitle}  [{ref}]")
+        return 0
+
+    partials, errors, parsed = refresh(args.projects, args.cache, args.full)
+    docs, postings = build(partials)
+    written, removed = write_index(shard(docs, postings), args.output)
+    for folder, error in errors:
+        print(f"  unreadable: {folder}: {error}")
+    print(f"{len(docs)} entities, {len(postings)} terms ({parsed} projects re-read); "
+          f"{written} files written, {removed} removed")
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
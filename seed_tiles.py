@@ -0,0 +1,437 @@
+"""Pre-seed map tiles around project locations into an MBTiles file.
+
+Field engineers often open projects with a poor connection, and the maps in
+js/mapManager.js load every tile from the online servers. This computes the
+tiles covering every project (lat/lng from project_index.py, plus a margin)
+at the chosen zoom levels, downloads the missing ones and stores them in
+map-tiles.mbtiles, which 'serve' can then hand out locally.
+
+    - downloads run in a thread pool; each thread keeps its HTTP/1.1
+      connections open between requests
+    - a shared rate limiter caps requests per second across all threads
+    - 429 / 5xx answers are retried with backoff, honouring Retry-After
+    - tiles already in the file are skipped, so an interrupted run resumes
+    - identical images (sea, empty fields) are stored once: the file uses
+      the deduplicated MBTiles layout (map + images tables, tiles view)
+
+'standin' runs a local tile server that makes up deterministic images, for
+trying the seeder (and its failure handling) without touching a real server;
+it is what --url points at by default. The tile usage policy of
+tile.openstreetmap.org forbids bulk downloading, so seeding real tiles
+needs --url pointing at a server that allows it (your own, or a provider
+whose terms do); the seeder warns when the target is openstreetmap.org.
+
+Usage:
+    python seed_tiles.py seed [--zoom 12-17] [--radius 500] [--rate 4] [--url TEMPLATE]  # default: standin
+    python seed_tiles.py serve [--port 8090]      # http://localhost:8090/{z}/{x}/{y}.png
+    python seed_tiles.py standin [--port 8091] [--fail-rate 0.1]
+    python seed_tiles.py stats
+"""
+import argparse
+import hashlib
+import http.client
+import math
+import os
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import instrument
+import project_index
+from map_tiles import load_points, project_point
+from project_files import ROOT_DIR
+
+MBTILES_FILE = os.path.join(ROOT_DIR, 'map-tiles.mbtiles')
+# The local stand-in ('standin' below); real tiles need --url
+DEFAULT_URL = 'http://127.0.0.1:8091/{z}/{x}/{y}.png'
+# For templates that still spread load over {s} subdomains
+SUBDOMAINS = 'abc'
+USER_AGENT = 'lineart-system tile seeder (offline cache for field work)'
+DEFAULT_ZOOMS = '12-17'
+DEFAULT_RADIUS_M = 500
+DEFAULT_RATE = 4.0
+WORKERS = 4
+MAX_TILES = 50000
+RETRIES = 4
+TIMEOUT_S = 20
+COMMIT_EVERY = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS images (tile_id TEXT PRIMARY KEY, tile_data BLOB);
+CREATE TABLE IF NOT EXISTS map (
+    zoom_level  INTEGER,
+    tile_column INTEGER,
+    tile_row    INTEGER,
+    tile_id     TEXT,
+    PRIMARY KEY (zoom_level, tile_column, tile_row)
+);
+CREATE VIEW IF NOT EXISTS tiles AS
+    SELECT map.zoom_level AS zoom_level, map.tile_column AS tile_column,
+           map.tile_row AS tile_row, images.tile_data AS tile_data
+    FROM map JOIN images ON images.tile_id = map.tile_id;
+"""
+
+
+def parse_zooms(text):
+    zooms = set()
+    for part in text.split(','):
+        low, _, high = part.partition('-')
+        zooms.update(range(int(low), int(high or low) + 1))
+    return sorted(zooms)
+
+
+def covering_tiles(points, zooms, radius_m=DEFAULT_RADIUS_M):
+    """Set of (z, x, y) covering radius_m around every point."""
+    tiles = set()
+    for p in points:
+        dlat = radius_m / 111320.0
+        dlng = radius_m / (111320.0 * max(math.cos(math.radians(p['lat'])), 0.01))
+        for z in zooms:
+            x0, y0 = project_point(p['lat'] + dlat, p['lng'] - dlng, z)
+            x1, y1 = project_point(p['lat'] - dlat, p['lng'] + dlng, z)
+            last = (1 << z) - 1
+            for x in range(max(int(x0) // 256, 0), min(int(x1) // 256, last) + 1):
+                for y in range(max(int(y0) // 256, 0), min(int(y1) // 256, last) + 1):
+                    tiles.add((z, x, y))
+    return tiles
+
+
+def connect(path=MBTILES_FILE):
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _tms_row(z, y):
+    # MBTiles rows count from the bottom (TMS), the URL scheme from the top
+    return (1 << z) - 1 - y
+
+
+def existing_tiles(conn):
+    return {(z, x, _tms_row(z, row)) for z, x, row in
+            conn.execute('SELECT zoom_level, tile_column, tile_row FROM map')}
+
+
+def store_tile(conn, z, x, y, data):
+    tile_id = hashlib.sha1(data).hexdigest()
+    conn.execute('INSERT OR IGNORE INTO images VALUES (?, ?)', (tile_id, data))
+    conn.execute('INSERT OR REPLACE INTO map VALUES (?, ?, ?, ?)', (z, x, _tms_row(z, y), tile_id))
+
+
+class RateLimiter:
+    """Spaces requests at least 1/rate seconds apart across all threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class Fetcher:
+    """Keep-alive HTTP client; one per thread, one connection per host."""
+
+    def __init__(self, timeout=TIMEOUT_S):
+        self.timeout = timeout
+        self.connections = {}
+        self.opened = 0
+
+    def _connection(self, scheme, netloc):
+        conn = self.connections.get((scheme, netloc))
+        if conn is None:
+            cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+            conn = self.connections[(scheme, netloc)] = cls(netloc, timeout=self.timeout)
+            self.opened += 1
+        return conn
+
+    def get(self, url):
+        """(status, headers, body). Reconnects once if a kept-alive connection was dropped."""
+        parts = urlsplit(url)
+        path = parts.path + ('?' + parts.query if parts.query else '')
+        for attempt in (0, 1):
+            conn = self._connection(parts.scheme, parts.netloc)
+            try:
+                conn.request('GET', path, headers={'User-Agent': USER_AGENT})
+                response = conn.getresponse()
+                body = response.read()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                del self.connections[(parts.scheme, parts.netloc)]
+                if attempt:
+                    raise
+                continue
+            if response.will_close:
+                conn.close()
+                del self.connections[(parts.scheme, parts.netloc)]
+            return response.status, response.headers, body
+
+
+def tile_url(template, z, x, y):
+    return template.format(s=SUBDOMAINS[(x + y) % len(SUBDOMAINS)], z=z, x=x, y=y)
+
+
+class Seeder:
+    def __init__(self, template, rate=DEFAULT_RATE, retries=RETRIES):
+        self.template = template
+        self.limiter = RateLimiter(rate)
+        self.retries = retries
+        self.local = threading.local()
+        self.fetchers = []
+        self.lock = threading.Lock()
+
+    def _fetcher(self):
+        fetcher = getattr(self.local, 'fetcher', None)
+        if fetcher is None:
+            fetcher = self.local.fetcher = Fetcher()
+            with self.lock:
+                self.fetchers.append(fetcher)
+        return fetcher
+
+    def fetch(self, tile):
+        """Runs in the pool: (tile, data or None, error or None)."""
+        z, x, y = tile
+        url = tile_url(self.template, z, x, y)
+        delay = 1.0
+        for attempt in range(self.retries + 1):
+            self.limiter.wait()
+            try:
+                status, headers, body = self._fetcher().get(url)
+            except (http.client.HTTPException, OSError) as e:
+                error = f"{type(e).__name__}: {e}"
+            else:
+                if status == 200 and body:
+                    return tile, body, None
+                if status == 404:
+                    return tile, None, 'HTTP 404'
+                error = f"HTTP {status}"
+                if status not in (429, 500, 502, 503, 504):
+                    return tile, None, error
+                retry_after = headers.get('Retry-After', '')
+                if retry_after.isdigit():
+                    delay = max(delay, float(retry_after))
+            if attempt < self.retries:
+                time.sleep(delay * (0.5 + random.random()))
+                delay *= 2
+        return tile, None, error
+
+    def connections_opened(self):
+        return sum(f.opened for f in self.fetchers)
+
+
+def seed(conn, tiles, template=DEFAULT_URL, rate=DEFAULT_RATE, workers=WORKERS, progress=None):
+    """Download tiles not yet stored. Returns (stored, failed [(tile, error)], connections)."""
+    seeder = Seeder(template, rate)
+    todo = sorted(tiles - existing_tiles(conn))
+    stored, failed = 0, []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for n, (tile, data, error) in enumerate(pool.map(seeder.fetch, todo), 1):
+            if data is None:
+                failed.append((tile, error))
+            else:
+                store_tile(conn, *tile, data)
+                stored += 1
+            # Commit in batches so an interrupted run keeps what it fetched
+            if n % COMMIT_EVERY == 0:
+                conn.commit()
+                if progress:
+                    progress(n, len(todo))
+    conn.commit()
+    return stored, failed, seeder.connections_opened()
+
+
+def write_metadata(conn, points, zooms, template):
+    lats = [p['lat'] for p in points] or [0]
+    lngs = [p['lng'] for p in points] or [0]
+    values = {
+        'name': 'lineart projects', 'format': os.path.splitext(urlsplit(template).path)[1].lstrip('.') or 'png',
+        'type': 'baselayer', 'version': '1', 'description': f"Seeded from {template}",
+        'minzoom': str(min(zooms)), 'maxzoom': str(max(zooms)),
+        'bounds': f"{min(lngs)},{min(lats)},{max(lngs)},{max(lats)}",
+    }
+    with conn:
+        conn.executemany('INSERT OR REPLACE INTO metadata VALUES (?, ?)', values.items())
+
+
+_TILE_PATH = re.compile(r'^/(\d+)/(\d+)/(\d+)\.\w+$')
+_CONTENT_TYPES = {'png': 'image/png', 'jpg': 'image/jpeg', 'jpeg': 'image/jpeg', 'webp': 'image/webp'}
+
+
+def serve(path=MBTILES_FILE, port=8090):
+    """Serve /{z}/{x}/{y}.png from the MBTiles file."""
+    local = threading.local()
+    probe = connect(path)
+    fmt = (probe.execute("SELECT value FROM metadata WHERE name = 'format'").fetchone() or ['png'])[0]
+    probe.close()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            m = _TILE_PATH.match(self.path.split('?')[0])
+            row = None
+            if m:
+                if not hasattr(local, 'conn'):
+                    local.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+                z, x, y = map(int, m.groups())
+                row = local.conn.execute('SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? '
+                                         'AND tile_row = ?', (z, x, _tms_row(z, y))).fetchone()
+            if row is None:
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', _CONTENT_TYPES.get(fmt, 'application/octet-stream'))
+            self.send_header('Content-Length', str(len(row[0])))
+            self.send_header('Cache-Control', 'public, max-age=604800')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(row[0])
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('', port), Handler)
+    print(f"Serving {path} on http://localhost:{port}/{{z}}/{{x}}/{{y}}.{fmt}")
+    server.serve_forever()
+
+
+def standin_server(port=8091, fail_rate=0.0, latency=0.0):
+    """Local tile server stand-in. Returns the (not yet started) server.
+
+    Every third tile is the same 'sea' image so deduplication has something
+    to do; fail_rate of the requests get a 503 with Retry-After: 0.
+    """
+    counters = {'requests': 0, 'connections': 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+            with lock:
+                counters['connections'] += 1
+
+        def do_GET(self):
+            with lock:
+                counters['requests'] += 1
+            if latency:
+                time.sleep(latency)
+            m = _TILE_PATH.match(self.path)
+            if m and random.random() < fail_rate:
+                self.send_response(503)
+                self.send_header('Retry-After', '0')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            if not m:
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            z, x, y = map(int, m.groups())
+            label = b'sea' if (x + y) % 3 == 0 else f"{z}/{x}/{y}".encode()
+            body = b'\x89PNG\r\n\x1a\n' + hashlib.sha256(label).digest() + label
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/png')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.counters = counters
+    return server
+
+
+@instrument.instrumented('seed_tiles')
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline map tile cache for project locations")
+    parser.add_argument('--mbtiles', default=MBTILES_FILE)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('seed', help='download missing tiles around all projects')
+    p.add_argument('--index', default=project_index.INDEX_FILE)
+    p.add_argument('--projects', default=project_index.PROJECTS_DIR)
+    p.add_argument('--zoom', default=DEFAULT_ZOOMS, help="levels, e.g. '12-17' or '10,12-16'")
+    p.add_argument('--radius', type=float, default=DEFAULT_RADIUS_M, help='metres around each project')
+    p.add_argument('--url', default=DEFAULT_URL, help='tile URL template with {z} {x} {y} (default: the stand-in)')
+    p.add_argument('--rate', type=float, default=DEFAULT_RATE, help='requests per second, all threads')
+    p.add_argument('--workers', type=int, default=WORKERS)
+    p.add_argument('--max-tiles', type=int, default=MAX_TILES, help='refuse to plan more tiles than this')
+    p.add_argument('--dry-run', action='store_true', help='only count the tiles')
+
+    p = sub.add_parser('serve', help='serve the MBTiles file over HTTP')
+    p.add_argument('--port', type=int, default=8090)
+
+    p = sub.add_parser('standin', help='run a local fake tile server')
+    p.add_argument('--port', type=int, default=8091)
+    p.add_argument('--fail-rate', type=float, default=0.0)
+    p.add_argument('--latency', type=float, default=0.0, help='seconds per response')
+
+    sub.add_parser('stats', help='tiles and distinct images per zoom')
+
+    args = parser.parse_args(argv)
+    if args.command == 'serve':
+        serve(args.mbtiles, args.port)
+        return 0
+    if args.command == 'standin':
+        server = standin_server(args.port, args.fail_rate, args.latency)
+        print(f"Stand-in tile server on http://127.0.0.1:{args.port}/{{z}}/{{x}}/{{y}}.png")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print(f"{server.counters['requests']} requests over {server.counters['connections']} connections")
+        return 0
+
+    conn = connect(args.mbtiles)
+    if args.command == 'stats':
+        for z, tiles, images in conn.execute('SELECT zoom_level, COUNT(*), COUNT(DISTINCT tile_id) FROM map '
+                                             'GROUP BY zoom_level ORDER BY zoom_level'):
+            print(f"z{z}: {tiles} tiles, {images} distinct images")
+        size = conn.execute('SELECT COALESCE(SUM(LENGTH(tile_data)), 0) FROM images').fetchone()[0]
+        print(f"{size} bytes of image data")
+        return 0
+
+    host = (urlsplit(args.url.replace('{s}', 'a')).hostname or '').lower()
+    if host == 'openstreetmap.org' or host.endswith('.openstreetmap.org'):
+        print("Warning: the openstreetmap.org tile usage policy forbids bulk downloading; "
+              "use your own tile server or a provider that allows it", file=sys.stderr)
+    zooms = parse_zooms(args.zoom)
+    points = load_points(project_index.open_index(args.index, args.projects))
+    tiles = covering_tiles(points, zooms, args.radius)
+    missing = len(tiles - existing_tiles(conn))
+    print(f"{len(points)} projects, {len(tiles)} tiles at zoom {args.zoom}, {missing} not yet stored")
+    if args.dry_run:
+        return 0
+    if missing > args.max_tiles:
+        print(f"Refusing to download {missing} tiles (--max-tiles {args.max_tiles})", file=sys.stderr)
+        return 1
+    write_metadata(conn, points, zooms, args.url)
+    stored, failed, connections = seed(conn, tiles, args.url, args.rate, args.workers,
+                                       progress=lambda n, total: print(f"  {n}/{total}"))
+    for tile, error in failed[:20]:
+        print(f"  failed {tile[0]}/{tile[1]}/{tile[2]}: {error}")
+    print(f"Stored {stored} tiles, {len(failed)} failed, {connections} connections opened")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,364 @@
+"""Content-addressed snapshot store for files touched by the repair scripts.
+
+Every fixer calls snapshot(path) before it overwrites a file, so any earlier
+version of style.css / index.html can be restored or diffed later.
+
+Layout (under .snapshots/ next to this script, or $LINEART_SNAPSHOTS):
+    objects/ab/cdef...   zlib-compressed blob, full text or line delta
+    log/<path>.jsonl     append-only revision log per tracked file
+
+Blobs are addressed by the sha1 of the full file content. A new revision is
+stored as a line delta against the previous one; a full copy is written every
+MAX_CHAIN revisions so restoring never applies more than MAX_CHAIN deltas.
+
+Usage:
+    python snapshot_store.py save style.css -m "before manual edit"
+    python snapshot_store.py log style.css
+    python snapshot_store.py restore style.css [REV] [-o out.css]
+    python snapshot_store.py diff style.css REV_A [REV_B]
+    python snapshot_store.py stats
+"""
+import argparse
+import difflib
+import hashlib
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+from urllib.parse import quote
+
+import instrument
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+STORE_DIR = os.environ.get('LINEART_SNAPSHOTS') or os.path.join(ROOT_DIR, '.snapshots')
+
+# Longest delta chain before a full copy is stored again
+MAX_CHAIN = 16
+
+_FULL = b'F'
+_DELTA = b'D'
+_OP_COPY = b'C'
+_OP_INSERT = b'I'
+
+
+def _atomic_write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _file_key(path):
+    """Repo-relative posix path for files inside the tree, absolute otherwise."""
+    abs_path = os.path.normcase(os.path.abspath(path))
+    root = os.path.normcase(ROOT_DIR)
+    if abs_path == root or abs_path.startswith(root + os.sep):
+        return os.path.relpath(abs_path, root).replace(os.sep, '/')
+    return abs_path.replace(os.sep, '/')
+
+
+def _log_path(key, store_dir):
+    return os.path.join(store_dir, 'log', quote(key, safe='') + '.jsonl')
+
+
+def _object_path(sha, store_dir):
+    return os.path.join(store_dir, 'objects', sha[:2], sha[2:])
+
+
+# ---------------------------------------------------------------------------
+# Blob encoding
+# ---------------------------------------------------------------------------
+
+def _encode_delta(base, data):
+    """Line delta: COPY(start, count) from base lines, INSERT(raw bytes)."""
+    base_lines = base.splitlines(keepends=True)
+    new_lines = data.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, base_lines, new_lines)
+    out = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            out.append(_OP_COPY + struct.pack('>II', i1, i2 - i1))
+        elif j2 > j1:
+            chunk = b''.join(new_lines[j1:j2])
+            out.append(_OP_INSERT + struct.pack('>I', len(chunk)) + chunk)
+    return b''.join(out)
+
+
+def _apply_delta(base, delta):
+    base_lines = base.splitlines(keepends=True)
+    out = []
+    pos = 0
+    while pos < len(delta):
+        op = delta[pos:pos + 1]
+        if op == _OP_COPY:
+            start, count = struct.unpack_from('>II', delta, pos + 1)
+            out.extend(base_lines[start:start + count])
+            pos += 9
+        elif op == _OP_INSERT:
+            (length,) = struct.unpack_from('>I', delta, pos + 1)
+            out.append(delta[pos + 5:pos + 5 + length])
+            pos += 5 + length
+        else:
+            raise ValueError(f"Corrupt delta opcode {op!r} at offset {pos}")
+    return b''.join(out)
+
+
+def _read_object(sha, store_dir):
+    with open(_object_path(sha, store_dir), 'rb') as f:
+        raw = zlib.decompress(f.read())
+    kind = raw[:1]
+    if kind == _FULL:
+        return kind, None, 0, raw[1:]
+    if kind == _DELTA:
+        base_sha = raw[1:41].decode('ascii')
+        (depth,) = struct.unpack_from('>H', raw, 41)
+        return kind, base_sha, depth, raw[43:]
+    raise ValueError(f"Corrupt snapshot object {sha}")
+
+
+def load_blob(sha, store_dir=STORE_DIR):
+    """Return the full content of a stored blob, resolving its delta chain."""
+    chain = []
+    current = sha
+    while True:
+        kind, base_sha, _, payload = _read_object(current, store_dir)
+        if kind == _FULL:
+            data = payload
+            break
+        chain.append(payload)
+        current = base_sha
+    for delta in reversed(chain):
+        data = _apply_delta(data, delta)
+    if hashlib.sha1(data).hexdigest() != sha:
+        raise ValueError(f"Snapshot object {sha} failed its checksum")
+    return data
+
+
+def _chain_depth(sha, store_dir):
+    kind, _, depth, _ = _read_object(sha, store_dir)
+    return 0 if kind == _FULL else depth
+
+
+def store_blob(data, base_sha=None, store_dir=STORE_DIR):
+    """Store data (bytes) and return its sha1. Deltas against base_sha when worthwhile."""
+    sha = hashlib.sha1(data).hexdigest()
+    path = _object_path(sha, store_dir)
+    if os.path.exists(path):
+        return sha
+
+    record = _FULL + data
+    if base_sha and base_sha != sha and os.path.exists(_object_path(base_sha, store_dir)):
+        depth = _chain_depth(base_sha, store_dir) + 1
+        if depth <= MAX_CHAIN:
+            delta = _encode_delta(load_blob(base_sha, store_dir), data)
+            # A delta only pays off when it is clearly smaller than the text itself
+            if len(delta) < len(data) * 0.8:
+                record = _DELTA + base_sha.encode('ascii') + struct.pack('>H', depth) + delta
+
+    _atomic_write(path, zlib.compress(record, 9))
+    return sha
+
+
+# ---------------------------------------------------------------------------
+# Revision log
+# ---------------------------------------------------------------------------
+
+def history(path, store_dir=STORE_DIR):
+    """All recorded revisions of path, oldest first."""
+    log_path = _log_path(_file_key(path), store_dir)
+    if not os.path.exists(log_path):
+        return []
+    with open(log_path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def resolve(path, rev, store_dir=STORE_DIR):
+    """Find a revision by number, negative index (-1 = latest) or sha prefix."""
+    revs = history(path, store_dir)
+    if not revs:
+        raise LookupError(f"No snapshots recorded for {path}")
+    if rev is None:
+        return revs[-1]
+    rev = str(rev)
+    if rev.lstrip('-').isdigit():
+        number = int(rev)
+        if number < 0:
+            if -number > len(revs):
+                raise LookupError(f"{path} has only {len(revs)} revisions")
+            return revs[number]
+        for entry in revs:
+            if entry['rev'] == number:
+                return entry
+        raise LookupError(f"Revision {number} not found for {path}")
+    matches = [entry for entry in revs if entry['sha'].startswith(rev)]
+    if len(matches) != 1:
+        raise LookupError(f"Revision '{rev}' is {'ambiguous' if matches else 'unknown'} for {path}")
+    return matches[-1]
+
+
+def snapshot(path, reason='', store_dir=STORE_DIR):
+    """Record the current content of path. Returns the log entry (None if file is missing).
+
+    Unchanged content is not recorded twice in a row.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    revs = history(path, store_dir)
+    previous = revs[-1] if revs else None
+    sha = hashlib.sha1(data).hexdigest()
+    if previous and previous['sha'] == sha:
+        return previous
+
+    store_blob(data, previous['sha'] if previous else None, store_dir)
+    entry = {
+        'rev': previous['rev'] + 1 if previous else 1,
+        'sha': sha,
+        'size': len(data),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'reason': reason,
+    }
+    log_path = _log_path(_file_key(path), store_dir)
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    with open(log_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    return entry
+
+
+def read_revision(path, rev=None, store_dir=STORE_DIR):
+    return load_blob(resolve(path, rev, store_dir)['sha'], store_dir)
+
+
+def restore(path, rev=None, output=None, store_dir=STORE_DIR):
+    """Write a stored revision back to disk.
+
+    With no rev, restores the newest revision that differs from the file on
+    disk, i.e. the state right before the last fixer ran. The current content
+    is snapshotted first, so a restore can itself be undone.
+    """
+    current_sha = None
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            current_sha = hashlib.sha1(f.read()).hexdigest()
+
+    if rev is None:
+        candidates = [e for e in history(path, store_dir) if e['sha'] != current_sha]
+        if not candidates:
+            raise LookupError(f"No earlier snapshot of {path} to restore")
+        entry = candidates[-1]
+    else:
+        entry = resolve(path, rev, store_dir)
+
+    data = load_blob(entry['sha'], store_dir)
+    target = output or path
+    if target == path:
+        snapshot(path, reason=f"before restore of rev {entry['rev']}", store_dir=store_dir)
+    _atomic_write(os.path.abspath(target), data)
+    return entry
+
+
+def diff(path, rev_a, rev_b=None, store_dir=STORE_DIR, context=3):
+    """Unified diff between two revisions. rev_b=None compares against the file on disk."""
+    entry_a = resolve(path, rev_a, store_dir)
+    text_a = load_blob(entry_a['sha'], store_dir).decode('utf-8', errors='replace')
+    if rev_b is None:
+        with open(path, 'rb') as f:
+            text_b = f.read().decode('utf-8', errors='replace')
+        label_b = f"{path} (working)"
+    else:
+        entry_b = resolve(path, rev_b, store_dir)
+        text_b = load_blob(entry_b['sha'], store_dir).decode('utf-8', errors='replace')
+        label_b = f"{path}@{entry_b['rev']}"
+    return ''.join(difflib.unified_diff(
+        text_a.splitlines(keepends=True), text_b.splitlines(keepends=True),
+        fromfile=f"{path}@{entry_a['rev']}", tofile=label_b, n=context))
+
+
+def stats(store_dir=STORE_DIR):
+    files = 0
+    revisions = 0
+    logical = 0
+    log_dir = os.path.join(store_dir, 'log')
+    if os.path.isdir(log_dir):
+        for name in os.listdir(log_dir):
+            files += 1
+            with open(os.path.join(log_dir, name), 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        revisions += 1
+                        logical += json.loads(line)['size']
+    stored = 0
+    objects = 0
+    for dirpath, _, filenames in os.walk(os.path.join(store_dir, 'objects')):
+        for name in filenames:
+            objects += 1
+            stored += os.path.getsize(os.path.join(dirpath, name))
+    return {'files': files, 'revisions': revisions, 'objects': objects,
+            'logical_bytes': logical, 'stored_bytes': stored}
+
+
+@instrument.instrumented('snapshot_store')
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Snapshot store for repaired files")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('save', help='record the current content of a file')
+    p.add_argument('file')
+    p.add_argument('-m', '--message', default='manual')
+
+    p = sub.add_parser('log', help='list revisions of a file')
+    p.add_argument('file')
+
+    p = sub.add_parser('show', help='print a revision to stdout')
+    p.add_argument('file')
+    p.add_argument('rev', nargs='?')
+
+    p = sub.add_parser('restore', help='write a revision back to disk')
+    p.add_argument('file')
+    p.add_argument('rev', nargs='?')
+    p.add_argument('-o', '--output', help='write to this path instead of the file itself')
+
+    p = sub.add_parser('diff', help='unified diff between revisions')
+    p.add_argument('file')
+    p.add_argument('rev_a')
+    p.add_argument('rev_b', nargs='?', help='defaults to the file on disk')
+
+    sub.add_parser('stats', help='storage summary')
+
+    args = parser.parse_args(argv)
+    try:
+        if args.command == 'save':
+            entry = snapshot(args.file, reason=args.message)
+            if entry is None:
+                print(f"{args.file} does not exist")
+                return 1
+            print(f"Saved {args.file} as rev {entry['rev']} ({entry['sha'][:10]})")
+        elif args.command == 'log':
+            for entry in history(args.file):
+                print(f"{entry['rev']:>4}  {entry['sha'][:10]}  {entry['time']}  "
+                      f"{entry['size']:>8} bytes  {entry['reason']}")
+        elif args.command == 'show':
+            sys.stdout.buffer.write(read_revision(args.file, args.rev))
+        elif args.command == 'restore':
+            entry = restore(args.file, args.rev, args.output)
+            print(f"Restored {args.output or args.file} from rev {entry['rev']} ({entry['sha'][:10]})")
+        elif args.command == 'diff':
+            sys.stdout.write(diff(args.file, args.rev_a, args.rev_b))
+        elif args.command == 'stats':
+            info = stats()
+            ratio = info['stored_bytes'] / info['logical_bytes'] if info['logical_bytes'] else 0
+            print(f"{info['files']} files, {info['revisions']} revisions, {info['objects']} objects")
+            print(f"{info['logical_bytes']} bytes tracked, {info['stored_bytes']} bytes on disk ({ratio:.1%})")
+    except (LookupError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
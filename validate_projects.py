@@ -0,0 +1,507 @@
+"""Validate (and optionally repair) every projects/*/data.json.
+
+The project schema below is compiled once into plain Python checks and run
+over all project folders in a process pool. Each fault is reported with its
+JSON path and the byte offset of the offending value in the file.
+
+Safe repairs (--fix) are limited to changes that cannot lose data:
+    - strip a UTF-8 BOM, re-decode cp1251 files, undo UTF-8-read-as-cp1251
+      or -latin-1 mojibake in strings
+    - replace missing/null history, sections, photos, additionalPersons and
+      sections[].files with []
+    - set folderName to the actual folder name
+    - stringify numeric ids, derive a missing project id from createdAt,
+      give sections without an id a fresh one (as server.js does)
+    - convert numeric strings in lat/lng/amount to numbers
+Every repaired file is snapshotted first (see snapshot_store.py).
+
+Usage:
+    python validate_projects.py [--fix] [--json] [--projects DIR]
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import re
+import string
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from json.decoder import scanstring
+
+import instrument
+import snapshot_store
+from project_files import DATA_FILE, PROJECTS_DIR, atomic_write, dump_project, iter_data_files
+
+SECTION_STATUSES = ['in-progress', 'on-review', 'correction', 'accepted', 'sketch',
+                    'checked', 'completed', 'delivered']
+
+_DATE = r'^\d{4}-\d{2}-\d{2}$'
+_DATETIME = r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}:?\d{2})?$'
+
+PROJECT_SCHEMA = {
+    'type': 'object',
+    'required': ['id', 'name', 'sections', 'history', 'photos', 'additionalPersons', 'folderName'],
+    'properties': {
+        'id': {'type': 'string', 'pattern': r'^[0-9A-Za-z_-]+$'},
+        'name': {'type': 'string'},
+        'client': {'type': 'string'},
+        'address': {'type': 'string'},
+        'amount': {'type': ['number', 'null']},
+        'currency': {'type': 'string'},
+        'status': {'type': 'string'},
+        'createdAt': {'type': 'string', 'pattern': _DATETIME},
+        'folderName': {'type': 'string', 'min_length': 1},
+        'lat': {'type': ['number', 'null'], 'minimum': -90, 'maximum': 90},
+        'lng': {'type': ['number', 'null'], 'minimum': -180, 'maximum': 180},
+        'history': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'required': ['date', 'action', 'text'],
+                'properties': {
+                    'date': {'type': 'string', 'pattern': _DATETIME},
+                    'action': {'type': 'string'},
+                    'text': {'type': 'string'},
+                },
+            },
+        },
+        'sections': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'required': ['id', 'name', 'files'],
+                'properties': {
+                    'id': {'type': 'string', 'min_length': 1},
+                    'name': {'type': 'string'},
+                    'engineer': {'type': ['string', 'null']},
+                    'status': {'enum': SECTION_STATUSES},
+                    'startDate': {'type': ['string', 'null'], 'pattern': _DATE},
+                    'dueDate': {'type': ['string', 'null'], 'pattern': _DATE},
+                    'files': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'required': ['name', 'path'],
+                            'properties': {'name': {'type': 'string'}, 'path': {'type': 'string'}},
+                        },
+                    },
+                },
+            },
+        },
+        'photos': {'type': 'array', 'items': {'type': ['string', 'object']}},
+        'additionalPersons': {'type': 'array', 'items': {'type': 'object'}},
+        # Written by compact_history.py once old entries move to history-archive/
+        'historyArchive': {
+            'type': 'object',
+            'required': ['count'],
+            'properties': {'count': {'type': 'integer', 'minimum': 0}, 'through': {'type': ['string', 'null']}},
+        },
+    },
+}
+
+_TYPE_CHECKS = {
+    'object': lambda v: isinstance(v, dict),
+    'array': lambda v: isinstance(v, list),
+    'string': lambda v: isinstance(v, str),
+    'number': lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    'integer': lambda v: isinstance(v, int) and not isinstance(v, bool),
+    'boolean': lambda v: isinstance(v, bool),
+    'null': lambda v: v is None,
+}
+
+
+def _type_name(value):
+    for name in ('null', 'boolean', 'number', 'string', 'array', 'object'):
+        if _TYPE_CHECKS[name](value):
+            return name
+    return type(value).__name__
+
+
+def compile_schema(schema):
+    """Turn a schema dict into check(value, path, faults) closures, once."""
+    checks = []
+
+    types = schema.get('type')
+    if types is not None:
+        types = [types] if isinstance(types, str) else list(types)
+        type_funcs = [_TYPE_CHECKS[t] for t in types]
+        expected = ' or '.join(types)
+
+        def check_type(value, path, faults):
+            if not any(f(value) for f in type_funcs):
+                faults.append((path, f"expected {expected}, got {_type_name(value)}"))
+                return False
+            return True
+        checks.append(check_type)
+
+    if 'enum' in schema:
+        allowed = set(schema['enum'])
+
+        def check_enum(value, path, faults):
+            if value is not None and value not in allowed:
+                faults.append((path, f"unexpected value {value!r}"))
+            return True
+        checks.append(check_enum)
+
+    if 'pattern' in schema:
+        regex = re.compile(schema['pattern'])
+
+        def check_pattern(value, path, faults):
+            if isinstance(value, str) and not regex.match(value):
+                faults.append((path, f"{value!r} does not match {regex.pattern}"))
+            return True
+        checks.append(check_pattern)
+
+    if 'min_length' in schema:
+        min_length = schema['min_length']
+
+        def check_min_length(value, path, faults):
+            if isinstance(value, str) and len(value) < min_length:
+                faults.append((path, 'must not be empty'))
+            return True
+        checks.append(check_min_length)
+
+    if 'minimum' in schema or 'maximum' in schema:
+        low = schema.get('minimum', float('-inf'))
+        high = schema.get('maximum', float('inf'))
+
+        def check_range(value, path, faults):
+            if _TYPE_CHECKS['number'](value) and not low <= value <= high:
+                faults.append((path, f"{value} outside [{low}, {high}]"))
+            return True
+        checks.append(check_range)
+
+    if 'required' in schema or 'properties' in schema:
+        required = schema.get('required', [])
+        properties = {k: compile_schema(v) for k, v in schema.get('properties', {}).items()}
+
+        def check_object(value, path, faults):
+            if not isinstance(value, dict):
+                return True
+            for key in required:
+                if key not in value:
+                    faults.append((path + (key,), 'missing'))
+            for key, check in properties.items():
+                if key in value:
+                    check(value[key], path + (key,), faults)
+            return True
+        checks.append(check_object)
+
+    if 'items' in schema:
+        item_check = compile_schema(schema['items'])
+
+        def check_items(value, path, faults):
+            if isinstance(value, list):
+                for i, item in enumerate(value):
+                    item_check(item, path + (i,), faults)
+            return True
+        checks.append(check_items)
+
+    def check(value, path, faults):
+        for c in checks:
+            if not c(value, path, faults):
+                break
+    return check
+
+
+_check_project = compile_schema(PROJECT_SCHEMA)
+
+
+def format_path(path):
+    out = '$'
+    for part in path:
+        out += f"[{part}]" if isinstance(part, int) else f".{part}"
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Locating a JSON path in the raw text
+# ---------------------------------------------------------------------------
+
+_WS = re.compile(r'[ \t\n\r]*')
+_SCALAR = re.compile(r'-?\d+(\.\d+)?([eE][-+]?\d+)?|true|false|null')
+
+
+def _skip_value(text, pos):
+    char = text[pos]
+    if char == '"':
+        return scanstring(text, pos + 1)[1]
+    if char in '{[':
+        depth = 0
+        while True:
+            char = text[pos]
+            if char == '"':
+                pos = scanstring(text, pos + 1)[1]
+                continue
+            if char in '{[':
+                depth += 1
+            elif char in '}]':
+                depth -= 1
+                if depth == 0:
+                    return pos + 1
+            pos += 1
+    return _SCALAR.match(text, pos).end()
+
+
+def locate(text, path):
+    """Character offset of the value at path (or of its closest existing parent)."""
+    pos = _WS.match(text, 0).end()
+    for part in path:
+        char = text[pos]
+        if char == '{' and isinstance(part, str):
+            pos = _WS.match(text, pos + 1).end()
+            found = False
+            while text[pos] != '}':
+                key, pos = scanstring(text, pos + 1)
+                pos = _WS.match(text, pos).end() + 1  # ':'
+                pos = _WS.match(text, pos).end()
+                if key == part:
+                    found = True
+                    break
+                pos = _WS.match(text, _skip_value(text, pos)).end()
+                if text[pos] == ',':
+                    pos = _WS.match(text, pos + 1).end()
+            if not found:
+                return pos
+        elif char == '[' and isinstance(part, int):
+            pos = _WS.match(text, pos + 1).end()
+            for _ in range(part):
+                if text[pos] == ']':
+                    return pos
+                pos = _WS.match(text, _skip_value(text, pos)).end()
+                if text[pos] == ',':
+                    pos = _WS.match(text, pos + 1).end()
+        else:
+            return pos
+    return pos
+
+
+# ---------------------------------------------------------------------------
+# Repairs
+# ---------------------------------------------------------------------------
+
+# UTF-8 Cyrillic lead bytes (0xD0/0xD1) followed by a continuation byte
+# (0x80-0xBF), as they look after being decoded as latin-1 or cp1251
+_CP1251_CONTINUATION = bytes(range(0x80, 0xC0)).decode('cp1251', errors='ignore')
+_MOJIBAKE = re.compile('[ÐÑ][\u0080-\u00bf]|[РС][' + re.escape(_CP1251_CONTINUATION) + ']')
+
+
+def _fix_mojibake(value):
+    """Undo UTF-8 text that was decoded as cp1251 or latin-1 and saved again."""
+    if not _MOJIBAKE.search(value):
+        return value
+    for codec in ('cp1251', 'latin-1'):
+        try:
+            fixed = value.encode(codec).decode('utf-8')
+        except (UnicodeEncodeError, UnicodeDecodeError):
+            continue
+        if not _MOJIBAKE.search(fixed):
+            return fixed
+    return value
+
+
+def _fix_strings(value, changes, path=()):
+    if isinstance(value, str):
+        fixed = _fix_mojibake(value)
+        if fixed != value:
+            changes.append(f"{format_path(path)}: fixed mis-encoded text")
+        return fixed
+    if isinstance(value, list):
+        return [_fix_strings(v, changes, path + (i,)) for i, v in enumerate(value)]
+    if isinstance(value, dict):
+        return {_fix_mojibake(k): _fix_strings(v, changes, path + (k,)) for k, v in value.items()}
+    return value
+
+
+def _section_id():
+    # Same shape as server.js: Math.random().toString(36).substr(2, 9)
+    return ''.join(random.choice(string.ascii_lowercase + string.digits) for _ in range(9))
+
+
+def repair(project, folder):
+    """Apply safe repairs in place. Returns a list of change descriptions."""
+    changes = []
+    fixed = _fix_strings(project, changes)
+    project.clear()
+    project.update(fixed)
+
+    for key in ('history', 'sections', 'photos', 'additionalPersons'):
+        if project.get(key) is None:
+            project[key] = []
+            changes.append(f"$.{key}: set to []")
+
+    if project.get('folderName') != folder:
+        changes.append(f"$.folderName: {project.get('folderName')!r} -> {folder!r}")
+        project['folderName'] = folder
+
+    if isinstance(project.get('id'), (int, float)) and not isinstance(project.get('id'), bool):
+        project['id'] = str(int(project['id']))
+        changes.append('$.id: converted to string')
+    elif not project.get('id') and isinstance(project.get('createdAt'), str):
+        try:
+            created = datetime.datetime.fromisoformat(project['createdAt'].replace('Z', '+00:00'))
+            project['id'] = str(int(created.timestamp() * 1000))
+            changes.append(f"$.id: derived {project['id']} from createdAt")
+        except ValueError:
+            pass
+
+    for key in ('lat', 'lng', 'amount'):
+        value = project.get(key)
+        if isinstance(value, str):
+            try:
+                project[key] = float(value) if value.strip() else None
+                changes.append(f"$.{key}: {value!r} -> {project[key]}")
+            except ValueError:
+                pass
+
+    if isinstance(project['sections'], list):
+        for i, section in enumerate(project['sections']):
+            if not isinstance(section, dict):
+                continue
+            if section.get('files') is None:
+                section['files'] = []
+                changes.append(f"$.sections[{i}].files: set to []")
+            if isinstance(section.get('id'), (int, float)) and not isinstance(section.get('id'), bool):
+                section['id'] = str(int(section['id']))
+                changes.append(f"$.sections[{i}].id: converted to string")
+            elif not section.get('id'):
+                section['id'] = _section_id()
+                changes.append(f"$.sections[{i}].id: generated {section['id']}")
+    return changes
+
+
+# ---------------------------------------------------------------------------
+# Per-file work (runs in worker processes)
+# ---------------------------------------------------------------------------
+
+def _decode(raw, faults, changes):
+    """(text, encoding, bytes of BOM stripped before it)."""
+    bom = 0
+    if raw.startswith(b'\xef\xbb\xbf'):
+        faults.append({'path': '$', 'offset': 0, 'message': 'UTF-8 BOM', 'repairable': True})
+        changes.append('stripped BOM')
+        raw, bom = raw[3:], 3
+    try:
+        return raw.decode('utf-8'), 'utf-8', bom
+    except UnicodeDecodeError as e:
+        faults.append({'path': '$', 'offset': bom + e.start, 'repairable': True,
+                       'message': f"invalid UTF-8 byte 0x{raw[e.start]:02x}"})
+        changes.append('re-decoded as cp1251')
+        return raw.decode('cp1251', errors='replace'), 'cp1251', bom
+
+
+def _byte_offset(text, pos, encoding, bom):
+    """Offset in the file on disk of character pos of the decoded text."""
+    return bom + len(text[:pos].encode(encoding, errors='replace'))
+
+
+def check_file(path, folder, fix=False):
+    faults = []
+    changes = []
+    with open(path, 'rb') as f:
+        raw = f.read()
+    text, encoding, bom = _decode(raw, faults, changes)
+
+    try:
+        project = json.loads(text)
+    except json.JSONDecodeError as e:
+        offset = _byte_offset(text, e.pos, encoding, bom)
+        truncated = e.pos >= len(text.rstrip())
+        faults.append({'path': '$', 'offset': offset, 'repairable': False,
+                       'message': ('truncated: ' if truncated else '') + e.msg})
+        return {'folder': folder, 'file': path, 'faults': faults, 'repaired': []}
+
+    schema_faults = []
+    _check_project(project, (), schema_faults)
+    for fault_path, message in schema_faults:
+        faults.append({'path': format_path(fault_path), 'message': message,
+                       'offset': _byte_offset(text, locate(text, fault_path), encoding, bom), 'repairable': False})
+    if isinstance(project, dict) and project.get('folderName') != folder:
+        offset = _byte_offset(text, locate(text, ('folderName',)), encoding, bom)
+        faults.append({'path': '$.folderName', 'offset': offset,
+                       'message': f"{project.get('folderName')!r} does not match folder {folder!r}",
+                       'repairable': True})
+
+    # Clean files (the common case) skip the repair dry-run entirely
+    if not isinstance(project, dict) or not (faults or _MOJIBAKE.search(text)):
+        return {'folder': folder, 'file': path, 'faults': faults, 'repaired': []}
+
+    # Dry-run the repairs to learn which faults they would clear
+    candidate = json.loads(text)
+    changes += repair(candidate, folder)
+    remaining = []
+    _check_project(candidate, (), remaining)
+    remaining_paths = {format_path(p) for p, _ in remaining}
+    for fault in faults:
+        if not fault['repairable'] and fault['path'] not in remaining_paths and fault['path'] != '$':
+            fault['repairable'] = True
+    if any(change.endswith('mis-encoded text') for change in changes):
+        faults.append({'path': '$', 'offset': 0, 'message': 'mis-encoded (mojibake) strings', 'repairable': True})
+
+    repaired = []
+    if fix and changes:
+        snapshot_store.snapshot(path, reason='validate_projects.py --fix')
+        atomic_write(path, dump_project(candidate))
+        repaired = changes
+    return {'folder': folder, 'file': path, 'faults': faults, 'repaired': repaired}
+
+
+def _check_job(job):
+    path, folder, fix = job
+    try:
+        return check_file(path, folder, fix)
+    except OSError as e:
+        return {'folder': folder, 'file': path, 'repaired': [],
+                'faults': [{'path': '$', 'offset': 0, 'message': str(e), 'repairable': False}]}
+
+
+def validate_tree(projects_dir=PROJECTS_DIR, fix=False, workers=None):
+    jobs = [(path, folder, fix) for folder, path, _ in iter_data_files(projects_dir)]
+    # Folders without data.json break the dashboard just the same
+    with_data = {job[1] for job in jobs}
+    missing = []
+    if os.path.isdir(projects_dir):
+        for entry in os.scandir(projects_dir):
+            if entry.is_dir() and not entry.name.startswith('.') and entry.name not in with_data:
+                missing.append({'folder': entry.name, 'file': os.path.join(entry.path, DATA_FILE), 'repaired': [],
+                                'faults': [{'path': '$', 'offset': 0, 'message': 'data.json missing',
+                                            'repairable': False}]})
+    if len(jobs) < 32:
+        results = [_check_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_check_job, jobs, chunksize=16))
+    return results + missing
+
+
+@instrument.instrumented('validate_projects')
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate / repair projects/*/data.json")
+    parser.add_argument('--projects', default=PROJECTS_DIR)
+    parser.add_argument('--fix', action='store_true', help='apply safe repairs (files are snapshotted first)')
+    parser.add_argument('--json', action='store_true', help='machine-readable report')
+    parser.add_argument('--workers', type=int)
+    args = parser.parse_args(argv)
+
+    results = validate_tree(args.projects, args.fix, args.workers)
+    bad = [r for r in results if r['faults']]
+    unrepaired = sum(1 for r in bad for f in r['faults'] if not (args.fix and f['repairable']))
+
+    if args.json:
+        json.dump({'checked': len(results), 'results': bad}, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        for r in bad:
+            rel = os.path.join(r['folder'], DATA_FILE)
+            for f in r['faults']:
+                tag = ' [repairable]' if f['repairable'] else ''
+                print(f"{rel}:{f['offset']}: {f['path']}: {f['message']}{tag}")
+            for change in r['repaired']:
+                print(f"{rel}: repaired {change}")
+        print(f"Checked {len(results)} projects: {len(bad)} with faults, {unrepaired} unresolved.")
+    return 1 if unrepaired else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())